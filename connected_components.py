@@ -0,0 +1,33 @@
+import numpy as np
+import numpy.typing as npt
+
+# Vectorized connected components (union-find with hooking and pointer jumping),
+# every round links the roots of all edges at once instead of visiting nodes one by one
+
+
+def connected_components(num_nodes: int, edges: npt.ArrayLike):
+    """edges is expected to be an int array with shape (num_edges, 2),
+    returns a component label per node, labels are consecutive and ordered by the smallest node of each component"""
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    parent = np.arange(num_nodes)
+    a, b = edges.T
+
+    while True:
+        # Hook the larger root of every edge below the smaller one
+        root_a = parent[a]
+        root_b = parent[b]
+        differ = root_a != root_b
+        if not differ.any():
+            break
+        low = np.minimum(root_a[differ], root_b[differ])
+        high = np.maximum(root_a[differ], root_b[differ])
+        np.minimum.at(parent, high, low)
+
+        # Pointer jumping until every node points directly at its root
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    return np.unique(parent, return_inverse=True)[1].reshape(-1)
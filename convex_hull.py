@@ -0,0 +1,355 @@
+import heapq
+
+import numpy as np
+import numpy.typing as npt
+
+# 3D convex hull in NumPy (no Blender required),
+# interior points are culled first with the hull of a few extreme points (Akl-Toussaint),
+# the remaining points are added with quickhull, one farthest outside point at a time,
+# every point outside the current hull belongs to the outside set of one face
+
+# 2D hulls use the same culling followed by Andrew's monotone chain
+
+# References
+# https://doi.org/10.1016/0020-0190(79)90072-3 (Andrew, Another efficient algorithm for convex hulls in two dimensions)
+# https://doi.org/10.1016/0020-0190(78)90079-4 (Akl, Toussaint, A fast convex hull algorithm)
+# https://doi.org/10.1145/235815.235821 (Barber, Dobkin, Huhdanpaa, The quickhull algorithm for convex hulls)
+
+# Directions of the extreme points used for culling, the 26 neighbors of a cube cell
+# (opposite directions are covered by taking both argmin and argmax)
+CULL_DIRECTIONS = np.array(
+    [
+        (x, y, z)
+        for x in range(-1, 2)
+        for y in range(-1, 2)
+        for z in range(-1, 2)
+        if (x, y, z) > (0, 0, 0)
+    ],
+    dtype=np.float64,
+)
+
+# Directions of the extreme points used for culling 2D points, evenly spaced over half a circle
+CULL_DIRECTIONS_2D = np.stack(
+    (np.cos(np.arange(16) * np.pi / 16), np.sin(np.arange(16) * np.pi / 16)), axis=1
+)
+
+# Number of points processed together while culling, bounds the size of the projections
+POINT_BLOCK_SIZE = 1 << 16
+
+
+def _plane_tolerance(points: np.ndarray):
+    """Distance below which a point counts as lying on a face plane (as in qhull)"""
+    return 3.0 * np.finfo(np.float64).eps * np.abs(points).max(axis=0).sum()
+
+
+def _face_planes(points: np.ndarray, faces: np.ndarray):
+    """Unit normals and offsets (normal dot point on the plane) of faces with shape (num_faces, 3)"""
+    p0, p1, p2 = points[faces.T]
+    u = p1 - p0
+    v = p2 - p0
+    # Cross product by components, np.cross has a large overhead for the few faces of one quickhull step
+    normals = np.empty_like(u)
+    normals[:, 0] = u[:, 1] * v[:, 2] - u[:, 2] * v[:, 1]
+    normals[:, 1] = u[:, 2] * v[:, 0] - u[:, 0] * v[:, 2]
+    normals[:, 2] = u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]
+    normals /= np.maximum(np.sqrt((normals * normals).sum(axis=1)), 1e-300)[:, np.newaxis]
+    return normals, (normals * p0).sum(axis=1)
+
+
+def _initial_simplex(points: np.ndarray, epsilon: float):
+    """Indices of four points spanning a tetrahedron of large volume, raises ValueError for flat input"""
+    extremes = np.concatenate((points.argmin(axis=0), points.argmax(axis=0)))
+    extreme_points = points[extremes]
+    distances = ((extreme_points[:, np.newaxis] - extreme_points[np.newaxis]) ** 2).sum(axis=2)
+    i, j = np.unravel_index(np.argmax(distances), distances.shape)
+    a, b = extremes[i], extremes[j]
+
+    direction = points[b] - points[a]
+    line_distances = (np.cross(points - points[a], direction) ** 2).sum(axis=1)
+    c = np.argmax(line_distances)
+    normal = np.cross(direction, points[c] - points[a])
+    normal_length = np.linalg.norm(normal)
+    if normal_length <= epsilon * np.linalg.norm(direction):
+        raise ValueError("Convex hull of collinear points")
+
+    plane_distances = (points - points[a]) @ (normal / normal_length)
+    d = np.argmax(np.abs(plane_distances))
+    if abs(plane_distances[d]) <= epsilon:
+        raise ValueError("Convex hull of coplanar points")
+    return (a, b, c, d) if plane_distances[d] < 0.0 else (a, c, b, d)
+
+
+def _group_by_face(point_ids: np.ndarray, point_faces: np.ndarray, distances: np.ndarray):
+    """Splits point ids into the outside sets of their faces,
+    returns faces, their outside sets, farthest points and distances of those"""
+    order = np.argsort(point_faces, kind="stable")
+    point_ids = point_ids[order]
+    point_faces = point_faces[order]
+    distances = distances[order]
+    starts = np.flatnonzero(np.r_[True, point_faces[1:] != point_faces[:-1]])
+    far = np.maximum.reduceat(distances, starts)
+    # First point of every run that reaches the maximum of its run
+    is_far = distances == np.repeat(far, np.diff(np.r_[starts, len(distances)]))
+    far_points = point_ids[np.flatnonzero(is_far)[np.searchsorted(np.flatnonzero(is_far), starts)]]
+    return point_faces[starts], np.split(point_ids, starts[1:]), far_points, far
+
+
+def quickhull(points: npt.ArrayLike):
+    """Convex hull of points with shape (num_points, 3),
+    returns triangles with shape (num_faces, 3) indexing points, counter clockwise seen from outside,
+    raises ValueError if the points are collinear or coplanar"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    if len(points) < 4:
+        raise ValueError("Convex hull needs at least 4 points")
+    epsilon = _plane_tolerance(points)
+
+    a, b, c, d = _initial_simplex(points, epsilon)
+    capacity = 64
+    faces = np.zeros((capacity, 3), dtype=np.int64)
+    faces[:4] = ((a, b, c), (a, d, b), (b, d, c), (c, d, a))
+    # neighbors[f, k] is the face across the edge from faces[f, k] to faces[f, (k + 1) % 3]
+    neighbors = np.zeros((capacity, 3), dtype=np.int64)
+    neighbors[:4] = ((1, 2, 3), (3, 2, 0), (1, 3, 0), (2, 1, 0))
+    normals = np.zeros((capacity, 3))
+    offsets = np.zeros(capacity)
+    normals[:4], offsets[:4] = _face_planes(points, faces[:4])
+    alive = np.zeros(capacity, dtype=bool)
+    alive[:4] = True
+    visible_mask = np.zeros(capacity, dtype=bool)
+    num_faces = 4
+    # Slots of deleted faces are reused, so the face arrays stay proportional to the hull size
+    free = []
+
+    # Outside sets, far_distances is -inf for faces without outside points,
+    # faces with outside points are taken from a heap by their farthest distance (stale entries are skipped)
+    outside = [None] * capacity
+    far_points = np.zeros(capacity, dtype=np.int64)
+    far_distances = np.full(capacity, -np.inf)
+    heap = []
+
+    def assign(point_ids, new_faces):
+        if not len(point_ids):
+            return
+        distances = points[point_ids] @ normals[new_faces].T - offsets[new_faces]
+        best = np.argmax(distances, axis=1)
+        best_distances = distances[np.arange(len(point_ids)), best]
+        keep = best_distances > epsilon
+        if not keep.any():
+            return
+        groups = _group_by_face(point_ids[keep], new_faces[best[keep]], best_distances[keep])
+        for face, face_points, far_point, far_distance in zip(*groups):
+            outside[face] = face_points
+            far_points[face] = far_point
+            far_distances[face] = far_distance
+            heapq.heappush(heap, (-far_distance, face))
+
+    assign(np.setdiff1d(np.arange(len(points)), (a, b, c, d)), np.arange(4))
+
+    while heap:
+        _, face = heapq.heappop(heap)
+        if far_distances[face] == -np.inf:
+            continue
+        eye = far_points[face]
+        eye_point = points[eye]
+
+        # Faces seen from the eye point, flood filled from the face of the eye point over neighbors
+        visible = [np.array([face])]
+        visible_mask[face] = True
+        frontier = visible[0]
+        while len(frontier):
+            candidates = np.unique(neighbors[frontier].ravel())
+            candidates = candidates[~visible_mask[candidates]]
+            frontier = candidates[normals[candidates] @ eye_point - offsets[candidates] > epsilon]
+            visible_mask[frontier] = True
+            visible.append(frontier)
+        visible = np.concatenate(visible)
+
+        # Horizon edges are the edges of visible faces with a hidden neighbor
+        is_horizon = ~visible_mask[neighbors[visible]]
+        horizon_faces, horizon_slots = np.nonzero(is_horizon)
+        horizon_faces = visible[horizon_faces]
+        horizon = np.stack(
+            (faces[horizon_faces, horizon_slots], faces[horizon_faces, (horizon_slots + 1) % 3]),
+            axis=1,
+        )
+        hidden = neighbors[horizon_faces, horizon_slots]
+
+        orphans = [outside[f] for f in visible.tolist() if outside[f] is not None]
+        visible_mask[visible] = False
+        alive[visible] = False
+        far_distances[visible] = -np.inf
+        for f in visible.tolist():
+            outside[f] = None
+        free.extend(visible.tolist())
+
+        # Grow the face arrays by doubling
+        num_new = len(horizon)
+        num_appended = max(num_new - len(free), 0)
+        while num_faces + num_appended > capacity:
+            faces = np.concatenate((faces, np.zeros_like(faces)))
+            neighbors = np.concatenate((neighbors, np.zeros_like(neighbors)))
+            normals = np.concatenate((normals, np.zeros_like(normals)))
+            offsets = np.concatenate((offsets, np.zeros_like(offsets)))
+            alive = np.concatenate((alive, np.zeros_like(alive)))
+            visible_mask = np.concatenate((visible_mask, np.zeros_like(visible_mask)))
+            far_points = np.concatenate((far_points, np.zeros_like(far_points)))
+            far_distances = np.concatenate((far_distances, np.full(capacity, -np.inf)))
+            outside.extend([None] * capacity)
+            capacity *= 2
+
+        reused = free[len(free) - (num_new - num_appended) :]
+        del free[len(free) - len(reused) :]
+        new_faces = np.array(reused + list(range(num_faces, num_faces + num_appended)), dtype=np.int64)
+        num_faces += num_appended
+
+        faces[new_faces, :2] = horizon
+        faces[new_faces, 2] = eye
+        normals[new_faces], offsets[new_faces] = _face_planes(points, faces[new_faces])
+        alive[new_faces] = True
+
+        # The horizon is a loop, the new face on edge (u, v) neighbors the new faces starting at v
+        # and ending at u, and the hidden face across (u, v) now neighbors the new face
+        starting = dict(zip(horizon[:, 0].tolist(), new_faces.tolist()))
+        ending = dict(zip(horizon[:, 1].tolist(), new_faces.tolist()))
+        neighbors[new_faces, 0] = hidden
+        neighbors[new_faces, 1] = [starting[v] for v in horizon[:, 1].tolist()]
+        neighbors[new_faces, 2] = [ending[u] for u in horizon[:, 0].tolist()]
+        neighbors[hidden, np.argmax(neighbors[hidden] == horizon_faces[:, np.newaxis], axis=1)] = new_faces
+
+        if orphans:
+            orphans = np.concatenate(orphans)
+            assign(orphans[orphans != eye], new_faces)
+
+    return faces[:num_faces][alive[:num_faces]]
+
+
+def extreme_points(points: np.ndarray, directions: np.ndarray):
+    """Indices of the points with the largest and smallest projection on each direction (unique, sorted),
+    points are projected in blocks of POINT_BLOCK_SIZE"""
+    extremes = []
+    for start in range(0, len(points), POINT_BLOCK_SIZE):
+        # Projections with shape (num_directions, block size), reductions along contiguous rows are fast
+        projections = directions @ points[start : start + POINT_BLOCK_SIZE].T
+        extremes.append(start + projections.argmin(axis=1))
+        extremes.append(start + projections.argmax(axis=1))
+    extremes = np.unique(np.concatenate(extremes))
+    # Block extremes are candidates, the global extremes are among them
+    candidate_projections = points[extremes] @ directions.T
+    return np.unique(
+        np.concatenate(
+            (
+                extremes[candidate_projections.argmin(axis=0)],
+                extremes[candidate_projections.argmax(axis=0)],
+            )
+        )
+    )
+
+
+def extreme_point_cull(points: npt.ArrayLike):
+    """Akl-Toussaint heuristic, returns indices of the points that are not strictly inside the hull
+    of the extreme points along CULL_DIRECTIONS (all points if those are coplanar)"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    extremes = extreme_points(points, CULL_DIRECTIONS)
+
+    try:
+        polytope = quickhull(points[extremes])
+    except ValueError:
+        return np.arange(len(points))
+    normals, offsets = _face_planes(points[extremes], polytope)
+    # Axis directions are among the culling directions, so the extremes give the coordinate bounds
+    epsilon = _plane_tolerance(points[extremes])
+
+    keep = []
+    for start in range(0, len(points), POINT_BLOCK_SIZE):
+        distances = points[start : start + POINT_BLOCK_SIZE] @ normals.T - offsets
+        keep.append(start + np.flatnonzero(distances.max(axis=1) >= -epsilon))
+    return np.concatenate(keep)
+
+
+def convex_hull(points: npt.ArrayLike):
+    """Convex hull of points with shape (num_points, 3),
+    returns hull vertex locations, triangles indexing them (counter clockwise seen from outside),
+    unit outward face normals and the index of every hull vertex in points,
+    raises ValueError if the points are collinear or coplanar"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    candidates = extreme_point_cull(points)
+    faces = candidates[quickhull(points[candidates])]
+    indices, faces = np.unique(faces, return_inverse=True)
+    faces = faces.reshape(-1, 3)
+    verts = points[indices]
+    normals, _ = _face_planes(verts, faces)
+    return verts, faces, normals, indices
+
+
+def _monotone_chain(points: np.ndarray):
+    """Indices of the convex hull vertices of 2D points in counter clockwise order,
+    collinear points on hull edges are dropped"""
+    order = np.lexsort((points[:, 1], points[:, 0]))
+    coords = points[order].tolist()
+
+    def half_hull(indices):
+        chain = []
+        for i in indices:
+            x, y = coords[i]
+            while len(chain) >= 2:
+                ax, ay = coords[chain[-2]]
+                bx, by = coords[chain[-1]]
+                if (bx - ax) * (y - ay) - (by - ay) * (x - ax) > 0.0:
+                    break
+                chain.pop()
+            chain.append(i)
+        return chain
+
+    lower = half_hull(range(len(coords)))
+    upper = half_hull(range(len(coords) - 1, -1, -1))
+    # Last point of each half is the first point of the other
+    return order[np.array(lower[:-1] + upper[:-1], dtype=np.int64)]
+
+
+def convex_hull_2d(points: npt.ArrayLike):
+    """Convex hull of 2D points with shape (num_points, 2), points strictly inside the polygon of the
+    extreme points along CULL_DIRECTIONS_2D are culled before the monotone chain,
+    returns indices of the hull vertices in counter clockwise order (fewer than 3 for collinear points)"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) < 3:
+        return np.arange(len(points))
+
+    extremes = extreme_points(points, CULL_DIRECTIONS_2D)
+    polygon = extremes[_monotone_chain(points[extremes])]
+    if len(polygon) < 3:
+        candidates = np.arange(len(points))
+    else:
+        # Inward edge normals of the counter clockwise polygon
+        starts = points[polygon]
+        edges = np.roll(starts, -1, axis=0) - starts
+        normals = np.stack((-edges[:, 1], edges[:, 0]), axis=1)
+        offsets = (normals * starts).sum(axis=1)
+        # Axis directions are among the culling directions, so the extremes give the coordinate bounds
+        epsilon = _plane_tolerance(points[extremes]) * np.linalg.norm(normals, axis=1)
+
+        # Axis aligned box inside the polygon, scaled from the polygon bounds about the polygon center,
+        # points in it are culled with four comparisons before testing every polygon edge
+        center = starts.mean(axis=0)
+        corners = (starts.max(axis=0) - starts.min(axis=0)) / 2.0 * np.array(
+            [(1.0, 1.0), (1.0, -1.0), (-1.0, 1.0), (-1.0, -1.0)]
+        )
+        approach = -(corners @ normals.T)
+        clearance = (normals @ center - offsets)[np.newaxis]
+        scale = np.min(clearance / np.maximum(approach, 1e-300), initial=1.0, where=approach > 0.0)
+        box_min = center - 0.999 * scale * corners[0]
+        box_max = center + 0.999 * scale * corners[0]
+
+        candidates = []
+        for start in range(0, len(points), POINT_BLOCK_SIZE):
+            block = points[start : start + POINT_BLOCK_SIZE]
+            outside_box = np.flatnonzero(
+                (block[:, 0] <= box_min[0])
+                | (block[:, 0] >= box_max[0])
+                | (block[:, 1] <= box_min[1])
+                | (block[:, 1] >= box_max[1])
+            )
+            distances = block[outside_box] @ normals.T - offsets
+            candidates.append(start + outside_box[(distances <= epsilon).any(axis=1)])
+        candidates = np.concatenate(candidates)
+
+    return candidates[_monotone_chain(points[candidates])]
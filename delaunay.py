@@ -0,0 +1,174 @@
+import numpy as np
+import numpy.typing as npt
+
+# Pure Python constrained Delaunay triangulation for small point sets (e.g. the points of one split face),
+# fallback for mathutils.geometry.delaunay_2d_cdt outside Blender,
+# Bowyer-Watson insertion followed by edge flips until every constraint edge is present (Sloan),
+# crossing constraints are split at new points first (split_constraints) since flips alone cannot recover them
+
+# References
+# https://en.wikipedia.org/wiki/Bowyer%E2%80%93Watson_algorithm
+# https://doi.org/10.1016/0045-7949(93)90239-A (Sloan, A fast algorithm for generating constrained Delaunay triangulations)
+
+# Size of the initial triangle relative to the extent of the points
+SUPER_TRIANGLE_SCALE = 1e4
+
+
+def _orient(a, b, c):
+    """Twice the signed area of triangle abc, positive if counter clockwise"""
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+
+def _in_circumcircle(a, b, c, p):
+    """Checks if p is strictly inside the circumcircle of the counter clockwise triangle abc"""
+    ax, ay = a[0] - p[0], a[1] - p[1]
+    bx, by = b[0] - p[0], b[1] - p[1]
+    cx, cy = c[0] - p[0], c[1] - p[1]
+    return (
+        (ax * ax + ay * ay) * (bx * cy - cx * by)
+        - (bx * bx + by * by) * (ax * cy - cx * ay)
+        + (cx * cx + cy * cy) * (ax * by - bx * ay)
+    ) > 0.0
+
+
+def _segments_cross(a, b, c, d):
+    """Checks if segments ab and cd cross at a point interior to both"""
+    return _orient(a, b, c) * _orient(a, b, d) < 0.0 and _orient(c, d, a) * _orient(c, d, b) < 0.0
+
+
+def _ccw(points, i, j, k):
+    return (i, j, k) if _orient(points[i], points[j], points[k]) > 0.0 else (i, k, j)
+
+
+def _insert_point(points, tris, i):
+    p = points[i]
+    bad = [t for t in tris if _in_circumcircle(points[t[0]], points[t[1]], points[t[2]], p)]
+    if not bad:
+        # On a circumcircle within rounding, use the triangles containing the point instead
+        bad = [
+            t
+            for t in tris
+            if min(_orient(points[t[j]], points[t[(j + 1) % 3]], p) for j in range(3)) >= 0.0
+        ]
+    bad_set = set(bad)
+    edges = {(t[j], t[(j + 1) % 3]) for t in bad for j in range(3)}
+    # Edges of the cavity boundary are not shared by two removed triangles
+    boundary = [(a, b) for a, b in edges if (b, a) not in edges]
+    tris = [t for t in tris if t not in bad_set]
+    tris.extend(_ccw(points, a, b, i) for a, b in boundary)
+    return tris
+
+
+def _recover_edge(points, tris, a, b):
+    """Flips edges crossing the segment ab until it is an edge of the triangulation (Sloan),
+    gives up (leaving the triangulation valid) if ab crosses another constraint or passes through a point"""
+    pa, pb = points[a], points[b]
+    tris = set(tris)
+    owners = {}
+    for t in tris:
+        for j in range(3):
+            owners[(t[j], t[(j + 1) % 3])] = t
+    if (a, b) in owners:
+        return list(tris)
+
+    queue = [
+        (c, d)
+        for (c, d) in owners
+        if c < d and (d, c) in owners and _segments_cross(pa, pb, points[c], points[d])
+    ]
+    stalled = 0
+    while queue and stalled <= len(queue):
+        c, d = queue.pop(0)
+        t1 = owners[(c, d)]
+        t2 = owners[(d, c)]
+        e = next(v for v in t1 if v != c and v != d)
+        f = next(v for v in t2 if v != c and v != d)
+        # Only a convex quad can be flipped, other edges are retried after their neighbors
+        if not _segments_cross(points[c], points[d], points[e], points[f]):
+            queue.append((c, d))
+            stalled += 1
+            continue
+        stalled = 0
+
+        tris.difference_update((t1, t2))
+        for t in (t1, t2):
+            for j in range(3):
+                del owners[(t[j], t[(j + 1) % 3])]
+        for t in (_ccw(points, c, f, e), _ccw(points, d, e, f)):
+            tris.add(t)
+            for j in range(3):
+                owners[(t[j], t[(j + 1) % 3])] = t
+        if _segments_cross(pa, pb, points[e], points[f]):
+            queue.append((e, f))
+
+    return list(tris)
+
+
+def split_constraints(points: npt.ArrayLike, edges: npt.ArrayLike, tolerance: float):
+    """Splits constraint edges (shape (num_edges, 2)) where they cross each other and at points
+    (shape (num_points, 2)) lying on them, crossings closer than tolerance to a point reuse that point,
+    returns the points with the new crossing points appended and the split edges"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    edges = [(a, b) for a, b in np.asarray(edges, dtype=np.int64).reshape(-1, 2).tolist() if a != b]
+    coords = [tuple(p) for p in points.tolist()]
+
+    for i, (a, b) in enumerate(edges):
+        for c, d in edges[i + 1 :]:
+            if _segments_cross(coords[a], coords[b], coords[c], coords[d]):
+                # Parameter along ab from the signed distances of a and b to cd
+                da = _orient(coords[c], coords[d], coords[a])
+                db = _orient(coords[c], coords[d], coords[b])
+                t = da / (da - db)
+                pa, pb = np.array(coords[a]), np.array(coords[b])
+                crossing = pa + t * (pb - pa)
+                if np.linalg.norm(np.asarray(coords) - crossing, axis=1).min() > tolerance:
+                    coords.append(tuple(crossing.tolist()))
+
+    # Every edge is cut at the points within tolerance of its interior, ordered along the edge
+    all_points = np.asarray(coords)
+    split = []
+    for a, b in edges:
+        pa, pb = all_points[a], all_points[b]
+        direction = pb - pa
+        length_sq = direction @ direction
+        t = (all_points - pa) @ direction / length_sq
+        distances = np.linalg.norm(pa + t[:, np.newaxis] * direction - all_points, axis=1)
+        on_edge = np.flatnonzero((distances <= tolerance) & (t > 0.0) & (t < 1.0))
+        on_edge = on_edge[(on_edge != a) & (on_edge != b)]
+        chain = [a, *on_edge[np.argsort(t[on_edge])].tolist(), b]
+        split.extend((u, v) for u, v in zip(chain[:-1], chain[1:]) if u != v)
+    return all_points, np.array(split, dtype=np.int64).reshape(-1, 2)
+
+
+def delaunay_2d(points: npt.ArrayLike, edges: npt.ArrayLike = ()):
+    """Triangulates the convex hull of points with shape (num_points, 2), points must be unique,
+    edges (shape (num_edges, 2)) are constraint edges that appear in the result unless they cross each other
+    (split_constraints splits them first),
+    returns counter clockwise triangles with shape (num_tris, 3) indexing points"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    num_points = len(points)
+    if num_points < 3:
+        return np.empty((0, 3), dtype=np.int64)
+
+    bounds_min = points.min(axis=0)
+    bounds_max = points.max(axis=0)
+    center = (bounds_min + bounds_max) / 2.0
+    size = SUPER_TRIANGLE_SCALE * max((bounds_max - bounds_min).max(), 1e-12)
+    super_points = center + size * np.array([(-1.0, -1.0), (1.0, -1.0), (0.0, 1.0)])
+
+    coords = [tuple(p) for p in np.concatenate((points, super_points)).tolist()]
+    tris = [_ccw(coords, num_points, num_points + 1, num_points + 2)]
+    for i in range(num_points):
+        tris = _insert_point(coords, tris, i)
+    for a, b in np.asarray(edges, dtype=np.int64).reshape(-1, 2).tolist():
+        if a != b:
+            tris = _recover_edge(coords, tris, a, b)
+
+    # Drop triangles of the initial triangle and slivers between collinear hull points
+    scale = (bounds_max - bounds_min).max() ** 2
+    tris = [
+        t
+        for t in tris
+        if max(t) < num_points and _orient(coords[t[0]], coords[t[1]], coords[t[2]]) > 1e-12 * scale
+    ]
+    return np.array(tris, dtype=np.int64).reshape(-1, 3)
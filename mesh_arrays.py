@@ -0,0 +1,84 @@
+import bpy
+import numpy as np
+import numpy.typing as npt
+
+# Bulk extraction of mesh data into contiguous NumPy arrays using foreach_get,
+# avoids creating a Python object for every vertex or triangle
+
+# Blender stores coordinates and normals as float32 and indices as int32,
+# matching these types lets foreach_get copy the buffers directly
+
+
+def mesh_vertex_coords(mesh: bpy.types.Mesh, dtype: npt.DTypeLike = np.float64):
+    """Returns vertex locations with shape (num_verts, 3)"""
+    coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", coords)
+    return coords.reshape(-1, 3).astype(dtype, copy=False)
+
+
+def mesh_loop_triangles(mesh: bpy.types.Mesh):
+    """Returns loop triangles vertex indices with shape (num_tris, 3)"""
+    mesh.calc_loop_triangles()
+    tris = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", tris)
+    return tris.reshape(-1, 3)
+
+
+def mesh_loop_triangle_normals(mesh: bpy.types.Mesh, dtype: npt.DTypeLike = np.float64):
+    """Returns loop triangles normals with shape (num_tris, 3), expects loop triangles to be calculated"""
+    normals = np.empty(len(mesh.loop_triangles) * 3, dtype=np.float32)
+    mesh.loop_triangles.foreach_get("normal", normals)
+    return normals.reshape(-1, 3).astype(dtype, copy=False)
+
+
+def transform_points(points: np.ndarray, matrix: npt.ArrayLike):
+    """Applies a 4x4 matrix (e.g. matrix_world) to all points in one vectorized step"""
+    matrix = np.asarray(matrix, dtype=points.dtype)
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
+
+
+def transform_normals(normals: np.ndarray, matrix: npt.ArrayLike):
+    """Applies the normal matrix (inverse transpose) of a 4x4 matrix and renormalizes"""
+    normal_matrix = np.linalg.inv(np.asarray(matrix, dtype=np.float64)[:3, :3]).T
+    normals = normals @ normal_matrix.T.astype(normals.dtype)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, lengths, out=normals, where=lengths > 0)
+    return normals
+
+
+def tri_corners(verts: np.ndarray, tris: np.ndarray):
+    """Flattened vertex locations of each triangle with shape (num_tris * 3, 3),
+    layout used by calc_winding_number_vectorized"""
+    return verts[tris].reshape(-1, 3)
+
+
+def object_mesh_arrays(
+    obj: bpy.types.Object,
+    world_space: bool = True,
+    dtype: npt.DTypeLike = np.float64,
+):
+    """Extracts vertex locations, loop triangles vertex indices and loop triangles normals
+    of the evaluated object (modifiers applied), optionally transformed by matrix_world"""
+    dg = bpy.context.evaluated_depsgraph_get()
+    obj_eval = obj.evaluated_get(dg)
+    mesh = obj_eval.to_mesh()
+    try:
+        verts = mesh_vertex_coords(mesh, dtype)
+        tris = mesh_loop_triangles(mesh)
+        normals = mesh_loop_triangle_normals(mesh, dtype)
+    finally:
+        obj_eval.to_mesh_clear()
+
+    if world_space:
+        verts = transform_points(verts, obj.matrix_world)
+        normals = transform_normals(normals, obj.matrix_world)
+
+    return verts, tris, normals
+
+
+def mesh_from_arrays(verts: np.ndarray, faces: np.ndarray, name: str = ""):
+    """Creates a mesh from vertex locations with shape (num_verts, 3) and triangles with shape (num_tris, 3)"""
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(np.asarray(verts).tolist(), [], np.asarray(faces).tolist())
+    mesh.update()
+    return mesh
@@ -1,105 +1,582 @@
-from itertools import chain
+from typing import List, Optional
 
-import bmesh
-import bpy
-from bmesh.types import BMesh, BMEdge, BMFace
-from mathutils import Vector
-from mathutils.bvhtree import BVHTree
-from mathutils.geometry import (
-    delaunay_2d_cdt,
-    intersect_line_plane,
-    intersect_point_tri,
-)
+import numpy as np
+import numpy.typing as npt
 
+try:
+    import bmesh
+    import bpy
+    from bmesh.types import BMesh
+    from mathutils import Vector
+    from mathutils.bvhtree import BVHTree
+    from mathutils.geometry import delaunay_2d_cdt
+except ImportError:
+    # intersect_meshes also works outside Blender, using the pure Python triangulation
+    bmesh = bpy = None
+    BMesh = Vector = BVHTree = delaunay_2d_cdt = None
 
-def bm_edge_vec(e: BMEdge) -> Vector:
-    return e.verts[1].co - e.verts[0].co
+from .connected_components import connected_components
+from .delaunay import delaunay_2d, split_constraints
+from .tri_intersection import intersect_tri_pairs
+from .triangle_mesh import TriangleMesh
+from .vertex_welder import VertexWelder
+from .volume_sampling.batched_winding_numbers import is_inside_batch
+from .volume_sampling.bvh import BVH
+from .volume_sampling.parallel import map_shards
 
 
-def is_point_on_bm_edge(p: Vector, e: BMEdge):
-    edge_length = bm_edge_vec(e).length
-    return (p - e.verts[0].co).length <= edge_length
+# Intersection points and original vertices closer than this are welded into one vertex
+WELD_TOLERANCE = 0.00001
 
 
-def is_point_on_bm_face_tri(p: Vector, f: BMFace):
-    assert len(f.verts) == 3
-    return bool(intersect_point_tri(p, *(v.co for v in f.verts)))
+def plane_bases(normals: np.ndarray):
+    """Rotation matrices with shape (num_normals, 3, 3) that map each unit normal to +Z,
+    rows are two in-plane axes and the normal (right handed, so 2D winding matches the normal)"""
+    helpers = np.where(
+        np.abs(normals[:, :1]) < 0.9, np.array([1.0, 0.0, 0.0]), np.array([0.0, 1.0, 0.0])
+    )
+    u = np.cross(helpers, normals)
+    u /= np.maximum(np.linalg.norm(u, axis=1, keepdims=True), 1e-300)
+    v = np.cross(normals, u)
+    return np.stack((u, v, normals), axis=1)
 
 
-def intersect_bm_edge_face_tri(e: BMEdge, f: BMFace):
-    assert len(f.verts) == 3
-    return intersect_line_plane(e.verts[0].co, e.verts[1].co, f.verts[0].co, f.normal)
+def _cdt(points_2d: np.ndarray, edges: np.ndarray):
+    """Constrained Delaunay triangulation of one face, returns faces indexing [*points_2d, *new_points]
+    and the new 2D points created where constraint edges cross,
+    uses delaunay_2d_cdt in Blender and the pure Python fallback elsewhere"""
+    if delaunay_2d_cdt is None:
+        # Flips cannot recover crossing constraints, so they are split at their crossing points first
+        points_2d_split, edges = split_constraints(points_2d, edges, WELD_TOLERANCE)
+        return delaunay_2d(points_2d_split, edges), points_2d_split[len(points_2d) :]
 
+    # NOTE: input points to delaunay_2d_cdt must be unique
+    # otherwise there will be errors in the result
+    (
+        delaunay_verts_co,
+        delaunay_edges,
+        delaunay_faces,
+        delaunay_orig_verts,
+        delaunay_orig_edges,
+        delaunay_orig_faces,
+    ) = delaunay_2d_cdt(
+        [Vector(p) for p in points_2d], [tuple(e) for e in edges.tolist()], [], 0, WELD_TOLERANCE, False
+    )
 
-def bm_tri_tri_intersect(bm_face1, bm_face2):
-    points = []
-    for e in bm_face1.edges:
-        p = intersect_bm_edge_face_tri(e, bm_face2)
-        if p:
-            if is_point_on_bm_edge(p, e) and is_point_on_bm_face_tri(p, bm_face2):
-                points.append(p)
-    return points
+    # Output verts can merge input points closer than epsilon (mapped to the first input point)
+    # or be new points where constraint edges cross
+    out_indices = []
+    new_points = []
+    for co, orig in zip(delaunay_verts_co, delaunay_orig_verts):
+        if orig:
+            out_indices.append(orig[0])
+        else:
+            out_indices.append(len(points_2d) + len(new_points))
+            new_points.append((co[0], co[1]))
+    faces = np.array(delaunay_faces, dtype=np.int64).reshape(-1, 3)
+    return np.array(out_indices, dtype=np.int64)[faces], np.array(new_points).reshape(-1, 2)
 
 
-def bm_intersect(bm1: BMesh, bm2: BMesh):
+def _triangulate_jobs(
+    query_points: np.ndarray,
+    points_2d: np.ndarray,
+    point_starts: np.ndarray,
+    point_counts: np.ndarray,
+    edges: np.ndarray,
+    edge_starts: np.ndarray,
+    edge_counts: np.ndarray,
+):
+    """Shard function for map_shards, query_points are job indices,
+    returns job and local vertex indices of every output face and job and coordinates of every new point"""
+    face_jobs = []
+    faces = []
+    new_point_jobs = []
+    new_points = []
+    for job in query_points.tolist():
+        start = point_starts[job]
+        edge_start = edge_starts[job]
+        job_faces, job_new_points = _cdt(
+            points_2d[start : start + point_counts[job]],
+            edges[edge_start : edge_start + edge_counts[job]],
+        )
+        face_jobs.append(np.full(len(job_faces), job))
+        faces.append(job_faces)
+        new_point_jobs.append(np.full(len(job_new_points), job))
+        new_points.append(job_new_points)
+    if not faces:
+        return (
+            np.empty(0, dtype=np.int64),
+            np.empty((0, 3), dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+            np.empty((0, 2)),
+        )
+    return (
+        np.concatenate(face_jobs),
+        np.concatenate(faces),
+        np.concatenate(new_point_jobs),
+        np.concatenate(new_points),
+    )
+
+
+def _ranges(sorted_keys: np.ndarray, keys: np.ndarray):
+    """Start and count of every key in sorted_keys"""
+    starts = np.searchsorted(sorted_keys, keys, side="left")
+    return starts, np.searchsorted(sorted_keys, keys, side="right") - starts
+
+
+def split_faces(
+    welder: VertexWelder,
+    faces: np.ndarray,
+    point_faces: np.ndarray,
+    point_ids: np.ndarray,
+    edge_faces: np.ndarray,
+    edges: np.ndarray,
+    num_workers: Optional[int] = 1,
+):
+    """Retriangulates faces (canonical vertex ids with shape (num_faces, 3)) that received points,
+    only the rows of those faces are read,
+    (point_faces[i], point_ids[i]) puts welded point point_ids[i] on a face
+    and (edge_faces[i], edges[i]) puts a constraint edge between two welded points on a face,
+    faces are projected to 2D in one vectorized step and triangulated on num_workers processes
+    (all CPUs if None, inline if 1), returns the faces replacing the split faces and the split face of each"""
+    touched = np.unique(point_faces)
+    if not len(touched):
+        return np.empty((0, 3), dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # Unique (face, vertex) entries, the corners of a face are its first three entries
+    corner_faces = np.repeat(touched, 3)
+    entry_faces = np.concatenate((corner_faces, point_faces))
+    entry_ids = np.concatenate((faces[touched].ravel(), point_ids))
+    entry_ranks = np.concatenate((np.tile(np.arange(3), len(touched)), np.full(len(point_ids), 3)))
+    num_ids = len(welder)
+    entry_keys = entry_faces * num_ids + entry_ids
+    order = np.lexsort((entry_ranks, entry_keys))
+    first = np.r_[True, entry_keys[order][1:] != entry_keys[order][:-1]]
+    unique_entries = order[first]
+    order = np.lexsort((entry_ids[unique_entries], entry_ranks[unique_entries], entry_faces[unique_entries]))
+    unique_entries = unique_entries[order]
+    entry_faces = entry_faces[unique_entries]
+    entry_ids = entry_ids[unique_entries]
+    entry_keys = entry_keys[unique_entries]
+    point_starts, point_counts = _ranges(entry_faces, touched)
+
+    # Constraint edges as local indices of their face, each edge of a face once
+    edge_keys = np.sort(edges, axis=1)
+    edge_order = np.lexsort((edge_keys[:, 1], edge_keys[:, 0], edge_faces))
+    edge_faces = edge_faces[edge_order]
+    edge_keys = edge_keys[edge_order]
+    unique_edges = np.r_[
+        True, (edge_faces[1:] != edge_faces[:-1]) | (edge_keys[1:] != edge_keys[:-1]).any(axis=1)
+    ]
+    edge_faces = edge_faces[unique_edges]
+    edge_keys = edge_keys[unique_edges]
+    key_order = np.argsort(entry_keys)
+    positions = key_order[
+        np.searchsorted(entry_keys, edge_faces[:, np.newaxis] * num_ids + edge_keys, sorter=key_order)
+    ]
+    jobs = np.searchsorted(touched, edge_faces)
+    local_edges = positions - point_starts[jobs][:, np.newaxis]
+    edge_starts, edge_counts = _ranges(edge_faces, touched)
+
+    # Batched projection of all face points to the plane of their face
+    corners = welder.verts[faces[touched]]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-300)
+    bases = plane_bases(normals)
+    entry_jobs = np.searchsorted(touched, entry_faces)
+    points_2d = np.einsum("nij,nj->ni", bases[entry_jobs, :2], welder.verts[entry_ids])
+    heights = np.einsum("nj,nj->n", bases[:, 2], corners[:, 0])
+
+    face_jobs, local_faces, new_point_jobs, new_points_2d = map_shards(
+        _triangulate_jobs,
+        np.arange(len(touched)),
+        {
+            "points_2d": points_2d,
+            "point_starts": point_starts,
+            "point_counts": point_counts,
+            "edges": local_edges,
+            "edge_starts": edge_starts,
+            "edge_counts": edge_counts,
+        },
+        num_workers=num_workers,
+    )
+
+    # Lift new points back onto their face plane and weld them, then map local indices to canonical ids
+    new_point_jobs = new_point_jobs.astype(np.int64)
+    new_points = np.einsum("ni,nij->nj", new_points_2d, bases[new_point_jobs, :2])
+    new_points += heights[new_point_jobs, np.newaxis] * bases[new_point_jobs, 2]
+    new_ids = welder.weld(new_points)
+    new_starts, _ = _ranges(new_point_jobs, np.arange(len(touched)))
+
+    face_jobs = face_jobs.astype(np.int64)[:, np.newaxis]
+    local_faces = local_faces.astype(np.int64)
+    counts = point_counts[face_jobs]
+    indices = np.where(
+        local_faces < counts,
+        point_starts[face_jobs] + local_faces,
+        len(entry_ids) + new_starts[face_jobs] + local_faces - counts,
+    )
+    return np.concatenate((entry_ids, new_ids))[indices], touched[face_jobs[:, 0]]
+
+
+def _segment_edges(pair_ids: np.ndarray, point_ids: np.ndarray, points: np.ndarray):
+    """Intersection segment of each pair (pair_ids sorted) as an edge between the welded ids of its two extreme points"""
+    if not len(pair_ids):
+        return np.empty(0, dtype=np.int64), np.empty((0, 2), dtype=np.int64)
+    pairs, starts = np.unique(pair_ids, return_index=True)
+    ends = np.r_[starts[1:], len(pair_ids)] - 1
+    directions = points[ends] - points[starts]
+    projections = (points * np.repeat(directions, ends - starts + 1, axis=0)).sum(axis=1)
+    order = np.lexsort((projections, pair_ids))
+    first = order[starts]
+    last = order[ends]
+    return pairs, np.stack((point_ids[first], point_ids[last]), axis=1)
+
+
+def stack_meshes(meshes: List[TriangleMesh]):
+    """Combines meshes into one mesh, returns it and the first face of every mesh in it"""
+    vert_offsets = np.cumsum([0] + [len(mesh.verts) for mesh in meshes])
+    face_offsets = np.cumsum([0] + [mesh.num_tris for mesh in meshes])
+    mesh = TriangleMesh(
+        np.concatenate([mesh.verts for mesh in meshes]),
+        np.concatenate([mesh.faces + offset for mesh, offset in zip(meshes, vert_offsets)]),
+    )
+    return mesh, face_offsets[:-1]
+
+
+def intersect_faces(
+    mesh: TriangleMesh,
+    tri_pairs: np.ndarray,
+    tolerance: float = WELD_TOLERANCE,
+    num_workers: Optional[int] = 1,
+    weld_all: bool = True,
+):
+    """Splits the triangles of a mesh along the intersections of the given (triangle, triangle) pairs,
+    weld_all welds coincident vertices of the whole mesh, otherwise only vertices of faces in tri_pairs
+    are welded (to each other and to intersection points) and all other vertices keep their index,
+    returns welded vertex locations, triangles (indices into them) and the input face of every triangle"""
+    tri_pairs = np.asarray(tri_pairs, dtype=np.int64).reshape(-1, 2)
+    pair_ids, points = intersect_tri_pairs(mesh, mesh, tri_pairs)
+
+    # Canonical vertex ids are assigned while building, original vertices first,
+    # coincident vertices of different meshes and intersection points on them share one id
+    welder = VertexWelder(tolerance)
+    if weld_all:
+        faces = welder.weld(mesh.verts)[mesh.faces]
+    else:
+        # Welder ids of the candidate face vertices, other rows of faces are never read
+        candidate_faces = np.unique(tri_pairs)
+        seed_verts = np.unique(mesh.faces[candidate_faces])
+        seed_ids = welder.weld(mesh.verts[seed_verts])
+        num_seed_ids = len(welder)
+        faces = np.zeros_like(mesh.faces, dtype=np.int64)
+        faces[candidate_faces] = seed_ids[np.searchsorted(seed_verts, mesh.faces[candidate_faces])]
+    point_ids = welder.weld(points)
+
+    # Every intersection point and segment belongs to both faces of its pair
+    pairs, edges = _segment_edges(pair_ids, point_ids, points)
+    keep = edges[:, 0] != edges[:, 1]
+    pairs = pairs[keep]
+    edges = edges[keep]
+    point_faces = tri_pairs[pair_ids].T.ravel()
+    edge_faces = tri_pairs[pairs].T.ravel()
+
+    split, split_sources = split_faces(
+        welder,
+        faces,
+        point_faces,
+        np.concatenate((point_ids, point_ids)),
+        edge_faces,
+        np.concatenate((edges, edges)),
+        num_workers,
+    )
+
+    if weld_all:
+        verts = welder.verts
+    else:
+        # Welder ids of seed vertices map to the first mesh vertex of their cluster, new points are appended
+        first_seed = np.zeros(num_seed_ids, dtype=np.int64)
+        first_seed[seed_ids[::-1]] = seed_verts[::-1]
+        id_map = np.concatenate(
+            (first_seed, len(mesh.verts) + np.arange(len(welder) - num_seed_ids))
+        )
+        split = id_map[split]
+        welded_faces = faces[candidate_faces]
+        faces = mesh.faces.astype(np.int64)
+        faces[candidate_faces] = id_map[welded_faces]
+        verts = np.concatenate((mesh.verts, welder.verts[num_seed_ids:]))
+
+    # Untouched faces keep their (welded) vertices, only faces with intersection points are retriangulated
+    untouched = np.ones(len(faces), dtype=bool)
+    untouched[point_faces] = False
+    sources = np.concatenate((np.flatnonzero(untouched), split_sources))
+    faces = np.concatenate((faces[untouched], split))
+
+    # Faces collapsed by welding are dropped instead of dissolving degenerate geometry afterwards
+    degenerate = (
+        (faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 2] == faces[:, 0])
+    )
+    return verts, faces[~degenerate], sources[~degenerate]
+
+
+def intersect_meshes(
+    mesh1: TriangleMesh,
+    mesh2: TriangleMesh,
+    tri_pairs: np.ndarray = None,
+    tolerance: float = WELD_TOLERANCE,
+    num_workers: Optional[int] = 1,
+):
+    """Splits the triangles of both meshes along their intersection,
+    tri_pairs are candidate (triangle of mesh1, triangle of mesh2) pairs (found with BVH.overlap if None),
+    split faces are triangulated on num_workers processes (all CPUs if None, inline if 1),
+    returns welded vertex locations and triangles (indices into them) of the combined mesh"""
+    if tri_pairs is None:
+        tri_pairs = BVH(mesh1).overlap(BVH(mesh2))
+    tri_pairs = np.array(tri_pairs, dtype=np.int64).reshape(-1, 2)
+    tri_pairs[:, 1] += mesh1.num_tris
+    mesh, _ = stack_meshes([mesh1, mesh2])
+    verts, faces, _ = intersect_faces(mesh, tri_pairs, tolerance, num_workers)
+    return verts, faces
+
+
+def sweep_and_prune(bounds_min: np.ndarray, bounds_max: np.ndarray):
+    """Finds all pairs of overlapping axis aligned boxes (both arrays with shape (num_boxes, 3)),
+    boxes are sorted along x and every box is checked against the boxes starting inside its x interval,
+    returns an int array with shape (num_pairs, 2) with the smaller box index first"""
+    bounds_min = np.asarray(bounds_min, dtype=np.float64).reshape(-1, 3)
+    bounds_max = np.asarray(bounds_max, dtype=np.float64).reshape(-1, 3)
+    order = np.argsort(bounds_min[:, 0], kind="stable")
+    sorted_min_x = bounds_min[order, 0]
+
+    # Boxes after i in x order up to the last one starting before box i ends
+    ends = np.searchsorted(sorted_min_x, bounds_max[order, 0], side="right")
+    counts = np.maximum(ends - np.arange(len(order)) - 1, 0)
+    first = np.repeat(np.arange(len(order)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    second = first + 1 + offsets
+    first = order[first]
+    second = order[second]
+
+    overlap = (bounds_min[first, 1:] <= bounds_max[second, 1:]).all(axis=1)
+    overlap &= (bounds_max[first, 1:] >= bounds_min[second, 1:]).all(axis=1)
+    pairs = np.stack((first[overlap], second[overlap]), axis=1)
+    return np.sort(pairs, axis=1)
+
+
+def self_overlap(bvh: BVH):
+    """Pairs of distinct triangles of one mesh whose bounding boxes overlap,
+    triangles sharing a vertex are skipped (they touch at that vertex or edge)"""
+    tri_pairs = bvh.overlap(bvh)
+    tri_pairs = tri_pairs[tri_pairs[:, 0] < tri_pairs[:, 1]]
+    faces = bvh.mesh.faces
+    shared = (faces[tri_pairs[:, 0], :, np.newaxis] == faces[tri_pairs[:, 1], np.newaxis, :]).any(
+        axis=(1, 2)
+    )
+    return tri_pairs[~shared]
+
+
+def intersect_many(
+    meshes: List[TriangleMesh],
+    self_intersection: bool = False,
+    tolerance: float = WELD_TOLERANCE,
+    num_workers: Optional[int] = 1,
+):
+    """Splits the triangles of all meshes (in a common space) along all their mutual intersections,
+    a BVH is built once per mesh and only mesh pairs with overlapping bounds are tested (sweep and prune),
+    self_intersection also splits every mesh along its own intersections,
+    returns welded vertex locations, triangles and the index of the source mesh of every triangle"""
+    if not meshes:
+        return np.empty((0, 3)), np.empty((0, 3), dtype=np.int64), np.empty(0, dtype=np.int64)
+    bvhs = [BVH(mesh) for mesh in meshes]
+    mesh, face_offsets = stack_meshes(meshes)
+
+    bounds_min = np.array([m.verts.min(axis=0) for m in meshes]).reshape(-1, 3)
+    bounds_max = np.array([m.verts.max(axis=0) for m in meshes]).reshape(-1, 3)
+    tri_pairs = [np.empty((0, 2), dtype=np.int64)]
+    for i, j in sweep_and_prune(bounds_min, bounds_max).tolist():
+        tri_pairs.append(bvhs[i].overlap(bvhs[j]) + face_offsets[[i, j]])
+    if self_intersection:
+        for bvh, offset in zip(bvhs, face_offsets):
+            tri_pairs.append(self_overlap(bvh) + offset)
+
+    verts, faces, sources = intersect_faces(mesh, np.concatenate(tri_pairs), tolerance, num_workers)
+    return verts, faces, np.searchsorted(face_offsets, sources, side="right") - 1
+
+
+class IntersectionSession:
+    """Repeated intersection of a static mesh with a rigidly moving mesh (e.g. while dragging an object),
+    the triangulation and BVH of the static mesh are built once, the BVH of the moving mesh is built once
+    in local space and refit for every transform, only triangle pairs overlapping for the current transform
+    are intersected and only their faces are welded and retriangulated"""
+
+    __slots__ = (
+        "static_mesh",
+        "static_bvh",
+        "moving_verts",
+        "moving_mesh",
+        "moving_bvh",
+        "mesh",
+        "tolerance",
+        "num_workers",
+        "_matrix",
+        "_result",
+    )
+
+    def __init__(
+        self,
+        static_mesh: TriangleMesh,
+        moving_mesh: TriangleMesh,
+        tolerance: float = WELD_TOLERANCE,
+        num_workers: Optional[int] = 1,
+    ):
+        self.static_mesh = static_mesh
+        self.static_bvh = BVH(static_mesh)
+        self.moving_verts = moving_mesh.verts.copy()
+        self.moving_mesh = TriangleMesh(moving_mesh.verts, moving_mesh.faces)
+        self.moving_bvh = BVH(self.moving_mesh)
+        # Combined mesh, the moving part of verts is overwritten in place for every transform
+        self.mesh, _ = stack_meshes([static_mesh, self.moving_mesh])
+        self.tolerance = tolerance
+        self.num_workers = num_workers
+        self._matrix = None
+        self._result = None
+
+    def update(self, matrix: npt.ArrayLike):
+        """Intersects the meshes with the moving mesh transformed by a 4x4 matrix (e.g. matrix_world),
+        returns welded vertex locations, triangles and the face of the combined mesh (static faces first)
+        of every triangle, the previous result is returned if the matrix did not change"""
+        matrix = np.array(matrix, dtype=np.float64).reshape(4, 4)
+        if self._matrix is not None and np.array_equal(matrix, self._matrix):
+            return self._result
+
+        verts = self.moving_verts @ matrix[:3, :3].T + matrix[:3, 3]
+        self.moving_mesh.verts = verts
+        self.moving_mesh.clear_cache()
+        self.moving_bvh.refit()
+        self.mesh.verts[len(self.static_mesh.verts) :] = verts
+        self.mesh.clear_cache()
+
+        tri_pairs = self.static_bvh.overlap(self.moving_bvh)
+        tri_pairs[:, 1] += self.static_mesh.num_tris
+        self._result = intersect_faces(
+            self.mesh, tri_pairs, self.tolerance, self.num_workers, weld_all=False
+        )
+        self._matrix = matrix
+        return self._result
+
+    def is_static(self, sources: np.ndarray):
+        """Flags triangles of an update result that come from the static mesh"""
+        return sources < self.static_mesh.num_tris
+
+
+BOOLEAN_OPERATIONS = ("UNION", "DIFFERENCE", "INTERSECT")
+
+
+def face_regions(faces: np.ndarray, sources: np.ndarray):
+    """Labels faces connected via edges that are not on an intersection curve,
+    an edge is on a curve if it has faces of different sources (e.g. the source meshes of intersect_many),
+    returns a region label per face"""
+    num_faces = len(faces)
+    edges = np.sort(faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2).astype(np.int64), axis=1)
+    edge_keys = edges[:, 0] * (int(faces.max()) + 1) + edges[:, 1]
+    edge_faces = np.repeat(np.arange(num_faces), 3)
+
+    # Sorting edge keys groups the faces of each edge, runs with a single source connect their faces
+    order = np.argsort(edge_keys, kind="stable")
+    edge_keys = edge_keys[order]
+    edge_faces = edge_faces[order]
+    starts = np.flatnonzero(np.r_[True, edge_keys[1:] != edge_keys[:-1]])
+    run_ids = np.cumsum(np.r_[True, edge_keys[1:] != edge_keys[:-1]]) - 1
+    edge_sources = sources[edge_faces]
+    mixed = np.minimum.reduceat(edge_sources, starts) != np.maximum.reduceat(edge_sources, starts)
+
+    # Consecutive faces of the same run are linked, which connects every face of the run
+    linked = (run_ids[1:] == run_ids[:-1]) & ~mixed[run_ids[1:]]
+    face_pairs = np.stack((edge_faces[:-1][linked], edge_faces[1:][linked]), axis=1)
+    return connected_components(num_faces, face_pairs)
+
+
+def boolean_meshes(
+    mesh1: TriangleMesh,
+    mesh2: TriangleMesh,
+    operation: str = "UNION",
+    tolerance: float = WELD_TOLERANCE,
+    num_workers: Optional[int] = 1,
+):
+    """Boolean operation (one of BOOLEAN_OPERATIONS, difference is mesh1 minus mesh2) of two closed meshes
+    with consistent normals, both meshes are split along their intersection and every region between
+    intersection curves is kept or dropped as a whole, only the largest face of each region is classified
+    (its centroid against the other mesh, exact winding numbers of all regions in one batched call per mesh),
+    returns vertex locations and triangles (indices into them)"""
+    if operation not in BOOLEAN_OPERATIONS:
+        raise ValueError(f"Unknown boolean operation {operation!r}, expected one of {BOOLEAN_OPERATIONS}")
+
+    verts, faces, sources = intersect_many([mesh1, mesh2], tolerance=tolerance, num_workers=num_workers)
+    regions = face_regions(faces, sources)
+    num_regions = regions.max() + 1 if len(regions) else 0
+
+    # Representative face of every region, the largest one is least likely to touch the other surface
+    out_mesh = TriangleMesh(verts, faces)
+    order = np.lexsort((-out_mesh.areas, regions))
+    representatives = order[np.r_[True, regions[order][1:] != regions[order][:-1]]]
+    points = out_mesh.centroids[representatives]
+    from_mesh1 = sources[representatives] == 0
+
+    inside = np.zeros(num_regions, dtype=bool)
+    inside[from_mesh1] = is_inside_batch(points[from_mesh1], mesh2)
+    inside[~from_mesh1] = is_inside_batch(points[~from_mesh1], mesh1)
+
+    # Regions of mesh1 (first) and mesh2 (second) that are kept, inside meaning inside the other mesh
+    if operation == "UNION":
+        keep = ~inside
+    elif operation == "INTERSECT":
+        keep = inside
+    else:
+        keep = np.where(from_mesh1, ~inside, inside)
+    keep_faces = keep[regions]
+    faces = faces[keep_faces]
+    if operation == "DIFFERENCE":
+        # Parts of mesh2 bound the hole, they face into it
+        flip = sources[keep_faces] == 1
+        faces[flip] = faces[flip][:, ::-1]
+
+    # Drop vertices of removed regions
+    used, faces = np.unique(faces, return_inverse=True)
+    return verts[used], faces.reshape(-1, 3)
+
+
+def bm_intersect(bm1: BMesh, bm2: BMesh, operation: Optional[str] = None):
+    """Splits both BMeshes along their intersection and returns the combined result as a new BMesh,
+    operation (one of BOOLEAN_OPERATIONS) keeps only the parts of a boolean operation instead"""
     bmesh.ops.triangulate(bm1, faces=bm1.faces)
     bmesh.ops.triangulate(bm2, faces=bm2.faces)
     bm1.faces.ensure_lookup_table()
-    bm1.normal_update()
     bm2.faces.ensure_lookup_table()
-    bm2.normal_update()
 
-    bvh1 = BVHTree.FromBMesh(bm1)
-    bvh2 = BVHTree.FromBMesh(bm2)
+    if operation is None:
+        bvh1 = BVHTree.FromBMesh(bm1)
+        bvh2 = BVHTree.FromBMesh(bm2)
+        tri_pairs = np.array(bvh1.overlap(bvh2), dtype=np.int64).reshape(-1, 2)
 
-    bm_out = bmesh.new()
+        verts, faces = intersect_meshes(
+            TriangleMesh.from_bmesh(bm1), TriangleMesh.from_bmesh(bm2), tri_pairs
+        )
+    else:
+        verts, faces = boolean_meshes(
+            TriangleMesh.from_bmesh(bm1), TriangleMesh.from_bmesh(bm2), operation
+        )
 
-    # NOTE: we need to initlize the dict for all faces in order for them to be present in the final mesh,
-    # and not just triangles that have intersections
-    intersection_points_map = {f: [] for f in chain(bm1.faces, bm2.faces)}
-
-    for i1, i2 in bvh1.overlap(bvh2):
-        bm_face1 = bm1.faces[i1]
-        bm_face2 = bm2.faces[i2]
-
-        points = bm_tri_tri_intersect(bm_face1, bm_face2)
-        intersection_points_map[bm_face1].extend(points)
-        intersection_points_map[bm_face2].extend(points)
-
-        points = bm_tri_tri_intersect(bm_face2, bm_face1)
-        intersection_points_map[bm_face1].extend(points)
-        intersection_points_map[bm_face2].extend(points)
-
-    for tri, points in intersection_points_map.items():
-        points = list(set((p[:] for p in points)))
-        cdt_points_input_3d = [v.co for v in tri.verts] + points
-        bm_verts = [bm_out.verts.new(p) for p in cdt_points_input_3d]
-
-        rot_mat = tri.normal.rotation_difference((0, 0, 1)).to_matrix()
-        cdt_points_input_2d = [
-            (rot_mat @ Vector(p)).to_2d() for p in cdt_points_input_3d
-        ]
-        # NOTE: input points to delaunay_2d_cdt must be unique
-        # otherwise there will be errors in the result
-        (
-            delaunay_verts_co,
-            delaunay_edges,
-            delaunay_faces,
-            delaunay_orig_verts,
-            delaunay_orig_edges,
-            delaunay_orig_faces,
-        ) = delaunay_2d_cdt(cdt_points_input_2d, [], [], 0, 0.00001, False)
-        for f in delaunay_faces:
-            bm_out.faces.new([bm_verts[i] for i in f])
-
-    bmesh.ops.remove_doubles(bm_out, verts=bm_out.verts, dist=0.00001)
-    bmesh.ops.dissolve_degenerate(bm_out, dist=0.00001, edges=bm_out.edges)
+    from .mesh_arrays import mesh_from_arrays
 
+    bm_out = bmesh.new()
+    mesh_out = mesh_from_arrays(verts, faces)
+    bm_out.from_mesh(mesh_out)
+    bpy.data.meshes.remove(mesh_out)
     return bm_out
 
 
-def obj_obj_intersect(obj1, obj2):
-    """Intersects two mesh objects and creates a new object from the result"""
+def obj_obj_intersect(obj1, obj2, operation: Optional[str] = None):
+    """Intersects two mesh objects (or applies a boolean operation) and creates a new object from the result"""
     dg = bpy.context.evaluated_depsgraph_get()
     bm1 = bmesh.new()
     bm1.from_object(obj1, dg)
@@ -109,7 +586,7 @@ def obj_obj_intersect(obj1, obj2):
     bm2.from_object(obj2, dg)
     bm2.transform(obj2.matrix_world)
 
-    bm_out = bm_intersect(bm1, bm2)
+    bm_out = bm_intersect(bm1, bm2, operation)
     mesh_out = bpy.data.meshes.new("")
     bm_out.to_mesh(mesh_out)
     obj_out = bpy.data.objects.new("", mesh_out)
@@ -117,3 +594,15 @@ def obj_obj_intersect(obj1, obj2):
     bm_out.free()
     bm1.free()
     bm2.free()
+
+
+def objs_intersect(objs, self_intersection: bool = False):
+    """Intersects any number of mesh objects in world space and creates one new object from the result"""
+    from .mesh_arrays import mesh_from_arrays
+
+    meshes = [TriangleMesh.from_object(obj, world_space=True) for obj in objs]
+    verts, faces, _ = intersect_many(meshes, self_intersection)
+    mesh_out = mesh_from_arrays(verts, faces)
+    obj_out = bpy.data.objects.new("", mesh_out)
+    bpy.context.scene.collection.objects.link(obj_out)
+    return obj_out
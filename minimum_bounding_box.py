@@ -1,14 +1,50 @@
-import math
+import hashlib
+import os
+import tempfile
+from timeit import default_timer
+from typing import Optional, Sequence
 
-import bmesh
-import bpy
 import numpy as np
-from mathutils import Matrix
+import numpy.typing as npt
 
+try:
+    import bpy
+    from mathutils import Matrix
+except ImportError:
+    # min_bounding_box also works outside Blender on raw vertex arrays
+    bpy = Matrix = None
+
+from .convex_hull import CULL_DIRECTIONS, convex_hull, convex_hull_2d, extreme_points, quickhull
 from .scoped_timer import scoped_timer
+from .volume_sampling.direction_sets import fibonacci_sphere
+from .volume_sampling.parallel import map_shards
 
 DEBUG = False
 
+# Upper bound for the rotated hull points of a block of bases in rotating_calipers
+BASIS_BLOCK_MEMORY = 64 * 1024 * 1024
+
+# Approximate mode, the hull is subsampled by the extreme points in fibonacci directions
+# and rotations of the seed bases are refined from APPROX_START_ANGLE down to APPROX_MIN_ANGLE (radians)
+APPROX_NUM_DIRECTIONS = 256
+APPROX_START_ANGLE = np.pi / 8
+APPROX_MIN_ANGLE = 1e-4
+
+# Starting angle of the refinement rounds after points were added to the sample
+APPROX_RESTART_ANGLE = np.pi / 64
+
+# Time budget mode, extreme points are collected from strided subsets of about this many points
+APPROX_SUBSET_SIZE = 1 << 16
+
+# Limit of the rounds that add points supporting the seed boxes to the sample and refine again
+APPROX_MAX_ROUNDS = 8
+
+# Points are planar if their extent along the normal is below this fraction of the largest extent
+PLANAR_TOLERANCE = 1e-6
+
+# Rotation axes tried in every refinement step, each is tried with both signs of the angle
+REFINE_AXES = CULL_DIRECTIONS / np.linalg.norm(CULL_DIRECTIONS, axis=1, keepdims=True)
+
 CUBE_FACE_INDICES = (
     (0, 1, 3, 2),
     (2, 3, 7, 6),
@@ -26,89 +62,421 @@ def gen_cube_verts():
                 yield x, y, z
 
 
-def rotating_calipers(hull_points: np.ndarray, bases):
-    min_bb_basis = None
-    min_bb_min = None
-    min_bb_max = None
-    min_vol = math.inf
-    for basis in bases:
-        rot_points = hull_points.dot(np.linalg.inv(basis))
-        # Should be equivalent to: rot_points = hull_points.dot(np.linalg.inv(np.transpose(basis)).T)
+def hull_face_bases(hull_points: np.ndarray, hull_faces: np.ndarray):
+    """Candidate bases of the minimum bounding box, one per edge of every hull triangle,
+    rows of each basis are the edge direction, the co-tangent and the face normal,
+    returns an array with shape (num_bases, 3, 3), triangles with (near) zero area are skipped"""
+    tri_points = hull_points[np.asarray(hull_faces, dtype=np.int64).reshape(-1, 3)]
+    normals = np.cross(tri_points[:, 1] - tri_points[:, 0], tri_points[:, 2] - tri_points[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0.0)
+    valid = ~np.all(np.isclose(normals, 0.0, atol=0.00001), axis=1)
+    tri_points = tri_points[valid]
+    normals = np.repeat(normals[valid], 3, axis=0)
 
-        bb_min = rot_points.min(axis=0)
-        bb_max = rot_points.max(axis=0)
-        volume = (bb_max - bb_min).prod()
-        if volume < min_vol:
-            min_bb_basis = basis
-            min_vol = volume
+    # Edges (0, 1), (1, 2), (2, 0) of every triangle
+    edge_vecs = (tri_points - np.roll(tri_points, -1, axis=1)).reshape(-1, 3)
+    edge_vecs /= np.linalg.norm(edge_vecs, axis=1, keepdims=True)
+    co_tangents = np.cross(normals, edge_vecs)
+    return np.stack((edge_vecs, co_tangents, normals), axis=1)
 
-            min_bb_min = bb_min
-            min_bb_max = bb_max
 
-    return np.array(min_bb_basis), min_bb_max, min_bb_min
+def rotating_calipers(hull_points: np.ndarray, bases, memory_budget: int = BASIS_BLOCK_MEMORY):
+    """Finds the basis (rows are the box axes) with the minimum volume bounding box of hull_points,
+    all bases are evaluated together in blocks that keep the rotated points within memory_budget bytes,
+    returns the basis and the box maximum and minimum in the coordinates of that basis"""
+    hull_points = np.asarray(hull_points, dtype=np.float64).reshape(-1, 3)
+    bases = np.asarray(bases, dtype=np.float64).reshape(-1, 3, 3)
+    block_size = max(1, memory_budget // (hull_points.nbytes or 1))
 
+    bb_min = np.empty((len(bases), 3))
+    bb_max = np.empty((len(bases), 3))
+    for start in range(0, len(bases), block_size):
+        block = bases[start : start + block_size]
+        # Bases are orthonormal, so the inverse is the transpose,
+        # all axes of the block are stacked into one matrix product with shape (num_points, block_size * 3)
+        rot_points = (hull_points @ block.reshape(-1, 3).T).reshape(len(hull_points), -1, 3)
+        bb_min[start : start + block_size] = rot_points.min(axis=0)
+        bb_max[start : start + block_size] = rot_points.max(axis=0)
 
-def obj_rotating_calipers(obj):
-    bm = bmesh.new()
-    dg = bpy.context.evaluated_depsgraph_get()
-    bm.from_object(obj, dg)
+    volumes = (bb_max - bb_min).prod(axis=1)
+    i = np.argmin(volumes)
+    return bases[i], bb_max[i], bb_min[i]
+
+
+def min_area_rectangle(points_2d: np.ndarray):
+    """Minimum area rectangle of 2D points with shape (num_points, 2), one side is collinear with
+    an edge of the convex hull, rotating calipers find the supporting vertices of every hull edge
+    with a binary search over the (sorted) edge normal angles of the counter clockwise hull,
+    returns the basis with shape (2, 2) (rows are the rectangle axes)
+    and the rectangle maximum and minimum in the coordinates of that basis"""
+    hull = points_2d[convex_hull_2d(points_2d)]
+    if len(hull) < 3:
+        # Collinear points, the rectangle has zero area along the line,
+        # any axes fit coincident points (zero extent in both directions)
+        direction = hull[-1] - hull[0]
+        length = np.linalg.norm(direction)
+        direction = direction / length if length > 0.0 else np.array([1.0, 0.0])
+        edge_dirs = direction[np.newaxis]
+    else:
+        edges = np.roll(hull, -1, axis=0) - hull
+        edge_dirs = edges / np.linalg.norm(edges, axis=1, keepdims=True)
+        # Outward normal angles increase along the hull, the support vertex in a direction
+        # is the first vertex whose following edge has a normal angle above the direction angle
+        normal_angles = np.unwrap(np.arctan2(-edge_dirs[:, 0], edge_dirs[:, 1]))
+        edge_angles = normal_angles + np.pi / 2.0
+        query_angles = edge_angles[:, np.newaxis] + np.arange(4) * np.pi / 2.0
+        query_angles = normal_angles[0] + np.mod(query_angles - normal_angles[0], 2.0 * np.pi)
+        supports = np.searchsorted(normal_angles, query_angles) % len(hull)
+
+        # Supports in the edge direction, the inward normal and the opposite direction
+        normals = np.stack((-edge_dirs[:, 1], edge_dirs[:, 0]), axis=1)
+        widths = ((hull[supports[:, 0]] - hull[supports[:, 2]]) * edge_dirs).sum(axis=1)
+        heights = ((hull[supports[:, 1]] - hull) * normals).sum(axis=1)
+        edge_dirs = edge_dirs[np.argmin(widths * heights)][np.newaxis]
+
+    basis = np.concatenate((edge_dirs, np.stack((-edge_dirs[:, 1], edge_dirs[:, 0]), axis=1)))
+    rot_points = hull @ basis.T
+    return basis, rot_points.max(axis=0), rot_points.min(axis=0)
+
+
+def plane_basis(normal: np.ndarray):
+    """Orthonormal basis with shape (3, 3), rows are two in-plane axes and the unit normal"""
+    normal = np.asarray(normal, dtype=np.float64) / np.linalg.norm(normal)
+    helper = np.array([1.0, 0.0, 0.0]) if abs(normal[0]) < 0.9 else np.array([0.0, 1.0, 0.0])
+    u = np.cross(helper, normal)
+    u /= np.linalg.norm(u)
+    return np.stack((u, np.cross(normal, u), normal))
+
+
+def min_bounding_box_locked_axis(points: np.ndarray, up: npt.ArrayLike = (0.0, 0.0, 1.0)):
+    """Minimum volume bounding box of points with shape (num_points, 3) with one axis fixed to up,
+    the points are projected to the plane of up and solved as a minimum area rectangle,
+    returns the basis (rows are the box axes, up is the last row)
+    and the box maximum and minimum in the coordinates of that basis"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    plane = plane_basis(up)
+    # Coordinates as rows (shape (3, num_points)), reductions along contiguous rows are fast
+    rot_points = plane @ points.T
+    basis_2d, bb_max_2d, bb_min_2d = min_area_rectangle(rot_points[:2].T)
+    basis = np.concatenate((basis_2d @ plane[:2], plane[2:]))
+    bb_max = np.append(bb_max_2d, rot_points[2].max())
+    bb_min = np.append(bb_min_2d, rot_points[2].min())
+    return basis, bb_max, bb_min
+
+
+def principal_axes(points: np.ndarray):
+    """Principal axes of points with shape (num_points, 3) as rows, ordered by decreasing variance"""
+    # Scatter matrix instead of np.cov, which is undefined for a single point
+    centered = points - points.mean(axis=0)
+    _, eigenvectors = np.linalg.eigh(centered.T @ centered)
+    return eigenvectors.T[::-1]
+
+
+def planar_normal(points: np.ndarray, tolerance: float = PLANAR_TOLERANCE, axes: np.ndarray = None):
+    """Normal of the plane of points with shape (num_points, 3) (smallest principal axis),
+    None if the points are not planar within tolerance, axes are the principal axes if already known"""
+    if axes is None:
+        axes = principal_axes(points)
+    projections = axes @ points.T
+    extents = projections.max(axis=1) - projections.min(axis=1)
+    if extents[-1] > tolerance * extents.max():
+        return None
+    return axes[-1]
+
+
+def min_bounding_box(points: np.ndarray):
+    """Minimum volume bounding box of points with shape (num_points, 3), the box is aligned with an edge
+    and a face of the convex hull, returns the basis (rows are the box axes)
+    and the box maximum and minimum in the coordinates of that basis,
+    planar points are solved as a minimum area rectangle in their plane"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    normal = planar_normal(points)
+    if normal is not None:
+        return min_bounding_box_locked_axis(points, normal)
+
+    hull_points, hull_faces, _, _ = convex_hull(points)
+    bases = hull_face_bases(hull_points, hull_faces)
+    return rotating_calipers(hull_points, bases)
+
+
+def axis_angle_matrices(axes: np.ndarray, angles: np.ndarray):
+    """Rotation matrices with shape (num_axes, 3, 3) about unit axes (Rodrigues)"""
+    k = np.zeros((len(axes), 3, 3))
+    k[:, 0, 1], k[:, 0, 2], k[:, 1, 2] = -axes[:, 2], axes[:, 1], -axes[:, 0]
+    k -= k.transpose(0, 2, 1)
+    sin = np.sin(angles)[:, np.newaxis, np.newaxis]
+    cos = np.cos(angles)[:, np.newaxis, np.newaxis]
+    return np.identity(3) + sin * k + (1.0 - cos) * (k @ k)
+
+
+def _seed_bases(pca: np.ndarray, sample: np.ndarray):
+    """Starting bases of the approximate search, principal axes of all points, world axes
+    and the diameter direction of the sample completed by the principal axes"""
+    distances = ((sample[:, np.newaxis] - sample[np.newaxis]) ** 2).sum(axis=2)
+    i, j = np.unravel_index(np.argmax(distances), distances.shape)
+    diameter = sample[j] - sample[i]
+    diameter /= max(np.linalg.norm(diameter), 1e-300)
+    # Second axis from the principal axis least aligned with the diameter
+    helper = pca[np.argmin(np.abs(pca @ diameter))]
+    second = np.cross(diameter, helper)
+    second /= max(np.linalg.norm(second), 1e-300)
+    diameter_basis = np.stack((diameter, second, np.cross(diameter, second)))
+
+    return np.stack((pca, np.identity(3), diameter_basis))
+
+
+def _sample_hull_basis(sample: np.ndarray):
+    """Basis of the exact box of a small sample, quickhull without the extreme point cull of convex_hull"""
+    try:
+        faces = quickhull(sample)
+    except ValueError:
+        return min_bounding_box(sample)[0]
+    return rotating_calipers(sample, hull_face_bases(sample, faces))[0]
+
+
+def _approx_sample(points: np.ndarray, directions: np.ndarray, deadline: Optional[float]):
+    """Extreme points in directions, with a deadline they are collected from strided subsets
+    (each spans all points) until the deadline passes"""
+    if deadline is None:
+        return points[extreme_points(points, directions)]
+    num_subsets = max(len(points) // APPROX_SUBSET_SIZE, 1)
+    samples = []
+    for offset in range(num_subsets):
+        subset = np.ascontiguousarray(points[offset::num_subsets])
+        samples.append(subset[extreme_points(subset, directions)])
+        if default_timer() > deadline:
+            break
+    sample = np.concatenate(samples)
+    return sample[extreme_points(sample, directions)]
+
+
+def _refine_bases(
+    sample: np.ndarray,
+    bases: np.ndarray,
+    angles: np.ndarray,
+    max_iterations: int,
+    deadline: Optional[float],
+):
+    """Refines bases (in place) with rotations by angles (per basis, halved when no rotation improves it)
+    until all angles fall below APPROX_MIN_ANGLE, after max_iterations steps or at the deadline"""
+    volumes = np.array([np.prod(np.ptp(sample @ basis.T, axis=0)) for basis in bases])
+    axes = np.concatenate((REFINE_AXES, REFINE_AXES))
+    signs = np.repeat((1.0, -1.0), len(REFINE_AXES))
+
+    for _ in range(max_iterations):
+        if (angles < APPROX_MIN_ANGLE).all():
+            return
+        if deadline is not None and default_timer() > deadline:
+            return
+        # Rotated candidates of all seeds in one rotating_calipers call, a seed keeps its basis
+        # and halves its angle if no rotation improves it
+        rotations = axis_angle_matrices(
+            np.tile(axes, (len(bases), 1)), np.outer(angles, signs).ravel()
+        )
+        candidates = bases.repeat(len(axes), axis=0) @ rotations.transpose(0, 2, 1)
+        for seed in range(len(bases)):
+            seed_candidates = candidates[seed * len(axes) : (seed + 1) * len(axes)]
+            basis, bb_max, bb_min = rotating_calipers(sample, seed_candidates)
+            volume = np.prod(bb_max - bb_min)
+            if volume < volumes[seed]:
+                bases[seed] = basis
+                volumes[seed] = volume
+            else:
+                angles[seed] /= 2.0
 
-    with scoped_timer("Calculating Convex-Hull"):
-        chull_out = bmesh.ops.convex_hull(bm, input=bm.verts, use_existing_faces=False)
 
-    chull_geom = chull_out["geom"]
-    chull_points = np.array(
-        [bmelem.co for bmelem in chull_geom if isinstance(bmelem, bmesh.types.BMVert)]
+def approx_min_bounding_box(
+    points: np.ndarray,
+    max_iterations: int = 100,
+    time_budget: float = None,
+    num_directions: int = APPROX_NUM_DIRECTIONS,
+):
+    """Approximate minimum volume bounding box of points with shape (num_points, 3),
+    seed bases (see _seed_bases, plus the exact box of the sample hull) are refined with small rotations
+    on a hull subsample (extreme points in num_directions directions, no full convex hull is built),
+    every seed box is measured on all points before and after each refinement round and the best one
+    is returned, points outside the sample box of a seed that support its box are added to the sample
+    and refinement continues with smaller rotations (up to APPROX_MAX_ROUNDS rounds), each round stops
+    when the rotation angle falls below APPROX_MIN_ANGLE or after max_iterations steps,
+    time_budget (seconds) counts from the call and also cuts the extreme point search and skips the
+    sample hull seed, the principal axes, one strided subset of the extreme point search
+    and one pass over all points per seed always run (the box always contains all points),
+    the result is never worse than the best unrefined seed box, the volume excess over min_bounding_box
+    is empirical (at most 0.01% on rotated anisotropic Gaussian clouds, boxes and noisy ellipsoids,
+    often negative since min_bounding_box only tries boxes flush with a hull face), not a guaranteed bound,
+    returns the basis (rows are the box axes) and the box maximum and minimum in its coordinates"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    deadline = None if time_budget is None else default_timer() + time_budget
+    pca = principal_axes(points)
+    normal = planar_normal(points, axes=pca)
+    if normal is not None:
+        return min_bounding_box_locked_axis(points, normal)
+
+    # Fibonacci directions cover the sphere, so half of them are enough with argmin and argmax
+    sample = _approx_sample(points, fibonacci_sphere(num_directions // 2), deadline)
+
+    bases = _seed_bases(pca, sample)
+    if deadline is None or default_timer() < deadline:
+        # Exact box of the sample hull, refining the other seeds often ends in a local minimum
+        bases = np.concatenate((bases, _sample_hull_basis(sample)[np.newaxis]))
+    angles = np.full(len(bases), APPROX_START_ANGLE)
+    best_volume = np.inf
+    # The unrefined seeds are measured first, so refinement (that only sees the sample) and a larger
+    # budget never give a box worse than the best seed box
+    for round_index in range(APPROX_MAX_ROUNDS + 1):
+        # Every seed is measured on all points, the best box of the sample is not the best box
+        # of all points if the sample misses supports, points outside a seed's sample box are added
+        supports = []
+        for basis in bases:
+            # Coordinates as rows (shape (3, num_points)), reductions along contiguous rows are fast
+            rot_points = basis @ points.T
+            bb_max = rot_points.max(axis=1)
+            bb_min = rot_points.min(axis=1)
+            volume = np.prod(bb_max - bb_min)
+            if volume < best_volume:
+                best_volume = volume
+                best = basis.copy(), bb_max, bb_min
+
+            rot_sample = sample @ basis.T
+            outside_max = bb_max > rot_sample.max(axis=0)
+            outside_min = bb_min < rot_sample.min(axis=0)
+            supports.append(rot_points.argmax(axis=1)[outside_max])
+            supports.append(rot_points.argmin(axis=1)[outside_min])
+        supports = np.unique(np.concatenate(supports))
+
+        if round_index == APPROX_MAX_ROUNDS or (round_index and not len(supports)):
+            break
+        if deadline is not None and default_timer() > deadline:
+            break
+        sample = np.concatenate((sample, points[supports]))
+        if round_index:
+            # Refined seeds only move slightly with the added points
+            angles[:] = APPROX_RESTART_ANGLE
+        _refine_bases(sample, bases, angles, max_iterations, deadline)
+
+    return best
+
+
+def validate_approx_min_bounding_box(point_sets, **kwargs):
+    """Compares approx_min_bounding_box (called with kwargs) against min_bounding_box for every point array
+    of point_sets, prints a summary and returns the relative volume excess of each approximate box"""
+    excess = []
+    exact_seconds = 0.0
+    approx_seconds = 0.0
+    for points in point_sets:
+        t0 = default_timer()
+        _, bb_max, bb_min = min_bounding_box(points)
+        t1 = default_timer()
+        _, approx_max, approx_min = approx_min_bounding_box(points, **kwargs)
+        t2 = default_timer()
+        exact_seconds += t1 - t0
+        approx_seconds += t2 - t1
+        excess.append(np.prod(approx_max - approx_min) / np.prod(bb_max - bb_min) - 1.0)
+
+    excess = np.array(excess)
+    print(
+        f"{len(excess)} point sets, volume excess mean {excess.mean():.2%}, max {excess.max():.2%}, "
+        f"exact {exact_seconds:.3f} seconds, approximate {approx_seconds:.3f} seconds"
     )
+    return excess
 
-    # Create object from Convex-Hull (for debugging)
-    if DEBUG:
-        with scoped_timer("Deleting non Convex-Hull edges and faces"):
-            for face in set(bm.faces) - set(chull_geom):
-                bm.faces.remove(face)
-            for edge in set(bm.edges) - set(chull_geom):
-                bm.edges.remove(edge)
-
-        chull_mesh = bpy.data.meshes.new(obj.name + "_convex_hull")
-        bm.to_mesh(chull_mesh)
-        chull_obj = bpy.data.objects.new(chull_mesh.name, chull_mesh)
-        chull_obj.matrix_world = obj.matrix_world
-        bpy.context.scene.collection.objects.link(chull_obj)
 
-    bases = []
+def box_frame(basis: np.ndarray, bb_max: np.ndarray, bb_min: np.ndarray):
+    """Converts a box given in the coordinates of basis (rows are the box axes)
+    to its center, axes and extents (edge lengths along the axes)"""
+    return (bb_max + bb_min) / 2 @ basis, basis, bb_max - bb_min
 
-    with scoped_timer("Building list of bases"):
-        for elem in chull_geom:
-            if not isinstance(elem, bmesh.types.BMFace):
-                continue
-            if len(elem.verts) != 3:
-                continue
 
-            face_normal = elem.normal
-            if np.allclose(face_normal, 0, atol=0.00001):
-                continue
+def _bounding_box_jobs(
+    query_points: np.ndarray,
+    verts: np.ndarray,
+    vert_starts: np.ndarray,
+    vert_counts: np.ndarray,
+    approximate: bool,
+):
+    """Shard function for map_shards, query_points are job indices, returns centers, axes and extents"""
+    find_box = approx_min_bounding_box if approximate else min_bounding_box
+    frames = [
+        box_frame(*find_box(verts[vert_starts[job] : vert_starts[job] + vert_counts[job]]))
+        for job in query_points.tolist()
+    ]
+    if not frames:
+        return np.empty((0, 3)), np.empty((0, 3, 3)), np.empty((0, 3))
+    return tuple(np.stack(arrays) for arrays in zip(*frames))
+
+
+def _cache_key(points: np.ndarray, approximate: bool):
+    """Content hash of a vertex buffer and the mode"""
+    digest = hashlib.sha1(b"approximate" if approximate else b"exact")
+    digest.update(np.ascontiguousarray(points, dtype=np.float64).tobytes())
+    return digest.hexdigest()
 
-            for e in elem.edges:
-                v0, v1 = e.verts
-                edge_vec = (v0.co - v1.co).normalized()
-                co_tangent = face_normal.cross(edge_vec)
-                basis = (edge_vec, co_tangent, face_normal)
-                bases.append(basis)
 
-    with scoped_timer("Finding minimum volume basis"):
-        bb_basis, bb_max, bb_min = rotating_calipers(chull_points, bases)
+def min_bounding_boxes(
+    point_arrays: Sequence[npt.ArrayLike],
+    approximate: bool = False,
+    num_workers: Optional[int] = 1,
+    cache_dir: Optional[str] = None,
+):
+    """Minimum bounding boxes of many vertex arrays (each with shape (num_points, 3)),
+    approximate uses approx_min_bounding_box, boxes are computed on num_workers processes
+    (all CPUs if None, inline if 1), with cache_dir every box is stored in a .npz file named by
+    the hash of its vertex buffer and loaded instead of recomputed,
+    returns centers (num_arrays, 3), axes (num_arrays, 3, 3) (rows are the box axes)
+    and extents (num_arrays, 3)"""
+    point_arrays = [np.asarray(points, dtype=np.float64).reshape(-1, 3) for points in point_arrays]
+    centers = np.empty((len(point_arrays), 3))
+    axes = np.empty((len(point_arrays), 3, 3))
+    extents = np.empty((len(point_arrays), 3))
 
-    bm.free()
+    missing = list(range(len(point_arrays)))
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        keys = [_cache_key(points, approximate) for points in point_arrays]
+        missing = []
+        for i, key in enumerate(keys):
+            path = os.path.join(cache_dir, key + ".npz")
+            if not os.path.exists(path):
+                missing.append(i)
+                continue
+            with np.load(path) as cached:
+                centers[i], axes[i], extents[i] = cached["center"], cached["axes"], cached["extents"]
+
+    if missing:
+        # Vertex arrays are packed into one buffer, every job reads its own range
+        vert_counts = np.array([len(point_arrays[i]) for i in missing], dtype=np.int64)
+        vert_starts = np.cumsum(vert_counts) - vert_counts
+        centers[missing], axes[missing], extents[missing] = map_shards(
+            _bounding_box_jobs,
+            np.arange(len(missing)),
+            {
+                "verts": np.concatenate([point_arrays[i] for i in missing]),
+                "vert_starts": vert_starts,
+                "vert_counts": vert_counts,
+            },
+            num_workers=num_workers,
+            approximate=approximate,
+        )
+
+    if cache_dir is not None:
+        for i in missing:
+            # Write to a unique temporary file then rename, concurrent runs never read a partial file
+            # or write to the same file
+            path = os.path.join(cache_dir, keys[i] + ".npz")
+            with tempfile.NamedTemporaryFile(dir=cache_dir, suffix=".tmp", delete=False) as f:
+                np.savez(f, center=centers[i], axes=axes[i], extents=extents[i])
+            os.replace(f.name, path)
 
-    bb_basis_mat = bb_basis.T
+    return centers, axes, extents
 
-    bb_dim = bb_max - bb_min
-    bb_center = (bb_max + bb_min) / 2
 
+def create_bounding_box_object(obj, center: np.ndarray, axes: np.ndarray, extents: np.ndarray):
+    """Creates a wireframe box object in the local space of obj (rows of axes are the box axes)"""
     mat = (
-        Matrix.Translation(bb_center.dot(bb_basis))
-        @ Matrix(bb_basis_mat).to_4x4()
-        @ Matrix(np.identity(3) * bb_dim / 2).to_4x4()
+        Matrix.Translation(center)
+        @ Matrix(axes.T).to_4x4()
+        @ Matrix(np.identity(3) * extents / 2).to_4x4()
     )
 
     bb_mesh = bpy.data.meshes.new(obj.name + "_minimum_bounding_box")
@@ -122,6 +490,46 @@ def obj_rotating_calipers(obj):
     bb_obj.display_type = "WIRE"
     bb_obj.matrix_world = obj.matrix_world
     bpy.context.scene.collection.objects.link(bb_obj)
+    return bb_obj
+
+
+def objs_min_bounding_boxes(
+    objs,
+    approximate: bool = False,
+    num_workers: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    create_objects: bool = False,
+):
+    """min_bounding_boxes of the evaluated meshes of objs in local space,
+    create_objects adds a wireframe box object for every object"""
+    from .mesh_arrays import object_mesh_arrays
+
+    point_arrays = [object_mesh_arrays(obj, world_space=False)[0] for obj in objs]
+    centers, axes, extents = min_bounding_boxes(point_arrays, approximate, num_workers, cache_dir)
+    if create_objects:
+        for obj, center, box_axes, box_extents in zip(objs, centers, axes, extents):
+            create_bounding_box_object(obj, center, box_axes, box_extents)
+    return centers, axes, extents
+
+
+def obj_rotating_calipers(obj):
+    from .mesh_arrays import mesh_from_arrays, object_mesh_arrays
+
+    verts, _, _ = object_mesh_arrays(obj, world_space=False)
+
+    # Create object from Convex-Hull (for debugging)
+    if DEBUG:
+        hull_points, hull_faces, _, _ = convex_hull(verts)
+        chull_mesh = mesh_from_arrays(hull_points, hull_faces, obj.name + "_convex_hull")
+        chull_obj = bpy.data.objects.new(chull_mesh.name, chull_mesh)
+        chull_obj.matrix_world = obj.matrix_world
+        bpy.context.scene.collection.objects.link(chull_obj)
+
+    with scoped_timer("Calculating minimum bounding box"):
+        bb_basis, bb_max, bb_min = min_bounding_box(verts)
+
+    create_bounding_box_object(obj, *box_frame(bb_basis, bb_max, bb_min))
 
 
-obj_rotating_calipers(bpy.context.object)
+if __name__ == "__main__":
+    obj_rotating_calipers(bpy.context.object)
@@ -1,40 +1,321 @@
-from typing import List
-
 import bmesh
 import bpy
 import numpy as np
-from mathutils import Vector
-from mathutils.bvhtree import BVHTree
-from mathutils.geometry import intersect_point_tri
-
-
-def _bm_grow_untagged_manifold(seed_face: bmesh.types.BMFace):
-    """Flood fill untagged and linked faces that are connected via manifold edges starting from a seed face, tags those faces and returns them"""
-    faces = [seed_face]
-    e: bmesh.types.BMEdge
-    lf: bmesh.types.BMFace
-    for f in faces:
-        for e in f.edges:
-            if e.is_manifold:
-                for lf in e.link_faces:
-                    if lf != f:
-                        if not lf.tag:
-                            faces.append(lf)
-                            lf.tag = True
-    return faces
-
-
-def get_manifold_patches(bm: bmesh.types.BMesh):
-    manifold_patches: List[List[bmesh.types.BMFace]] = []
-    for f in bm.faces:
-        f.tag = False
-    for f in bm.faces:
-        if not f.tag:
-            # We could yield instead
-            # but tag could be modifed after yield
-            # so better to store results in a list
-            manifold_patches.append(_bm_grow_untagged_manifold(f))
-    return manifold_patches
+import numpy.typing as npt
+
+from ..connected_components import connected_components
+from ..triangle_mesh import TriangleMesh
+from ..volume_sampling.bvh import RAY_BLOCK_SIZE, BVH, box_sq_distance, closest_point_tri
+
+
+def get_manifold_patches(faces: np.ndarray):
+    """Labels faces that are connected via manifold edges (edges with exactly two faces),
+    faces is expected to be an int array with shape (num_faces, 3), returns a patch label per face"""
+    num_faces = len(faces)
+    edges = np.sort(faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2).astype(np.int64), axis=1)
+    edge_keys = edges[:, 0] * (int(faces.max()) + 1) + edges[:, 1]
+    edge_faces = np.repeat(np.arange(num_faces), 3)
+
+    # Sorting edge keys groups the faces of each edge, manifold edges form runs of exactly two
+    order = np.argsort(edge_keys, kind="stable")
+    edge_keys = edge_keys[order]
+    edge_faces = edge_faces[order]
+    starts = np.flatnonzero(np.r_[True, edge_keys[1:] != edge_keys[:-1]])
+    counts = np.diff(np.r_[starts, len(edge_keys)])
+    manifold_starts = starts[counts == 2]
+    face_pairs = np.stack((edge_faces[manifold_starts], edge_faces[manifold_starts + 1]), axis=1)
+
+    return connected_components(num_faces, face_pairs)
+
+
+# Barycentric coordinates below this mark a closest point on an edge or vertex of its face
+FEATURE_TOLERANCE = 1e-9
+
+
+def _reduce_by_key(keys: np.ndarray, bounds_min: np.ndarray, bounds_max: np.ndarray):
+    """Merges boxes with equal keys, returns sorted unique keys and their enclosing boxes"""
+    if len(keys) == 0:
+        return keys, bounds_min, bounds_max
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return (
+        keys[starts],
+        np.minimum.reduceat(bounds_min[order], starts, axis=0),
+        np.maximum.reduceat(bounds_max[order], starts, axis=0),
+    )
+
+
+def _lookup(sorted_keys: np.ndarray, keys: np.ndarray):
+    """Index of every key in sorted_keys, -1 for missing keys"""
+    ids = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return np.where(sorted_keys[ids] == keys, ids, -1)
+
+
+class PatchBVH:
+    """One BVH over all faces with bounds per (node, patch) entry, so a single traversal finds the closest
+    face of every patch, and angle weighted pseudo normals per patch (per face, edge and vertex),
+    the sign of the offset to the closest point along its pseudo normal tells front from back
+    also when the closest point is on an edge or vertex shared by faces with different normals"""
+
+    __slots__ = (
+        "bvh",
+        "patches",
+        "num_patches",
+        "entry_keys",
+        "entry_min",
+        "entry_max",
+        "entry_patches",
+        "entry_leaves",
+        "entry_children",
+        "root_entries",
+        "edge_keys",
+        "edge_normals",
+        "vertex_keys",
+        "vertex_normals",
+    )
+
+    def __init__(self, mesh: TriangleMesh, patches: np.ndarray):
+        self.bvh = BVH(mesh)
+        self.patches = np.asarray(patches, dtype=np.int64)
+        self.num_patches = num_patches = int(self.patches.max()) + 1
+
+        # Entries of the leaves, then merged into the entries of their parents up to the root,
+        # entry keys are node * num_patches + patch
+        bvh = self.bvh
+        parents = np.full(bvh.num_nodes, -1, dtype=np.int64)
+        inner = np.flatnonzero(~bvh.is_leaf(np.arange(bvh.num_nodes)))
+        parents[bvh.child[inner]] = inner
+        parents[bvh.child[inner] + 1] = inner
+        leaves = np.flatnonzero(bvh.is_leaf(np.arange(bvh.num_nodes)))
+        nodes, tris = bvh.expand_leaves(leaves, leaves)
+        level = _reduce_by_key(
+            nodes * num_patches + self.patches[tris], mesh.bounds_min[tris], mesh.bounds_max[tris]
+        )
+        levels = []
+        while len(level[0]):
+            levels.append(level)
+            keys, bounds_min, bounds_max = level
+            level_parents = parents[keys // num_patches]
+            has_parent = level_parents >= 0
+            level = _reduce_by_key(
+                level_parents[has_parent] * num_patches + keys[has_parent] % num_patches,
+                bounds_min[has_parent],
+                bounds_max[has_parent],
+            )
+        # Leaves at different depths reach a node in different levels
+        self.entry_keys, self.entry_min, self.entry_max = _reduce_by_key(
+            *(np.concatenate(arrays) for arrays in zip(*levels))
+        )
+        entry_nodes = self.entry_keys // num_patches
+        self.entry_patches = self.entry_keys % num_patches
+        self.entry_leaves = bvh.is_leaf(entry_nodes)
+        # Entries of the same patch in both children, -1 if the child has no faces of the patch
+        children = bvh.child[entry_nodes, np.newaxis] + np.arange(2)
+        self.entry_children = _lookup(
+            self.entry_keys, children * num_patches + self.entry_patches[:, np.newaxis]
+        )
+        self.entry_children[self.entry_leaves] = -1
+
+        # A small patch has a chain of entries with a single child from its node up to the root,
+        # children point past such chains to the first entry with two children or a leaf
+        single = (self.entry_children >= 0).sum(axis=1) == 1
+        skip = np.arange(len(self.entry_keys))
+        skip[single] = self.entry_children[single].max(axis=1)
+        while True:
+            jumped = skip[skip]
+            if np.array_equal(jumped, skip):
+                break
+            skip = jumped
+        self.entry_children = np.where(self.entry_children >= 0, skip[self.entry_children], -1)
+        self.root_entries = skip[:num_patches]
+
+        faces = mesh.faces.astype(np.int64)
+        face_patches = self.patches[:, np.newaxis]
+        normals = mesh.normals
+
+        # Sum of unit normals of the faces of the same patch around each edge
+        edges = np.sort(faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 3, 2), axis=2)
+        edge_keys = (edges[:, :, 0] * len(mesh.verts) + edges[:, :, 1]) * num_patches + face_patches
+        self.edge_keys, self.edge_normals = self._sum_by_key(
+            edge_keys.ravel(), np.repeat(normals, 3, axis=0)
+        )
+
+        # Unit normals weighted by the corner angle of each face of the same patch at the vertex
+        corners = mesh.tri_verts
+        angles = np.empty((len(faces), 3))
+        for i in range(3):
+            a = corners[:, (i + 1) % 3] - corners[:, i]
+            b = corners[:, (i + 2) % 3] - corners[:, i]
+            angles[:, i] = np.arctan2(np.linalg.norm(np.cross(a, b), axis=1), (a * b).sum(axis=1))
+        self.vertex_keys, self.vertex_normals = self._sum_by_key(
+            (faces * num_patches + face_patches).ravel(),
+            (angles[:, :, np.newaxis] * normals[:, np.newaxis]).reshape(-1, 3),
+        )
+
+    @staticmethod
+    def _sum_by_key(keys: np.ndarray, values: np.ndarray):
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        return keys[starts], np.add.reduceat(values[order], starts, axis=0)
+
+    def closest_faces(self, points: np.ndarray):
+        """Closest point on every patch for each point (shape (num_points, 3)), returns closest points
+        with shape (num_points, num_patches, 3) and face indices with shape (num_points, num_patches)"""
+        bvh = self.bvh
+        num_patches = self.num_patches
+        num_points = len(points)
+        best_sq_distances = np.full(num_points * num_patches, np.inf)
+        best_points = np.empty((num_points * num_patches, 3))
+        best_faces = np.full(num_points * num_patches, -1, dtype=np.int64)
+
+        def entry_sq_distances(pair_points, pair_entries):
+            return box_sq_distance(
+                points[pair_points], self.entry_min[pair_entries], self.entry_max[pair_entries]
+            )
+
+        def update(pair_points, pair_entries):
+            # Faces of the leaf that belong to the patch of the entry (at least one for every entry)
+            leaves = self.entry_keys[pair_entries] // num_patches
+            pair_ids, tris = bvh.expand_leaves(np.arange(len(pair_points)), leaves)
+            own = self.patches[tris] == self.entry_patches[pair_entries][pair_ids]
+            pair_ids = pair_ids[own]
+            tris = tris[own]
+            tri_points = points[pair_points[pair_ids]]
+            candidates = closest_point_tri(tri_points, bvh.mesh.tri_verts_of(tris))
+            sq_distances = ((candidates - tri_points) ** 2).sum(axis=1)
+
+            # Closest candidate per pair, the faces of each pair are contiguous
+            starts = np.flatnonzero(np.r_[True, pair_ids[1:] != pair_ids[:-1]])
+            minima = np.minimum.reduceat(sq_distances, starts)
+            counts = np.diff(np.r_[starts, len(pair_ids)])
+            is_min = np.flatnonzero(sq_distances == np.repeat(minima, counts))
+            closest = is_min[np.r_[True, pair_ids[is_min[1:]] != pair_ids[is_min[:-1]]]]
+
+            # Closest pair per (point, patch) slot, first occurrence after sorting by distance
+            slots = pair_points * num_patches + self.entry_patches[pair_entries]
+            order = np.lexsort((minima, slots))
+            slots = slots[order]
+            first = np.ones(len(slots), dtype=bool)
+            first[1:] = slots[1:] != slots[:-1]
+            first &= minima[order] < best_sq_distances[slots]
+            closest = closest[order][first]
+            best_sq_distances[slots[first]] = sq_distances[closest]
+            best_points[slots[first]] = candidates[closest]
+            best_faces[slots[first]] = tris[closest]
+
+        pair_points = np.repeat(np.arange(num_points), num_patches)
+        pair_entries = np.tile(self.root_entries, num_points)
+
+        # Greedy descent to the nearest leaf of each patch gives every slot a tight initial bound
+        entries = pair_entries.copy()
+        inner = np.flatnonzero(~self.entry_leaves[entries])
+        while len(inner):
+            children = self.entry_children[entries[inner]]
+            distances = np.where(
+                children >= 0,
+                entry_sq_distances(np.repeat(pair_points[inner], 2), children.ravel()).reshape(
+                    -1, 2
+                ),
+                np.inf,
+            )
+            entries[inner] = children[np.arange(len(inner)), np.argmin(distances, axis=1)]
+            inner = inner[~self.entry_leaves[entries[inner]]]
+        update(pair_points, entries)
+
+        # Traversal frontier of (point, entry) pairs, pruned with the bound of the slot of the entry
+        while len(pair_points):
+            slots = pair_points * num_patches + self.entry_patches[pair_entries]
+            keep = entry_sq_distances(pair_points, pair_entries) < best_sq_distances[slots]
+            pair_points = pair_points[keep]
+            pair_entries = pair_entries[keep]
+
+            leaf = self.entry_leaves[pair_entries]
+            if leaf.any():
+                update(pair_points[leaf], pair_entries[leaf])
+
+            children = self.entry_children[pair_entries[~leaf]].T.ravel()
+            pair_points = np.tile(pair_points[~leaf], 2)[children >= 0]
+            pair_entries = children[children >= 0]
+
+        return (
+            best_points.reshape(num_points, num_patches, 3),
+            best_faces.reshape(num_points, num_patches),
+        )
+
+    def pseudo_normals(self, closest_points: np.ndarray, faces: np.ndarray):
+        """Face normal for closest points inside their face, edge or vertex pseudo normal
+        (over the faces of the same patch) otherwise"""
+        mesh = self.bvh.mesh
+        num_patches = self.num_patches
+        tri_verts = mesh.tri_verts_of(faces)
+        area_normals = mesh.area_normals[faces]
+        sq_norms = np.maximum((area_normals * area_normals).sum(axis=1), 1e-300)
+        face_patches = self.patches[faces]
+
+        # Barycentric coordinate of each vertex, the sub-triangle area opposite to it
+        barycentrics = np.empty((len(faces), 3))
+        for i in range(3):
+            a = tri_verts[:, (i + 1) % 3]
+            b = tri_verts[:, (i + 2) % 3]
+            barycentrics[:, i] = (
+                0.5 * (np.cross(b - a, closest_points - a) * area_normals).sum(axis=1) / sq_norms
+            )
+        on_feature = barycentrics < FEATURE_TOLERANCE
+        num_zero = on_feature.sum(axis=1)
+
+        result = area_normals
+        # On an edge, the zero coordinate is the one of the vertex opposite to it
+        on_edge = np.flatnonzero(num_zero == 1)
+        if len(on_edge):
+            opposite = np.argmax(on_feature[on_edge], axis=1)
+            face_verts = mesh.faces[faces[on_edge]].astype(np.int64)
+            rows = np.arange(len(on_edge))
+            edges = np.sort(
+                np.stack(
+                    (face_verts[rows, (opposite + 1) % 3], face_verts[rows, (opposite + 2) % 3]),
+                    axis=1,
+                ),
+                axis=1,
+            )
+            edge_keys = (edges[:, 0] * len(mesh.verts) + edges[:, 1]) * num_patches
+            edge_ids = np.searchsorted(self.edge_keys, edge_keys + face_patches[on_edge])
+            result[on_edge] = self.edge_normals[edge_ids]
+        # At a vertex, the only nonzero coordinate is the one of that vertex
+        at_vertex = np.flatnonzero(num_zero >= 2)
+        if len(at_vertex):
+            corner = np.argmax(barycentrics[at_vertex], axis=1)
+            verts = mesh.faces[faces[at_vertex], corner].astype(np.int64)
+            vertex_ids = np.searchsorted(
+                self.vertex_keys, verts * num_patches + face_patches[at_vertex]
+            )
+            result[at_vertex] = self.vertex_normals[vertex_ids]
+        return result
+
+
+def is_inside_batch(query_points: npt.ArrayLike, patch_bvh: PatchBVH):
+    """A point is inside if it lies behind the closest face of any patch,
+    query_points is expected to be a 2D NumPy array with shape (num_points, 3),
+    returns inside flags and the first patch each point is behind (-1 for outside points)"""
+    query_points = np.asarray(query_points, dtype=np.float64).reshape(-1, 3)
+    patch_ids = np.full(len(query_points), -1, dtype=np.int64)
+    # Blocks of RAY_BLOCK_SIZE (point, patch) slots bound the size of the traversal frontier
+    block_size = max(RAY_BLOCK_SIZE // patch_bvh.num_patches, 1)
+    for start in range(0, len(query_points), block_size):
+        points = query_points[start : start + block_size]
+        closest_points, faces = patch_bvh.closest_faces(points)
+        closest_points = closest_points.reshape(-1, 3)
+        faces = faces.ravel()
+        pair_points = np.repeat(points, patch_bvh.num_patches, axis=0)
+        normals = patch_bvh.pseudo_normals(closest_points, faces)
+        behind = (((closest_points - pair_points) * normals).sum(axis=1) > 0).reshape(
+            len(points), patch_bvh.num_patches
+        )
+        patch_ids[start : start + len(points)] = np.where(
+            behind.any(axis=1), behind.argmax(axis=1), -1
+        )
+    return patch_ids >= 0, patch_ids
 
 
 if __name__ == "__main__":
@@ -46,50 +327,16 @@ if __name__ == "__main__":
     bm.from_object(obj, dg)
     # bm.transform(obj.matrix_world)
 
-    # non_manifold_verts = [v for v in bm.verts if not v.is_manifold]
-    # for v in non_manifold_verts:
-    #     bmesh.utils.vert_separate(v, v.link_edges)
-
-    # new_mesh = bpy.data.meshes.new("")
-    # bm.to_mesh(new_mesh)
-    # new_obj = bpy.data.objects.new("", new_mesh)
-    # bpy.context.scene.collection.objects.link(new_obj)
-
     bmesh.ops.triangulate(bm, faces=bm.faces)
     bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
 
-    bm.verts.ensure_lookup_table()
-    bm.faces.ensure_lookup_table()
-
-    trees: List[BVHTree] = []
-    verts = [v.co.copy() for v in bm.verts]
-
-    for i, faces in enumerate(get_manifold_patches(bm)):
-        polys = [[v.index for v in f.verts] for f in faces]
-        bvh = BVHTree.FromPolygons(verts, polys)
-        trees.append((bvh, polys, i))
-
-    # f: bmesh.types.BMFace
-    # for f in bm.faces:
-    #     verts = [v.co for v in f.verts]
-    #     v1 = verts[1] - verts[0]
-    #     v2 = verts[2] - verts[0]
-    #     n = v1.cross(v2)
-    #     assert n.dot(f.normal) > 0
-
+    mesh = TriangleMesh.from_bmesh(bm)
     bm.free()
 
-    def is_inside(query_point: Vector):
-        for bvh, polys in trees:
-            closest_point, normal, polygon_index, distance = bvh.find_nearest(
-                query_point
-            )
-            if closest_point:
-                if (closest_point - query_point).dot(normal) > 0:
-                    a, b, c = (verts[i] for i in polys[polygon_index])
-                    if intersect_point_tri(closest_point, a, b, c):
-                        return True
-        return False
+    # One tree over all faces with bounds per patch, points are tested against the closest face of every patch
+    patches = get_manifold_patches(mesh.faces)
+    patch_bvh = PatchBVH(mesh, patches)
+    print(f"{patch_bvh.num_patches} manifold patches")
 
     # Generate points inside bounding box
     min_bb = np.min(obj.bound_box, axis=0)
@@ -98,7 +345,8 @@ if __name__ == "__main__":
     query_points = rng.uniform(low=min_bb, high=max_bb, size=(1000, 3))
 
     # Filter points
-    filtered_points = [p for p in query_points if is_inside(Vector(p))]
+    inside, _ = is_inside_batch(query_points, patch_bvh)
+    filtered_points = query_points[inside]
 
     # Create point cloud
     out_mesh = bpy.data.meshes.new("")
@@ -9,7 +9,11 @@ import numpy as np
 from mathutils import Vector
 from mathutils.bvhtree import BVHTree
 
+from ..volume_sampling.direction_sets import direction_set, rotate_per_point
+from ..volume_sampling.parallel import map_shards, worker_cache
+
 RNG = np.random.default_rng()
+NUM_WORKERS = None  # Defaults to the number of CPUs
 
 
 def tet_solid_angle(O: Vector, A: Vector, B: Vector, C: Vector):
@@ -34,16 +38,49 @@ def scoped_timer(msg: str):
     print(f"{msg} finished in {t1 - t0:.2f} seconds.")
 
 
-# https://www.pbr-book.org/3ed-2018/Monte_Carlo_Integration/2D_Sampling_with_Multidimensional_Transformations#UniformlySamplingaHemisphere
-def uniform_sample_sphere(num_samples: int):
-    u = RNG.uniform(0, 1, (num_samples, 2))
-    z = 1 - 2 * u[:, 0]
-    r = np.sqrt(1 - z * z)
-    phi = 2 * np.pi * u[:, 1]
-    return np.c_[r * np.cos(phi), r * np.sin(phi), z]
+SPHERE_SAMPLES = direction_set("fibonacci", 100, RNG)
+
+
+def is_inside_batch(
+    query_points: np.ndarray,
+    verts: np.ndarray,
+    faces: np.ndarray,
+    directions: np.ndarray,
+    hole_tolerance: float = 0.0,
+):
+    """Batch version of is_inside used as shard function of map_shards,
+    the BVHTree is built once per worker from triangle vertex and index arrays,
+    every point casts its own random rotation of directions so the fixed set does not bias results"""
+    bvh: BVHTree = worker_cache(
+        "bvh", lambda: BVHTree.FromPolygons(verts.tolist(), faces.tolist())
+    )
+    tris = worker_cache(
+        "tris", lambda: [[Vector(verts[i]) for i in face] for face in faces]
+    )
 
+    # Clamp tolerance to [0.0, 1.0] range
+    hole_tolerance = max(min(hole_tolerance, 1.0), 0.0)
 
-SPHERE_SAMPLES = uniform_sample_sphere(100)
+    # Each worker needs its own random stream, forked workers would share RNG state
+    rng = worker_cache("rng", np.random.default_rng)
+    point_directions = rotate_per_point(directions, len(query_points), rng)
+
+    result = np.zeros(len(query_points), dtype=bool)
+    for i, query_point in enumerate(map(Vector, query_points)):
+        w = 0.0
+        n = 0
+        for direction in point_directions[i]:
+            polygon_index = bvh.ray_cast(query_point, direction)[2]
+            if polygon_index is not None:
+                w += tet_solid_angle(query_point, *tris[polygon_index])
+                n += 1
+
+        # Point is inside if either all rays hit something
+        # or that winding numbers are greate than a threshold
+        result[i] = (w >= ((1.0 - hole_tolerance) * 2.0 * math.pi)) or (
+            n == len(directions)
+        )
+    return result
 
 
 if __name__ == "__main__":
@@ -59,28 +96,9 @@ if __name__ == "__main__":
     bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
     bm.faces.ensure_lookup_table()
 
-    bvh: BVHTree = BVHTree.FromBMesh(bm)
     print(f"Number of mesh triangles = {len(bm.faces)}")
-
-    def is_inside(query_point: Vector, hole_tolerance: float = 0.0):
-        w = 0.0
-        n = 0
-        for direction in SPHERE_SAMPLES:
-            polygon_index = bvh.ray_cast(query_point, direction)[2]
-            if polygon_index:
-                face = bm.faces[polygon_index]
-                a, b, c = (v.co for v in face.verts)
-                w += tet_solid_angle(query_point, a, b, c)
-                n += 1
-
-        # Clamp tolerance to [0.0, 1.0] range
-        hole_tolerance = max(min(hole_tolerance, 1.0), 0.0)
-
-        # Point is inside if either all rays hit something
-        # or that winding numbers are greate than a threshold
-        return (w >= ((1.0 - hole_tolerance) * 2.0 * math.pi)) or (
-            n == len(SPHERE_SAMPLES)
-        )
+    verts = np.array([v.co for v in bm.verts])
+    faces = np.array([[v.index for v in f.verts] for f in bm.faces], dtype=np.int32)
 
     # Generate points inside bounding box
     min_bb = np.min(obj.bound_box, axis=0)
@@ -90,7 +108,14 @@ if __name__ == "__main__":
     with scoped_timer(
         f"Filtering {len(query_points)} points using Monte Carlo Winding Numbers Integration"
     ):
-        filtered_points = [p for p in query_points if is_inside(Vector(p))]
+        filtered_points = query_points[
+            map_shards(
+                is_inside_batch,
+                query_points,
+                {"verts": verts, "faces": faces, "directions": SPHERE_SAMPLES},
+                num_workers=NUM_WORKERS,
+            )
+        ]
 
     bm.free()
 
@@ -9,6 +9,8 @@ import numpy as np
 from mathutils import Vector
 from mathutils.bvhtree import BVHTree
 
+from ..volume_sampling.direction_sets import direction_set, rotate_per_point
+
 RNG = np.random.default_rng()
 
 
@@ -34,16 +36,7 @@ def scoped_timer(msg: str):
     print(f"{msg} finished in {t1 - t0:.2f} seconds.")
 
 
-# https://www.pbr-book.org/3ed-2018/Monte_Carlo_Integration/2D_Sampling_with_Multidimensional_Transformations#UniformlySamplingaHemisphere
-def uniform_sample_sphere(num_samples: int):
-    u = RNG.uniform(0, 1, (num_samples, 2))
-    z = 1 - 2 * u[:, 0]
-    r = np.sqrt(1 - z * z)
-    phi = 2 * np.pi * u[:, 1]
-    return np.c_[r * np.cos(phi), r * np.sin(phi), z]
-
-
-SPHERE_SAMPLES = uniform_sample_sphere(100)
+SPHERE_SAMPLES = direction_set("fibonacci", 100, RNG)
 
 
 if __name__ == "__main__":
@@ -62,9 +55,9 @@ if __name__ == "__main__":
     bvh: BVHTree = BVHTree.FromBMesh(bm)
     print(f"Number of mesh triangles = {len(bm.faces)}")
 
-    def is_inside(query_point: Vector, hole_tolerance: float = 0.0):
+    def is_inside(query_point: Vector, directions: np.ndarray, hole_tolerance: float = 0.0):
         w = 0.0
-        for direction in SPHERE_SAMPLES:
+        for direction in directions:
             polygon_index = bvh.ray_cast(query_point, direction)[2]
             if polygon_index:
                 face = bm.faces[polygon_index]
@@ -83,7 +76,11 @@ if __name__ == "__main__":
     with scoped_timer(
         f"Filtering {len(query_points)} points using Monte Carlo Winding Numbers Integration"
     ):
-        filtered_points = [p for p in query_points if is_inside(Vector(p))]
+        # A random rotation of the direction set per point, the fixed set alone would bias results
+        point_directions = rotate_per_point(SPHERE_SAMPLES, len(query_points), RNG)
+        filtered_points = [
+            p for p, directions in zip(query_points, point_directions) if is_inside(Vector(p), directions)
+        ]
 
     bm.free()
 
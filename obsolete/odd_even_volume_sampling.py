@@ -1,37 +1,47 @@
-import bmesh
 import bpy
 import numpy as np
 from mathutils import Vector
 from mathutils.bvhtree import BVHTree
 
+from ..mesh_arrays import object_mesh_arrays
+from ..volume_sampling.parallel import map_shards, worker_cache
+
+NUM_WORKERS = None  # Defaults to the number of CPUs
+
+
+def is_inside(query_point: Vector, bvh: BVHTree):
+    closest_point, *_ = bvh.find_nearest(query_point)
+    if closest_point is None:
+        return False
+    result = True
+    direction: Vector = (closest_point - query_point).normalized()
+    hit_point = closest_point
+    while True:
+        hit_point, *_ = bvh.ray_cast(
+            hit_point + 0.00001 * direction,
+            direction,
+        )
+        if hit_point is None:
+            break
+        result = not result
+
+    return result
+
+
+def is_inside_batch(query_points: np.ndarray, verts: np.ndarray, faces: np.ndarray):
+    """Batch version of is_inside used as shard function of map_shards,
+    the BVHTree is built once per worker from triangle vertex and index arrays"""
+    bvh: BVHTree = worker_cache(
+        "bvh", lambda: BVHTree.FromPolygons(verts.tolist(), faces.tolist())
+    )
+    return np.array([is_inside(p, bvh) for p in map(Vector, query_points)], dtype=bool)
+
+
 if __name__ == "__main__":
     obj = bpy.context.object
     assert obj.type == "MESH"
 
-    dg = bpy.context.evaluated_depsgraph_get()
-    bm = bmesh.new()
-    bm.from_object(obj, dg)
-    bm.transform(obj.matrix_world)
-    bvh: BVHTree = BVHTree.FromBMesh(bm)
-    bm.free()
-
-    def is_inside(query_point: Vector):
-        closest_point, *_ = bvh.find_nearest(query_point)
-        if closest_point is None:
-            return False
-        result = True
-        direction: Vector = (closest_point - query_point).normalized()
-        hit_point = closest_point
-        while True:
-            hit_point, *_ = bvh.ray_cast(
-                hit_point + 0.00001 * direction,
-                direction,
-            )
-            if hit_point is None:
-                break
-            result = not result
-
-        return result
+    verts, faces, _ = object_mesh_arrays(obj)
 
     # Generate points inside bounding box
     min_bb = np.min(obj.bound_box, axis=0)
@@ -39,7 +49,14 @@ if __name__ == "__main__":
     rng = np.random.default_rng()
     query_points = rng.uniform(low=min_bb, high=max_bb, size=(1000, 3))
 
-    filtered_points = [p for p in query_points if is_inside(Vector(p))]
+    filtered_points = query_points[
+        map_shards(
+            is_inside_batch,
+            query_points,
+            {"verts": verts, "faces": faces},
+            num_workers=NUM_WORKERS,
+        )
+    ]
 
     # Create point cloud
     points_mesh = bpy.data.meshes.new("")
@@ -0,0 +1,88 @@
+import numpy as np
+
+from .triangle_mesh import TriangleMesh
+
+# Batched triangle-triangle intersection, every (triangle, triangle) pair is tested at once:
+# triangle vertices are classified against the plane of the other triangle (Moller),
+# edges crossing the plane are cut there and cut points inside the other triangle are segment endpoints
+
+# References
+# https://web.stanford.edu/class/cs277/resources/papers/Moller1997b.pdf
+# https://hal.inria.fr/inria-00072100/document (Guigue-Devillers)
+
+# Number of triangle pairs processed together, bounds temporary memory
+PAIR_BLOCK_SIZE = 1 << 18
+
+# Relative tolerance of the point in triangle test, keeps cut points on shared edges
+INSIDE_EPSILON = 1e-9
+
+
+def _edge_plane_cuts(edge_tris: np.ndarray, plane_tris: np.ndarray, epsilon: float):
+    """Cuts the edges of edge_tris with the planes of plane_tris (both with shape (num_pairs, 3, 3)),
+    returns pair indices and cut points that lie inside the plane triangle"""
+    v0 = plane_tris[:, 0]
+    normals = np.cross(plane_tris[:, 1] - v0, plane_tris[:, 2] - v0)
+    # Signed plane distances (scaled by the normal length) of the edge triangle vertices
+    distances = np.einsum("pvk,pk->pv", edge_tris - v0[:, np.newaxis], normals)
+
+    # Edges (0, 1), (1, 2), (2, 0), edges lying in the plane (both distances zero) are not cut
+    next_distances = np.roll(distances, -1, axis=1)
+    crossing = (distances * next_distances <= 0.0) & (distances != next_distances)
+    pairs, edges = np.nonzero(crossing)
+
+    starts = edge_tris[pairs, edges]
+    ends = edge_tris[pairs, (edges + 1) % 3]
+    d0 = distances[pairs, edges]
+    d1 = next_distances[pairs, edges]
+    points = starts + (d0 / (d0 - d1))[:, np.newaxis] * (ends - starts)
+
+    # Same side test against every edge of the plane triangle
+    tris = plane_tris[pairs]
+    normals = normals[pairs]
+    tolerance = -epsilon * (normals * normals).sum(axis=1)
+    inside = np.ones(len(pairs), dtype=bool)
+    for i in range(3):
+        a = tris[:, i]
+        b = tris[:, (i + 1) % 3]
+        inside &= (np.cross(b - a, points - a) * normals).sum(axis=1) >= tolerance
+
+    return pairs[inside], points[inside]
+
+
+def tri_tri_intersect_batch(
+    tri_verts1: np.ndarray, tri_verts2: np.ndarray, epsilon: float = INSIDE_EPSILON
+):
+    """Intersects triangle pairs (tri_verts1[i], tri_verts2[i]), both arrays with shape (num_pairs, 3, 3),
+    returns a flat array of pair indices and the intersection points of those pairs with shape (num_points, 3),
+    points of a pair are consecutive (usually the two endpoints of the intersection segment,
+    cuts through shared vertices or edges can repeat a point), coplanar pairs give no points"""
+    pairs1, points1 = _edge_plane_cuts(tri_verts1, tri_verts2, epsilon)
+    pairs2, points2 = _edge_plane_cuts(tri_verts2, tri_verts1, epsilon)
+    pairs = np.concatenate((pairs1, pairs2))
+    points = np.concatenate((points1, points2))
+    order = np.argsort(pairs, kind="stable")
+    return pairs[order], points[order]
+
+
+def intersect_tri_pairs(
+    mesh1: TriangleMesh,
+    mesh2: TriangleMesh,
+    tri_pairs: np.ndarray,
+    epsilon: float = INSIDE_EPSILON,
+):
+    """Intersects triangles tri_pairs[:, 0] of mesh1 with triangles tri_pairs[:, 1] of mesh2
+    (e.g. the result of BVHTree.overlap), returns flat pair indices (rows of tri_pairs) and points"""
+    tri_pairs = np.asarray(tri_pairs, dtype=np.int64).reshape(-1, 2)
+    pair_ids = []
+    points = []
+    for start in range(0, len(tri_pairs), PAIR_BLOCK_SIZE):
+        block = tri_pairs[start : start + PAIR_BLOCK_SIZE]
+        block_pairs, block_points = tri_tri_intersect_batch(
+            mesh1.tri_verts_of(block[:, 0]), mesh2.tri_verts_of(block[:, 1]), epsilon
+        )
+        pair_ids.append(block_pairs + start)
+        points.append(block_points)
+
+    if not pair_ids:
+        return np.empty(0, dtype=np.int64), np.empty((0, 3))
+    return np.concatenate(pair_ids), np.concatenate(points)
@@ -0,0 +1,146 @@
+import numpy as np
+import numpy.typing as npt
+
+# Compact indexed triangle mesh, vertex locations are stored once and triangles reference them by index
+# (instead of the flattened (num_tris * 3, 3) array of duplicated vertex locations),
+# derived per triangle data is computed lazily and cached
+
+
+class TriangleMesh:
+    """Shared vertex array (num_verts, 3) and int32 triangle vertex indices (num_tris, 3)"""
+
+    __slots__ = (
+        "verts",
+        "faces",
+        "_edge_vecs",
+        "_area_normals",
+        "_areas",
+        "_normals",
+        "_centroids",
+        "_bounds_min",
+        "_bounds_max",
+    )
+
+    def __init__(self, verts: npt.ArrayLike, faces: npt.ArrayLike):
+        self.verts = np.ascontiguousarray(verts, dtype=np.float64).reshape(-1, 3)
+        self.faces = np.ascontiguousarray(faces, dtype=np.int32).reshape(-1, 3)
+        self.clear_cache()
+
+    @classmethod
+    def from_tri_corners(cls, tris: npt.ArrayLike):
+        """Creates a mesh from flattened triangle vertex locations with shape (num_tris * 3, 3),
+        layout used by calc_winding_number_vectorized, duplicated vertices are merged"""
+        tris = np.asarray(tris, dtype=np.float64)
+        assert len(tris.shape) == 2
+        assert tris.shape[1] == 3
+        assert (tris.shape[0] % 3) == 0
+        verts, faces = np.unique(tris, axis=0, return_inverse=True)
+        return cls(verts, faces.reshape(-1, 3))
+
+    @classmethod
+    def from_object(cls, obj, world_space: bool = True):
+        """Creates a mesh from the loop triangles of an evaluated Blender object"""
+        from .mesh_arrays import object_mesh_arrays
+
+        verts, faces, _ = object_mesh_arrays(obj, world_space)
+        return cls(verts, faces)
+
+    @classmethod
+    def from_bmesh(cls, bm):
+        """Creates a mesh from the loop triangles of a BMesh"""
+        bm.verts.index_update()
+        verts = np.array([v.co for v in bm.verts], dtype=np.float64)
+        faces = np.array(
+            [[loop.vert.index for loop in tri] for tri in bm.calc_loop_triangles()],
+            dtype=np.int32,
+        )
+        return cls(verts, faces)
+
+    def clear_cache(self):
+        """Must be called after modifying verts or faces in place"""
+        self._edge_vecs = None
+        self._area_normals = None
+        self._areas = None
+        self._normals = None
+        self._centroids = None
+        self._bounds_min = None
+        self._bounds_max = None
+
+    def __len__(self):
+        return len(self.faces)
+
+    @property
+    def num_tris(self):
+        return len(self.faces)
+
+    @property
+    def tri_verts(self):
+        """Vertex locations of each triangle with shape (num_tris, 3, 3), not cached"""
+        return self.verts[self.faces]
+
+    def tri_verts_of(self, tris: np.ndarray):
+        """Vertex locations of the given triangles with shape (len(tris), 3, 3)"""
+        return self.verts[self.faces[tris]]
+
+    @property
+    def tri_corners(self):
+        """Flattened vertex locations of each triangle with shape (num_tris * 3, 3), not cached"""
+        return self.tri_verts.reshape(-1, 3)
+
+    @property
+    def edge_vecs(self):
+        """Edge vectors (v1 - v0, v2 - v0) of each triangle with shape (num_tris, 2, 3)"""
+        if self._edge_vecs is None:
+            v0 = self.verts[self.faces[:, 0]]
+            self._edge_vecs = np.stack(
+                (self.verts[self.faces[:, 1]] - v0, self.verts[self.faces[:, 2]] - v0),
+                axis=1,
+            )
+        return self._edge_vecs
+
+    @property
+    def area_normals(self):
+        """Normals scaled by triangle area"""
+        if self._area_normals is None:
+            edge_vecs = self.edge_vecs
+            self._area_normals = 0.5 * np.cross(edge_vecs[:, 0], edge_vecs[:, 1])
+        return self._area_normals
+
+    @property
+    def areas(self):
+        if self._areas is None:
+            self._areas = np.linalg.norm(self.area_normals, axis=1)
+        return self._areas
+
+    @property
+    def normals(self):
+        """Unit normals, zero for degenerate triangles"""
+        if self._normals is None:
+            areas = self.areas[:, np.newaxis]
+            self._normals = np.divide(
+                self.area_normals,
+                areas,
+                out=np.zeros_like(self.area_normals),
+                where=areas > 0.0,
+            )
+        return self._normals
+
+    @property
+    def centroids(self):
+        if self._centroids is None:
+            self._centroids = self.tri_verts.mean(axis=1)
+        return self._centroids
+
+    @property
+    def bounds_min(self):
+        """Per triangle bounding box minimum"""
+        if self._bounds_min is None:
+            self._bounds_min = self.tri_verts.min(axis=1)
+        return self._bounds_min
+
+    @property
+    def bounds_max(self):
+        """Per triangle bounding box maximum"""
+        if self._bounds_max is None:
+            self._bounds_max = self.tri_verts.max(axis=1)
+        return self._bounds_max
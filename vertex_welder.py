@@ -0,0 +1,104 @@
+import numpy as np
+import numpy.typing as npt
+
+from .connected_components import connected_components
+
+# Tolerance aware vertex welding with a spatial hash, points are bucketed in cells of twice the tolerance
+# so every point within tolerance of a query lies in its own cell or the neighbors on the nearer side
+# of each axis (8 cells),
+# welded points get the id of an existing (canonical) vertex instead of a new vertex
+
+# Large primes for hashing integer cell coordinates, colliding cells only cost extra distance checks
+HASH_PRIMES = np.array([73856093, 19349663, 83492791], dtype=np.int64)
+
+# Whether the nearer neighbor is taken on each axis
+NEIGHBOR_SELECTION = np.array(
+    [(x, y, z) for x in range(2) for y in range(2) for z in range(2)], dtype=np.int64
+)
+
+
+def _expand_ranges(starts: np.ndarray, counts: np.ndarray):
+    """Returns the owner index and position of every element of the ranges [start, start + count)"""
+    owners = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, np.repeat(starts, counts) + offsets
+
+
+class VertexWelder:
+    """Canonical vertices are stored with their cell hash keys sorted for lookup with searchsorted"""
+
+    __slots__ = ("tolerance", "verts", "_keys", "_sorted_ids")
+
+    def __init__(self, tolerance: float = 1e-5):
+        assert tolerance > 0.0
+        self.tolerance = tolerance
+        self.verts = np.empty((0, 3))
+        self._keys = np.empty(0, dtype=np.int64)
+        self._sorted_ids = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.verts)
+
+    def _cells(self, points: np.ndarray):
+        return np.floor(points / (2.0 * self.tolerance)).astype(np.int64)
+
+    def _hash(self, cells: np.ndarray):
+        return (cells * HASH_PRIMES).sum(axis=-1)
+
+    def _near_pairs(
+        self, points: np.ndarray, keys: np.ndarray, sorted_ids: np.ndarray, verts: np.ndarray
+    ):
+        """Returns (point index, vertex id) pairs closer than tolerance, vertices are given by their
+        sorted hash keys with matching ids into verts"""
+        scaled = points / (2.0 * self.tolerance)
+        cells = np.floor(scaled).astype(np.int64)
+        sides = np.where(scaled - cells < 0.5, -1, 1)
+        point_ids = []
+        vert_ids = []
+        for selection in NEIGHBOR_SELECTION:
+            neighbor_keys = self._hash(cells + sides * selection)
+            starts = np.searchsorted(keys, neighbor_keys, side="left")
+            ends = np.searchsorted(keys, neighbor_keys, side="right")
+            owners, positions = _expand_ranges(starts, ends - starts)
+            candidates = sorted_ids[positions]
+            close = ((points[owners] - verts[candidates]) ** 2).sum(axis=1) <= self.tolerance**2
+            point_ids.append(owners[close])
+            vert_ids.append(candidates[close])
+        return np.concatenate(point_ids), np.concatenate(vert_ids)
+
+    def weld(self, points: npt.ArrayLike):
+        """Returns canonical vertex ids of points with shape (num_points, 3), points within tolerance
+        of an existing vertex get its id (the lowest if there are several), the remaining points are
+        clustered among themselves and every cluster becomes a new vertex at its first point"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        ids = np.full(len(points), -1, dtype=np.int64)
+
+        if len(self.verts):
+            point_ids, vert_ids = self._near_pairs(points, self._keys, self._sorted_ids, self.verts)
+            best = np.full(len(points), len(self.verts), dtype=np.int64)
+            np.minimum.at(best, point_ids, vert_ids)
+            found = best < len(self.verts)
+            ids[found] = best[found]
+
+        new = np.flatnonzero(ids == -1)
+        if len(new):
+            new_points = points[new]
+            keys = self._hash(self._cells(new_points))
+            order = np.argsort(keys, kind="stable")
+            point_ids, other_ids = self._near_pairs(new_points, keys[order], order, new_points)
+            # Clusters are connected components of the "within tolerance" graph
+            labels = connected_components(len(new), np.stack((point_ids, other_ids), axis=1))
+            first = np.unique(labels, return_index=True)[1]
+            ids[new] = len(self.verts) + labels
+            self._insert(new_points[first])
+
+        return ids
+
+    def _insert(self, verts: np.ndarray):
+        ids = np.arange(len(self.verts), len(self.verts) + len(verts))
+        self.verts = np.concatenate((self.verts, verts))
+        keys = np.concatenate((self._keys, self._hash(self._cells(verts))))
+        sorted_ids = np.concatenate((self._sorted_ids, ids))
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._sorted_ids = sorted_ids[order]
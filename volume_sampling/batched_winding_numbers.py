@@ -0,0 +1,201 @@
+import numpy as np
+import numpy.typing as npt
+
+from ..triangle_mesh import TriangleMesh
+
+# Vectorized over many points and all mesh triangles at once (like obsolete/vectorized_winding_numbers2.py),
+# but points and triangles are processed in tiles so that temporaries never exceed a memory budget,
+# temporaries are allocated once and reused between tiles
+
+# References
+# https://github.com/marmakoide/inside-3d-mesh/blob/master/is_inside_mesh.py
+# https://en.wikipedia.org/wiki/Solid_angle#Tetrahedron
+# https://igl.ethz.ch/projects/winding-number/robust-inside-outside-segmentation-using-generalized-winding-numbers-siggraph-2013-compressed-jacobson-et-al.pdf
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Number of float64 temporaries per (point, triangle) pair:
+# 3 shifted vertices (9), 3 norms, numerator, denominator and 2 scratch arrays
+_FLOATS_PER_PAIR = 16
+# Per triangle temporaries of a tile (vertex locations)
+_FLOATS_PER_TRI = 9
+
+
+def calc_tile_shape(num_points: int, num_tris: int, memory_budget: int = DEFAULT_MEMORY_BUDGET):
+    """Returns (points per tile, triangles per tile) that fit temporaries in memory_budget bytes"""
+    budget_floats = memory_budget // 8
+    tris_per_tile = max(
+        1, min(num_tris, budget_floats // (_FLOATS_PER_PAIR + _FLOATS_PER_TRI))
+    )
+    pair_floats = budget_floats - _FLOATS_PER_TRI * tris_per_tile
+    points_per_tile = max(
+        1, min(num_points, pair_floats // (_FLOATS_PER_PAIR * tris_per_tile))
+    )
+    return points_per_tile, tris_per_tile
+
+
+def _dot(x, y, out, scratch):
+    np.multiply(x[0], y[0], out=out)
+    for k in (1, 2):
+        np.multiply(x[k], y[k], out=scratch)
+        out += scratch
+    return out
+
+
+def calc_winding_numbers_batched(
+    query_points: npt.ArrayLike,
+    tris,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+):
+    """query_points is expected to be a 2D NumPy array with shape (num_points, 3),
+    tris is exepcted to be a TriangleMesh or a 2D NumPy array of vertex location of each triangle with shape (num_tris * 3, 3),
+    returns a boolean inside mask and the winding numbers (same units as calc_winding_number_vectorized, 2 pi inside),
+    assumes mesh already has consistent normals with positive volume everywhere inside"""
+    query_points = np.asarray(query_points, dtype=np.float64).reshape(-1, 3)
+    if isinstance(tris, TriangleMesh):
+        mesh = tris
+        num_tris = mesh.num_tris
+
+        def gather_tris(t0, t1):
+            return mesh.verts[mesh.faces[t0:t1]]
+
+    else:
+        tris = np.asarray(tris, dtype=np.float64)
+        assert len(tris.shape) == 2
+        assert tris.shape[1] == 3
+        assert (tris.shape[0] % 3) == 0
+        tri_verts = tris.reshape(-1, 3, 3)
+        num_tris = len(tri_verts)
+
+        def gather_tris(t0, t1):
+            return tri_verts[t0:t1]
+
+    num_points = len(query_points)
+
+    w = np.zeros(num_points)
+    if num_points == 0 or num_tris == 0:
+        return w >= np.pi, w
+
+    points_per_tile, tris_per_tile = calc_tile_shape(
+        num_points, num_tris, memory_budget
+    )
+
+    # Temporaries reused between tiles,
+    # triangles use (vertex, component, triangle) layout so that each component is contiguous
+    tri_components = np.empty((3, 3, tris_per_tile))
+    shifted = np.empty((3, 3, points_per_tile, tris_per_tile))
+    norms = np.empty((3, points_per_tile, tris_per_tile))
+    numerator = np.empty((points_per_tile, tris_per_tile))
+    denominator = np.empty((points_per_tile, tris_per_tile))
+    scratch1 = np.empty((points_per_tile, tris_per_tile))
+    scratch2 = np.empty((points_per_tile, tris_per_tile))
+
+    # Triangle tiles in the outer loop so that each one is gathered only once
+    for t0 in range(0, num_tris, tris_per_tile):
+        t1 = min(t0 + tris_per_tile, num_tris)
+        tile_tris = tri_components[:, :, : t1 - t0]
+        np.copyto(tile_tris, gather_tris(t0, t1).transpose(1, 2, 0))
+
+        for p0 in range(0, num_points, points_per_tile):
+            p1 = min(p0 + points_per_tile, num_points)
+            points = query_points[p0:p1]
+            tile = (slice(0, p1 - p0), slice(0, t1 - t0))
+
+            v = shifted[(slice(None), slice(None)) + tile]
+            n = norms[(slice(None),) + tile]
+            num = numerator[tile]
+            den = denominator[tile]
+            s1 = scratch1[tile]
+            s2 = scratch2[tile]
+
+            for i in range(3):
+                for k in range(3):
+                    np.subtract(
+                        tile_tris[i, k, np.newaxis],
+                        points[:, k, np.newaxis],
+                        out=v[i, k],
+                    )
+                np.sqrt(_dot(v[i], v[i], n[i], s1), out=n[i])
+
+            a, b, c = v
+
+            # numerator = a . (b x c)
+            np.multiply(b[1], c[2], out=s1)
+            np.multiply(b[2], c[1], out=s2)
+            s1 -= s2
+            np.multiply(a[0], s1, out=num)
+            np.multiply(b[2], c[0], out=s1)
+            np.multiply(b[0], c[2], out=s2)
+            s1 -= s2
+            s1 *= a[1]
+            num += s1
+            np.multiply(b[0], c[1], out=s1)
+            np.multiply(b[1], c[0], out=s2)
+            s1 -= s2
+            s1 *= a[2]
+            num += s1
+
+            # denominator = |a||b||c| + (a . b)|c| + (a . c)|b| + (b . c)|a|
+            np.multiply(n[0], n[1], out=den)
+            den *= n[2]
+            for x, y, z in ((a, b, 2), (a, c, 1), (b, c, 0)):
+                _dot(x, y, s1, s2)
+                s1 *= n[z]
+                den += s1
+
+            np.arctan2(num, den, out=num)
+            w[p0:p1] += num.sum(axis=1)
+
+    # Threshold at half the interior value, comparing against exactly 2 pi
+    # rejects some interior points due to floating point error
+    return w >= np.pi, w
+
+
+def is_inside_batch(
+    query_points: npt.ArrayLike,
+    tris,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+):
+    """Checks which points are inside mesh, returns a boolean mask"""
+    return calc_winding_numbers_batched(query_points, tris, memory_budget)[0]
+
+
+if __name__ == "__main__":
+    from contextlib import contextmanager
+    from timeit import default_timer
+
+    import bpy
+
+    from ..mesh_arrays import mesh_loop_triangles, mesh_vertex_coords
+
+    @contextmanager
+    def scoped_timer(msg: str):
+        t0 = default_timer()
+        yield
+        t1 = default_timer()
+        print(f"{msg} finished in {t1 - t0:.2f} seconds.")
+
+    obj = bpy.context.object
+    assert obj.type == "MESH"
+
+    # Generate points inside bounding box
+    min_bb = np.min(obj.bound_box, axis=0)
+    max_bb = np.max(obj.bound_box, axis=0)
+    rng = np.random.default_rng()
+    query_points = rng.uniform(low=min_bb, high=max_bb, size=(100000, 3))
+
+    mesh: bpy.types.Mesh = obj.data
+    tri_mesh = TriangleMesh(mesh_vertex_coords(mesh), mesh_loop_triangles(mesh))
+    print(f"Number of mesh triangles = {tri_mesh.num_tris}")
+
+    with scoped_timer(
+        f"Filtering {len(query_points)} points using batched Generalized Winding Numbers"
+    ):
+        is_inside, _ = calc_winding_numbers_batched(query_points, tri_mesh)
+        filtered_points = query_points[is_inside]
+
+    # Create point cloud
+    points_mesh = bpy.data.meshes.new("")
+    points_mesh.from_pydata(filtered_points, [], [])
+    points_obj = bpy.data.objects.new("", points_mesh)
+    bpy.context.scene.collection.objects.link(points_obj)
@@ -0,0 +1,509 @@
+import numpy as np
+
+from ..triangle_mesh import TriangleMesh
+
+# Flattened bounding volume hierarchy over triangles,
+# every node is a row in a set of NumPy arrays so that traversal can be vectorized over many queries
+
+LEAF_SIZE = 8
+
+# Number of rays traversed together, bounds the size of the traversal frontier
+RAY_BLOCK_SIZE = 16384
+
+# Minimum hit distance, avoids self intersections when rays start on the surface
+RAY_EPSILON = 1e-9
+
+
+def _range_reduce(ufunc: np.ufunc, values: np.ndarray, starts: np.ndarray, counts: np.ndarray):
+    """Reduces values[start:start + count] for each (start, count) pair in one vectorized call"""
+    # Appending a sentinel row allows using (start, end) pairs for ranges that end at the last element,
+    # the reductions of the (end, next start) gaps are discarded
+    padded = np.concatenate((values, values[:1]))
+    indices = np.empty(2 * len(starts), dtype=np.intp)
+    indices[0::2] = starts
+    indices[1::2] = starts + counts
+    return ufunc.reduceat(padded, indices, axis=0)[0::2]
+
+
+class BVH:
+    """Median split BVH, children of internal node i are child[i] and child[i] + 1,
+    leaves have child == -1, each node owns tri_order[tri_start:tri_start + tri_count]"""
+
+    __slots__ = (
+        "mesh",
+        "bounds_min",
+        "bounds_max",
+        "child",
+        "tri_start",
+        "tri_count",
+        "tri_order",
+    )
+
+    def __init__(self, mesh: TriangleMesh, leaf_size: int = LEAF_SIZE):
+        assert mesh.num_tris > 0
+        self.mesh = mesh
+
+        centroids = mesh.centroids
+        order = np.arange(mesh.num_tris)
+
+        child = [-1]
+        tri_start = [0]
+        tri_count = [mesh.num_tris]
+
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            start = tri_start[node]
+            count = tri_count[node]
+            if count <= leaf_size:
+                continue
+
+            node_order = order[start : start + count]
+            node_centroids = centroids[node_order]
+            axis = np.argmax(np.ptp(node_centroids, axis=0))
+            half = count // 2
+            split = np.argpartition(node_centroids[:, axis], half)
+            order[start : start + count] = node_order[split]
+
+            child[node] = len(child)
+            child.extend((-1, -1))
+            tri_start.extend((start, start + half))
+            tri_count.extend((half, count - half))
+            stack.extend((child[node], child[node] + 1))
+
+        self.child = np.array(child, dtype=np.int64)
+        self.tri_start = np.array(tri_start, dtype=np.int64)
+        self.tri_count = np.array(tri_count, dtype=np.int64)
+        self.tri_order = order
+
+        self.bounds_min = self.range_reduce(np.minimum, mesh.bounds_min[order])
+        self.bounds_max = self.range_reduce(np.maximum, mesh.bounds_max[order])
+
+    def refit(self, mesh: TriangleMesh = None):
+        """Recomputes node bounds after the vertices moved (e.g. a rigid transform),
+        mesh replaces the current mesh and must have the same faces, the tree topology is kept"""
+        if mesh is not None:
+            assert mesh.num_tris == self.mesh.num_tris
+            self.mesh = mesh
+        order = self.tri_order
+        self.bounds_min = self.range_reduce(np.minimum, self.mesh.bounds_min[order])
+        self.bounds_max = self.range_reduce(np.maximum, self.mesh.bounds_max[order])
+
+    @property
+    def num_nodes(self):
+        return len(self.child)
+
+    def is_leaf(self, nodes: np.ndarray):
+        return self.child[nodes] == -1
+
+    def range_reduce(self, ufunc: np.ufunc, ordered_values: np.ndarray):
+        """Reduces per triangle values (given in tri_order) over the triangles of every node"""
+        return _range_reduce(ufunc, ordered_values, self.tri_start, self.tri_count)
+
+    def expand_leaves(self, pair_ids: np.ndarray, leaves: np.ndarray):
+        """Expands (pair id, leaf node) pairs into (pair id, triangle index) pairs"""
+        counts = self.tri_count[leaves]
+        pair_ids = np.repeat(pair_ids, counts)
+        # Offset of each triangle within its leaf
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        tris = self.tri_order[np.repeat(self.tri_start[leaves], counts) + offsets]
+        return pair_ids, tris
+
+    def ray_cast(
+        self,
+        origins: np.ndarray,
+        directions: np.ndarray,
+        max_distance: float = np.inf,
+    ):
+        """Casts a packet of rays (both arrays with shape (num_rays, 3)) and finds the closest hit of each ray,
+        returns hit flags, distances (inf if no hit) and face indices (-1 if no hit),
+        distances are in units of direction length, backfaces are hit as well (like BVHTree.ray_cast)"""
+        return self._cast(origins, directions, max_distance, any_hit=False)
+
+    def occluded(
+        self,
+        origins: np.ndarray,
+        directions: np.ndarray,
+        max_distance: float = np.inf,
+    ):
+        """Any-hit version of ray_cast, returns only hit flags, traversal of a ray stops at the first hit"""
+        return self._cast(origins, directions, max_distance, any_hit=True)[0]
+
+    def ray_cast_all(self, origins: np.ndarray, directions: np.ndarray):
+        """Finds all hits of a packet of rays in one traversal,
+        returns flat arrays of (ray index, distance, face index) sorted by ray and then distance"""
+        origins, directions = np.broadcast_arrays(
+            np.asarray(origins, dtype=np.float64).reshape(-1, 3),
+            np.asarray(directions, dtype=np.float64).reshape(-1, 3),
+        )
+        with np.errstate(divide="ignore"):
+            inv_directions = 1.0 / directions
+
+        hit_rays = []
+        hit_distances = []
+        hit_faces = []
+        for start in range(0, len(origins), RAY_BLOCK_SIZE):
+            pair_rays = np.arange(start, min(start + RAY_BLOCK_SIZE, len(origins)))
+            pair_nodes = np.zeros(len(pair_rays), dtype=np.int64)
+
+            while len(pair_rays):
+                entry, exit = ray_box_intersect(
+                    origins[pair_rays],
+                    inv_directions[pair_rays],
+                    self.bounds_min[pair_nodes],
+                    self.bounds_max[pair_nodes],
+                )
+                hit = exit >= np.maximum(entry, 0.0)
+                pair_rays = pair_rays[hit]
+                pair_nodes = pair_nodes[hit]
+
+                leaf = self.is_leaf(pair_nodes)
+                if leaf.any():
+                    tri_rays, tris = self.expand_leaves(pair_rays[leaf], pair_nodes[leaf])
+                    t = ray_tri_intersect(
+                        origins[tri_rays], directions[tri_rays], self.mesh.tri_verts_of(tris)
+                    )
+                    hit = np.isfinite(t)
+                    hit_rays.append(tri_rays[hit])
+                    hit_distances.append(t[hit])
+                    hit_faces.append(tris[hit])
+
+                inner_rays = pair_rays[~leaf]
+                inner_children = self.child[pair_nodes[~leaf]]
+                pair_rays = np.concatenate((inner_rays, inner_rays))
+                pair_nodes = np.concatenate((inner_children, inner_children + 1))
+
+        if not hit_rays:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int64)
+        hit_rays = np.concatenate(hit_rays)
+        hit_distances = np.concatenate(hit_distances)
+        hit_faces = np.concatenate(hit_faces)
+        # Face index as last key makes the order of coincident hits deterministic
+        order = np.lexsort((hit_faces, hit_distances, hit_rays))
+        return hit_rays[order], hit_distances[order], hit_faces[order]
+
+    def overlap_boxes(self, boxes_min: np.ndarray, boxes_max: np.ndarray):
+        """Checks which axis aligned boxes (both arrays with shape (num_boxes, 3)) touch any triangle,
+        conservative, see box_tri_overlap"""
+        boxes_min = np.asarray(boxes_min, dtype=np.float64).reshape(-1, 3)
+        boxes_max = np.asarray(boxes_max, dtype=np.float64).reshape(-1, 3)
+        result = np.zeros(len(boxes_min), dtype=bool)
+
+        # Traversal frontier of (box, node) pairs, starting at the root
+        pair_boxes = np.arange(len(boxes_min))
+        pair_nodes = np.zeros(len(boxes_min), dtype=np.int64)
+
+        while len(pair_boxes):
+            keep = ~result[pair_boxes]
+            keep &= (boxes_min[pair_boxes] <= self.bounds_max[pair_nodes]).all(axis=1)
+            keep &= (boxes_max[pair_boxes] >= self.bounds_min[pair_nodes]).all(axis=1)
+            pair_boxes = pair_boxes[keep]
+            pair_nodes = pair_nodes[keep]
+
+            leaf = self.is_leaf(pair_nodes)
+            if leaf.any():
+                tri_boxes, tris = self.expand_leaves(pair_boxes[leaf], pair_nodes[leaf])
+                overlap = box_tri_overlap(
+                    boxes_min[tri_boxes], boxes_max[tri_boxes], self.mesh.tri_verts_of(tris)
+                )
+                result[tri_boxes[overlap]] = True
+
+            inner_boxes = pair_boxes[~leaf]
+            inner_children = self.child[pair_nodes[~leaf]]
+            pair_boxes = np.concatenate((inner_boxes, inner_boxes))
+            pair_nodes = np.concatenate((inner_children, inner_children + 1))
+
+        return result
+
+    def overlap(self, other: "BVH"):
+        """Finds pairs of triangles whose bounding boxes overlap (like BVHTree.overlap),
+        returns an int array with shape (num_pairs, 2) of (triangle of self, triangle of other)"""
+        result = []
+
+        # Traversal frontier of (node of self, node of other) pairs, starting at both roots
+        nodes1 = np.zeros(1, dtype=np.int64)
+        nodes2 = np.zeros(1, dtype=np.int64)
+
+        while len(nodes1):
+            keep = (self.bounds_min[nodes1] <= other.bounds_max[nodes2]).all(axis=1)
+            keep &= (self.bounds_max[nodes1] >= other.bounds_min[nodes2]).all(axis=1)
+            nodes1 = nodes1[keep]
+            nodes2 = nodes2[keep]
+
+            leaf1 = self.is_leaf(nodes1)
+            leaf2 = other.is_leaf(nodes2)
+            both = leaf1 & leaf2
+            if both.any():
+                # Every triangle of one leaf against every triangle of the other, padded to the largest leaves
+                starts1 = self.tri_start[nodes1[both]]
+                starts2 = other.tri_start[nodes2[both]]
+                counts1 = self.tri_count[nodes1[both]]
+                counts2 = other.tri_count[nodes2[both]]
+                offsets1 = np.arange(counts1.max())
+                offsets2 = np.arange(counts2.max())
+                valid = (offsets1 < counts1[:, np.newaxis])[:, :, np.newaxis] & (
+                    offsets2 < counts2[:, np.newaxis]
+                )[:, np.newaxis, :]
+                leaf_pairs, i, j = np.nonzero(valid)
+                tris1 = self.tri_order[starts1[leaf_pairs] + i]
+                tris2 = other.tri_order[starts2[leaf_pairs] + j]
+                hit = (self.mesh.bounds_min[tris1] <= other.mesh.bounds_max[tris2]).all(axis=1)
+                hit &= (self.mesh.bounds_max[tris1] >= other.mesh.bounds_min[tris2]).all(axis=1)
+                result.append(np.stack((tris1[hit], tris2[hit]), axis=1))
+
+            # Children of inner nodes (a leaf stays in place while the other side is descended)
+            inner = ~both
+            split1 = ~leaf1[inner]
+            split2 = ~leaf2[inner]
+            first1 = np.where(split1, self.child[nodes1[inner]], nodes1[inner])
+            first2 = np.where(split2, other.child[nodes2[inner]], nodes2[inner])
+            nodes1 = np.concatenate(
+                (first1, first1[split1] + 1, first1[split2], first1[split1 & split2] + 1)
+            )
+            nodes2 = np.concatenate(
+                (first2, first2[split1], first2[split2] + 1, first2[split1 & split2] + 1)
+            )
+
+        if not result:
+            return np.empty((0, 2), dtype=np.int64)
+        return np.concatenate(result)
+
+    def closest_points(self, query_points: np.ndarray):
+        """Finds the closest point on the mesh for every query point (shape (num_points, 3)),
+        returns closest points, distances and face indices (like BVHTree.find_nearest)"""
+        query_points = np.asarray(query_points, dtype=np.float64).reshape(-1, 3)
+        closest = np.empty_like(query_points)
+        distances = np.empty(len(query_points))
+        faces = np.empty(len(query_points), dtype=np.int64)
+        for start in range(0, len(query_points), RAY_BLOCK_SIZE):
+            end = start + RAY_BLOCK_SIZE
+            closest[start:end], distances[start:end], faces[start:end] = self._closest_block(
+                query_points[start:end]
+            )
+        return closest, distances, faces
+
+    def _closest_block(self, points):
+        num_points = len(points)
+        best_sq_distances = np.full(num_points, np.inf)
+        best_points = np.empty_like(points)
+        best_faces = np.full(num_points, -1, dtype=np.int64)
+
+        def update(pair_points, pair_leaves):
+            tri_points, tris = self.expand_leaves(pair_points, pair_leaves)
+            candidates = closest_point_tri(points[tri_points], self.mesh.tri_verts_of(tris))
+            sq_distances = ((candidates - points[tri_points]) ** 2).sum(axis=1)
+            # Closest candidate per point, sort by distance and keep the first occurrence of each point
+            order = np.lexsort((sq_distances, tri_points))
+            tri_points = tri_points[order]
+            first = np.ones(len(tri_points), dtype=bool)
+            first[1:] = tri_points[1:] != tri_points[:-1]
+            first &= sq_distances[order] < best_sq_distances[tri_points]
+            best_sq_distances[tri_points[first]] = sq_distances[order][first]
+            best_points[tri_points[first]] = candidates[order][first]
+            best_faces[tri_points[first]] = tris[order][first]
+
+        # Greedy descent to the nearest leaf gives every point a tight initial bound for pruning
+        nodes = np.zeros(num_points, dtype=np.int64)
+        inner = ~self.is_leaf(nodes)
+        while inner.any():
+            children = self.child[nodes[inner]]
+            near = box_sq_distance(points[inner], self.bounds_min[children], self.bounds_max[children])
+            far = box_sq_distance(
+                points[inner], self.bounds_min[children + 1], self.bounds_max[children + 1]
+            )
+            nodes[inner] = np.where(near <= far, children, children + 1)
+            inner = ~self.is_leaf(nodes)
+        update(np.arange(num_points), nodes)
+
+        # Traversal frontier of (point, node) pairs, starting at the root
+        pair_points = np.arange(num_points)
+        pair_nodes = np.zeros(num_points, dtype=np.int64)
+
+        while len(pair_points):
+            sq_distances = box_sq_distance(
+                points[pair_points], self.bounds_min[pair_nodes], self.bounds_max[pair_nodes]
+            )
+            keep = sq_distances < best_sq_distances[pair_points]
+            pair_points = pair_points[keep]
+            pair_nodes = pair_nodes[keep]
+
+            leaf = self.is_leaf(pair_nodes)
+            if leaf.any():
+                update(pair_points[leaf], pair_nodes[leaf])
+
+            inner_points = pair_points[~leaf]
+            inner_children = self.child[pair_nodes[~leaf]]
+            pair_points = np.concatenate((inner_points, inner_points))
+            pair_nodes = np.concatenate((inner_children, inner_children + 1))
+
+        return best_points, np.sqrt(best_sq_distances), best_faces
+
+    def _cast(self, origins, directions, max_distance, any_hit):
+        origins, directions = np.broadcast_arrays(
+            np.asarray(origins, dtype=np.float64).reshape(-1, 3),
+            np.asarray(directions, dtype=np.float64).reshape(-1, 3),
+        )
+        num_rays = len(origins)
+        distances = np.full(num_rays, np.inf)
+        faces = np.full(num_rays, -1, dtype=np.int64)
+        for start in range(0, num_rays, RAY_BLOCK_SIZE):
+            end = start + RAY_BLOCK_SIZE
+            distances[start:end], faces[start:end] = self._cast_block(
+                origins[start:end], directions[start:end], max_distance, any_hit
+            )
+        return faces != -1, distances, faces
+
+    def _cast_block(self, origins, directions, max_distance, any_hit):
+        num_rays = len(origins)
+        best_distances = np.full(num_rays, float(max_distance))
+        best_faces = np.full(num_rays, -1, dtype=np.int64)
+        with np.errstate(divide="ignore"):
+            inv_directions = 1.0 / directions
+
+        # Traversal frontier of (ray, node) pairs, starting at the root
+        pair_rays = np.arange(num_rays)
+        pair_nodes = np.zeros(num_rays, dtype=np.int64)
+
+        while len(pair_rays):
+            if any_hit:
+                keep = best_faces[pair_rays] == -1
+                pair_rays = pair_rays[keep]
+                pair_nodes = pair_nodes[keep]
+
+            entry, exit = ray_box_intersect(
+                origins[pair_rays],
+                inv_directions[pair_rays],
+                self.bounds_min[pair_nodes],
+                self.bounds_max[pair_nodes],
+            )
+            hit = (exit >= np.maximum(entry, 0.0)) & (entry <= best_distances[pair_rays])
+            pair_rays = pair_rays[hit]
+            pair_nodes = pair_nodes[hit]
+
+            leaf = self.is_leaf(pair_nodes)
+            if leaf.any():
+                tri_rays, tris = self.expand_leaves(pair_rays[leaf], pair_nodes[leaf])
+                t = ray_tri_intersect(
+                    origins[tri_rays], directions[tri_rays], self.mesh.tri_verts_of(tris)
+                )
+                hit = t < best_distances[tri_rays]
+                tri_rays = tri_rays[hit]
+                tris = tris[hit]
+                t = t[hit]
+                # Closest hit per ray, sort by distance and keep the first occurrence of each ray
+                order = np.lexsort((t, tri_rays))
+                tri_rays = tri_rays[order]
+                first = np.ones(len(tri_rays), dtype=bool)
+                first[1:] = tri_rays[1:] != tri_rays[:-1]
+                best_distances[tri_rays[first]] = t[order][first]
+                best_faces[tri_rays[first]] = tris[order][first]
+
+            inner_rays = pair_rays[~leaf]
+            inner_children = self.child[pair_nodes[~leaf]]
+            pair_rays = np.concatenate((inner_rays, inner_rays))
+            pair_nodes = np.concatenate((inner_children, inner_children + 1))
+
+        best_distances[best_faces == -1] = np.inf
+        return best_distances, best_faces
+
+
+def ray_box_intersect(origins, inv_directions, bounds_min, bounds_max):
+    """Slab test, returns entry and exit distances of each ray, the box is missed if exit < max(entry, 0)"""
+    with np.errstate(invalid="ignore"):
+        t1 = (bounds_min - origins) * inv_directions
+        t2 = (bounds_max - origins) * inv_directions
+    # fmin/fmax ignore NaN (0 * inf) from rays parallel to a slab that start on its plane,
+    # reducing columns explicitly is much faster than reduce over a short axis
+    near = np.fmin(t1, t2)
+    far = np.fmax(t1, t2)
+    entry = np.fmax(np.fmax(near[:, 0], near[:, 1]), near[:, 2])
+    exit = np.fmin(np.fmin(far[:, 0], far[:, 1]), far[:, 2])
+    return entry, exit
+
+
+def box_sq_distance(points, bounds_min, bounds_max):
+    """Squared distance of each point to its box, zero for points inside"""
+    offsets = np.maximum(np.maximum(bounds_min - points, points - bounds_max), 0.0)
+    return (offsets * offsets).sum(axis=1)
+
+
+def closest_point_tri(points, tri_verts):
+    """Closest point on the triangle of each (point, triangle) pair,
+    the projection onto the triangle plane if it falls inside the triangle and the closest edge point otherwise"""
+    v0, v1, v2 = tri_verts[:, 0], tri_verts[:, 1], tri_verts[:, 2]
+    normals = np.cross(v1 - v0, v2 - v0)
+    sq_norms = (normals * normals).sum(axis=1)
+    heights = np.divide(
+        ((points - v0) * normals).sum(axis=1),
+        sq_norms,
+        out=np.zeros(len(points)),
+        where=sq_norms > 0.0,
+    )
+    projected = points - heights[:, np.newaxis] * normals
+
+    # Inside if the projection is on the inner side of all three edges (degenerate triangles never are)
+    inside = sq_norms > 0.0
+    for a, b in ((v0, v1), (v1, v2), (v2, v0)):
+        inside &= (np.cross(b - a, projected - a) * normals).sum(axis=1) >= 0.0
+    result = projected
+
+    outside = np.flatnonzero(~inside)
+    if len(outside):
+        p = points[outside]
+        best = np.full(len(outside), np.inf)
+        edge_points = np.empty_like(p)
+        for a, b in ((v0, v1), (v1, v2), (v2, v0)):
+            a = a[outside]
+            edges = b[outside] - a
+            sq_lengths = (edges * edges).sum(axis=1)
+            t = np.divide(
+                ((p - a) * edges).sum(axis=1),
+                sq_lengths,
+                out=np.zeros(len(p)),
+                where=sq_lengths > 0.0,
+            )
+            candidates = a + np.clip(t, 0.0, 1.0)[:, np.newaxis] * edges
+            sq_distances = ((candidates - p) ** 2).sum(axis=1)
+            closer = sq_distances < best
+            best[closer] = sq_distances[closer]
+            edge_points[closer] = candidates[closer]
+        result[outside] = edge_points
+    return result
+
+
+def ray_tri_intersect(origins, directions, tri_verts):
+    """Moller-Trumbore, returns hit distance of each (ray, triangle) pair, inf if missed"""
+    v0 = tri_verts[:, 0]
+    e1 = tri_verts[:, 1] - v0
+    e2 = tri_verts[:, 2] - v0
+    p = np.cross(directions, e2)
+    det = (e1 * p).sum(axis=1)
+    valid = np.abs(det) > 1e-12
+    inv_det = np.divide(1.0, det, out=np.zeros_like(det), where=valid)
+
+    s = origins - v0
+    u = (s * p).sum(axis=1) * inv_det
+    q = np.cross(s, e1)
+    v = (directions * q).sum(axis=1) * inv_det
+    t = (e2 * q).sum(axis=1) * inv_det
+
+    hit = valid & (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t > RAY_EPSILON)
+    return np.where(hit, t, np.inf)
+
+
+def box_tri_overlap(boxes_min, boxes_max, tri_verts):
+    """Checks overlap of each (box, triangle) pair using the box axes and the triangle plane as separating axes,
+    conservative (the 9 edge cross product axes of the full SAT test are skipped),
+    so a pair can be reported as overlapping when the triangle only passes near a box corner"""
+    overlap = (boxes_min <= tri_verts.max(axis=1)).all(axis=1)
+    overlap &= (boxes_max >= tri_verts.min(axis=1)).all(axis=1)
+
+    # Triangle plane separates the box if the box projection radius is smaller than its distance to the plane
+    v0 = tri_verts[:, 0]
+    normals = np.cross(tri_verts[:, 1] - v0, tri_verts[:, 2] - v0)
+    centers = (boxes_min + boxes_max) / 2.0
+    half_extents = (boxes_max - boxes_min) / 2.0
+    radii = (half_extents * np.abs(normals)).sum(axis=1)
+    distances = np.abs((normals * (centers - v0)).sum(axis=1))
+    overlap &= distances <= radii
+    return overlap
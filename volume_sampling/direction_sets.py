@@ -0,0 +1,192 @@
+import numpy as np
+import numpy.typing as npt
+
+from ..triangle_mesh import TriangleMesh
+from .batched_winding_numbers import calc_winding_numbers_batched
+from .bvh import BVH
+
+# Direction sets for ray based inside tests, low discrepancy sets cover the sphere more evenly than
+# i.i.d. random directions so fewer rays are needed for a stable classification,
+# a random rotation per query point keeps the fixed pattern from biasing results
+
+# References
+# https://www.pbr-book.org/3ed-2018/Monte_Carlo_Integration/2D_Sampling_with_Multidimensional_Transformations#UniformlySamplingaHemisphere
+# https://www.pbr-book.org/3ed-2018/Sampling_and_Reconstruction/The_Halton_Sampler
+# https://www.pbr-book.org/3ed-2018/Sampling_and_Reconstruction/(0,_2)-Sequence_Sampler
+# https://extremelearning.com.au/how-to-evenly-distribute-points-on-a-sphere-more-effectively-than-the-canonical-fibonacci-lattice/
+
+DIRECTION_SET_KINDS = ("random", "fibonacci", "halton", "sobol", "stratified")
+
+GOLDEN_RATIO = (1 + 5**0.5) / 2
+
+
+def square_to_sphere(u: np.ndarray):
+    """Maps points of the unit square with shape (n, 2) to uniformly distributed unit directions"""
+    z = 1 - 2 * u[:, 0]
+    r = np.sqrt(np.maximum(0.0, 1 - z * z))
+    phi = 2 * np.pi * u[:, 1]
+    return np.c_[r * np.cos(phi), r * np.sin(phi), z]
+
+
+def random_sphere(num_samples: int, rng: np.random.Generator):
+    return square_to_sphere(rng.uniform(0, 1, (num_samples, 2)))
+
+
+def fibonacci_sphere(num_samples: int):
+    i = np.arange(num_samples)
+    u = np.c_[(i + 0.5) / num_samples, (i / GOLDEN_RATIO) % 1.0]
+    return square_to_sphere(u)
+
+
+def radical_inverse(indices: np.ndarray, base: int):
+    result = np.zeros(len(indices))
+    indices = indices.copy()
+    scale = 1.0 / base
+    while indices.any():
+        indices, digits = np.divmod(indices, base)
+        result += digits * scale
+        scale /= base
+    return result
+
+
+def halton_sphere(num_samples: int):
+    # Skip the first point (0, 0) which maps to a pole
+    i = np.arange(1, num_samples + 1)
+    return square_to_sphere(np.c_[radical_inverse(i, 2), radical_inverse(i, 3)])
+
+
+def _sobol_direction_numbers(dimension: int, num_bits: int = 32):
+    if dimension == 0:
+        # Van der Corput sequence
+        return [1 << (num_bits - 1 - k) for k in range(num_bits)]
+    # Second dimension, primitive polynomial x + 1 with m_1 = 1, m_k = 2 m_(k - 1) xor m_(k - 1)
+    m = [1]
+    for _ in range(1, num_bits):
+        m.append((2 * m[-1]) ^ m[-1])
+    return [m[k] << (num_bits - 1 - k) for k in range(num_bits)]
+
+
+def sobol_2d(num_samples: int):
+    """First num_samples points of the two dimensional Sobol sequence (a (0, 2)-sequence)"""
+    i = np.arange(num_samples, dtype=np.uint64)
+    result = np.empty((num_samples, 2))
+    for dimension in range(2):
+        x = np.zeros(num_samples, dtype=np.uint64)
+        for k, v in enumerate(_sobol_direction_numbers(dimension)):
+            bit_set = ((i >> np.uint64(k)) & np.uint64(1)).astype(bool)
+            x[bit_set] ^= np.uint64(v)
+        result[:, dimension] = x / float(1 << 32)
+    return result
+
+
+def sobol_sphere(num_samples: int):
+    # Shift by half a cell so that the first point (0, 0) does not map to a pole
+    return square_to_sphere((sobol_2d(num_samples) + 0.5 / num_samples) % 1.0)
+
+
+def stratified_sphere(num_samples: int, rng: np.random.Generator):
+    """Jittered grid on the unit square, the grid shape is the most square factorization of num_samples"""
+    rows = int(np.sqrt(num_samples))
+    while num_samples % rows:
+        rows -= 1
+    cols = num_samples // rows
+    i, j = np.divmod(np.arange(num_samples), cols)
+    jitter = rng.uniform(0, 1, (num_samples, 2))
+    u = np.c_[(i + jitter[:, 0]) / rows, (j + jitter[:, 1]) / cols]
+    return square_to_sphere(u)
+
+
+def direction_set(kind: str, num_samples: int, rng: np.random.Generator = None):
+    """Returns num_samples unit directions with shape (num_samples, 3), kind is one of DIRECTION_SET_KINDS"""
+    if rng is None:
+        rng = np.random.default_rng()
+    if kind == "random":
+        return random_sphere(num_samples, rng)
+    if kind == "fibonacci":
+        return fibonacci_sphere(num_samples)
+    if kind == "halton":
+        return halton_sphere(num_samples)
+    if kind == "sobol":
+        return sobol_sphere(num_samples)
+    if kind == "stratified":
+        return stratified_sphere(num_samples, rng)
+    raise ValueError(f"Unknown direction set {kind!r}, expected one of {DIRECTION_SET_KINDS}")
+
+
+def random_rotations(num_rotations: int, rng: np.random.Generator):
+    """Uniformly distributed rotation matrices with shape (num_rotations, 3, 3), from random unit quaternions"""
+    # https://www.pbr-book.org/3ed-2018/Geometry_and_Transformations/Rotations
+    q = rng.normal(size=(num_rotations, 4))
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    w, x, y, z = q.T
+    return np.stack(
+        (
+            np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)), axis=-1),
+            np.stack((2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)), axis=-1),
+            np.stack((2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)), axis=-1),
+        ),
+        axis=1,
+    )
+
+
+def rotate_per_point(directions: np.ndarray, num_points: int, rng: np.random.Generator):
+    """Applies an independent random rotation of the direction set for each query point,
+    returns directions with shape (num_points, num_directions, 3)"""
+    return np.einsum("pij,nj->pni", random_rotations(num_points, rng), directions)
+
+
+def benchmark_direction_sets(
+    mesh: TriangleMesh,
+    query_points: npt.ArrayLike,
+    ray_counts=(4, 8, 16, 32, 64),
+    kinds=DIRECTION_SET_KINDS,
+    rotate: bool = True,
+    seed: int = 0,
+):
+    """Compares visibility classification (a point is inside if all rays hit the mesh) against
+    the exact winding number answer for each direction set and ray count,
+    returns {kind: [agreement fraction for each ray count]} and prints a table
+    including the number of rays each set needs to fully match the exact answer"""
+    query_points = np.asarray(query_points, dtype=np.float64).reshape(-1, 3)
+    reference, _ = calc_winding_numbers_batched(query_points, mesh)
+    bvh = BVH(mesh)
+
+    results = {}
+    for kind in kinds:
+        rng = np.random.default_rng(seed)
+        agreement = []
+        for num_rays in ray_counts:
+            directions = direction_set(kind, num_rays, rng)
+            if rotate:
+                directions = rotate_per_point(directions, len(query_points), rng)
+            else:
+                directions = np.broadcast_to(directions, (len(query_points), num_rays, 3))
+            origins = np.repeat(query_points, num_rays, axis=0)
+            hits = bvh.occluded(origins, directions.reshape(-1, 3))
+            is_inside = hits.reshape(-1, num_rays).all(axis=1)
+            agreement.append(float((is_inside == reference).mean()))
+        results[kind] = agreement
+
+    header = "".join(f"{n:>9}" for n in ray_counts)
+    print(f"{'direction set':<14}{header}  rays to match")
+    for kind, agreement in results.items():
+        matched = [n for n, a in zip(ray_counts, agreement) if a == 1.0]
+        row = "".join(f"{a:>9.4f}" for a in agreement)
+        print(f"{kind:<14}{row}  {matched[0] if matched else '-':>13}")
+
+    return results
+
+
+if __name__ == "__main__":
+    import bpy
+
+    obj = bpy.context.object
+    assert obj.type == "MESH"
+
+    # Generate points inside bounding box
+    min_bb = np.min(obj.bound_box, axis=0)
+    max_bb = np.max(obj.bound_box, axis=0)
+    rng = np.random.default_rng(seed=1234)
+    query_points = rng.uniform(low=min_bb, high=max_bb, size=(2000, 3))
+
+    benchmark_direction_sets(TriangleMesh.from_object(obj, world_space=False), query_points)
@@ -0,0 +1,190 @@
+import numpy as np
+import numpy.typing as npt
+
+from ..triangle_mesh import TriangleMesh
+from .bvh import BVH
+
+# Fast winding numbers (Barnes-Hut style), triangles are clustered in a BVH
+# and every node stores a dipole expansion of its triangles,
+# nodes that are far enough from the query point are evaluated using the dipole instead of their triangles
+
+# References
+# https://www.dgp.toronto.edu/projects/fast-winding-numbers/fast-winding-numbers-for-soups-and-clouds-siggraph-2018-barill-et-al.pdf
+# https://igl.ethz.ch/projects/winding-number/robust-inside-outside-segmentation-using-generalized-winding-numbers-siggraph-2013-compressed-jacobson-et-al.pdf
+
+# Number of query points traversed together, bounds the size of the traversal frontier
+QUERY_BLOCK_SIZE = 4096
+
+
+def half_solid_angles(v1: np.ndarray, v2: np.ndarray, v3: np.ndarray):
+    """Vectorized version of tet_solid_angle, v1, v2 and v3 are triangle vertices relative to the query point(s),
+    returns half the signed solid angle of each triangle (same units as calc_winding_number_vectorized)"""
+    v1_norm = np.linalg.norm(v1, axis=-1)
+    v2_norm = np.linalg.norm(v2, axis=-1)
+    v3_norm = np.linalg.norm(v3, axis=-1)
+
+    numerator = (v1 * np.cross(v2, v3)).sum(axis=-1)
+    denominator = (
+        v1_norm * v2_norm * v3_norm
+        + (v1 * v2).sum(axis=-1) * v3_norm
+        + (v1 * v3).sum(axis=-1) * v2_norm
+        + (v2 * v3).sum(axis=-1) * v1_norm
+    )
+    return np.arctan2(numerator, denominator)
+
+
+class FastWindingTree:
+    """BVH over mesh triangles with a dipole expansion (area weighted normal) per node"""
+
+    __slots__ = ("bvh", "mesh", "centers", "radii", "dipoles")
+
+    def __init__(self, tris, leaf_size: int = 8):
+        """tris is expected to be a TriangleMesh or a 2D NumPy array of vertex location of each triangle
+        with shape (num_tris * 3, 3), same layout as used by calc_winding_number_vectorized"""
+        if not isinstance(tris, TriangleMesh):
+            tris = TriangleMesh.from_tri_corners(tris)
+        self.mesh = tris
+        self.bvh = BVH(self.mesh, leaf_size)
+
+        # Area weighted normals, their sum is the dipole moment of a node
+        order = self.bvh.tri_order
+        areas = self.mesh.areas[order]
+        self.dipoles = self.bvh.range_reduce(np.add, self.mesh.area_normals[order])
+        node_areas = self.bvh.range_reduce(np.add, areas)
+        weighted_centroids = self.bvh.range_reduce(
+            np.add, self.mesh.centroids[order] * areas[:, np.newaxis]
+        )
+        # Fallback to bounding box center for nodes with zero area (degenerate triangles only)
+        box_centers = (self.bvh.bounds_min + self.bvh.bounds_max) / 2.0
+        has_area = node_areas > 0.0
+        self.centers = box_centers
+        self.centers[has_area] = (
+            weighted_centroids[has_area] / node_areas[has_area, np.newaxis]
+        )
+
+        # Conservative radius, distance from center to the farthest bounding box corner
+        extent = np.maximum(
+            np.abs(self.bvh.bounds_max - self.centers),
+            np.abs(self.centers - self.bvh.bounds_min),
+        )
+        self.radii = np.linalg.norm(extent, axis=1)
+
+    @property
+    def num_tris(self):
+        return self.mesh.num_tris
+
+
+def _calc_winding_numbers_block(points: np.ndarray, tree: FastWindingTree, beta: float):
+    num_points = len(points)
+    w = np.zeros(num_points)
+    bvh = tree.bvh
+
+    # Traversal frontier of (query point, node) pairs, starting at the root
+    pair_points = np.arange(num_points)
+    pair_nodes = np.zeros(num_points, dtype=np.int64)
+
+    while len(pair_points):
+        offsets = tree.centers[pair_nodes] - points[pair_points]
+        distances = np.linalg.norm(offsets, axis=1)
+        far = distances > beta * tree.radii[pair_nodes]
+
+        # Far field, half the solid angle of a dipole
+        if far.any():
+            far_nodes = pair_nodes[far]
+            far_distances = distances[far]
+            contributions = (offsets[far] * tree.dipoles[far_nodes]).sum(axis=1) / (
+                2.0 * far_distances * far_distances * far_distances
+            )
+            w += np.bincount(pair_points[far], contributions, minlength=num_points)
+
+        near = ~far
+        near_points = pair_points[near]
+        near_nodes = pair_nodes[near]
+        leaf = bvh.is_leaf(near_nodes)
+
+        # Near field leaves, exact sum over their triangles
+        if leaf.any():
+            tri_points, tris = bvh.expand_leaves(near_points[leaf], near_nodes[leaf])
+            shifted = (
+                tree.mesh.tri_verts_of(tris) - points[tri_points, np.newaxis]
+            )
+            contributions = half_solid_angles(
+                shifted[:, 0], shifted[:, 1], shifted[:, 2]
+            )
+            w += np.bincount(tri_points, contributions, minlength=num_points)
+
+        # Near field internal nodes, descend into both children
+        inner_points = near_points[~leaf]
+        inner_children = bvh.child[near_nodes[~leaf]]
+        pair_points = np.concatenate((inner_points, inner_points))
+        pair_nodes = np.concatenate((inner_children, inner_children + 1))
+
+    return w
+
+
+def calc_winding_numbers(query_points: npt.ArrayLike, tree: FastWindingTree, beta: float = 2.0):
+    """query_points is expected to be a 2D NumPy array with shape (num_points, 3),
+    returns winding numbers in the same units as calc_winding_number_vectorized (2 pi inside),
+    beta controls accuracy, a node is approximated when it is farther than beta times its radius"""
+    query_points = np.asarray(query_points, dtype=np.float64).reshape(-1, 3)
+    w = np.empty(len(query_points))
+    for start in range(0, len(query_points), QUERY_BLOCK_SIZE):
+        end = start + QUERY_BLOCK_SIZE
+        w[start:end] = _calc_winding_numbers_block(query_points[start:end], tree, beta)
+    return w
+
+
+def is_inside_batch(query_points: npt.ArrayLike, tree: FastWindingTree, beta: float = 2.0):
+    """Checks which points are inside mesh, returns a boolean mask,
+    assumes mesh already has consistent normals with positive volume everywhere inside"""
+    # Threshold at half the interior value, the approximation is not exact
+    # so comparing against the full 2 pi would reject interior points
+    return calc_winding_numbers(query_points, tree, beta) >= np.pi
+
+
+def is_inside(query_point: npt.ArrayLike, tree: FastWindingTree, beta: float = 2.0):
+    """Drop-in replacement for vectorized_winding_numbers.is_inside with a prebuilt FastWindingTree"""
+    return bool(is_inside_batch(query_point, tree, beta)[0])
+
+
+if __name__ == "__main__":
+    from contextlib import contextmanager
+    from timeit import default_timer
+
+    import bpy
+
+    from ..mesh_arrays import mesh_loop_triangles, mesh_vertex_coords
+
+    @contextmanager
+    def scoped_timer(msg: str):
+        t0 = default_timer()
+        yield
+        t1 = default_timer()
+        print(f"{msg} finished in {t1 - t0:.2f} seconds.")
+
+    obj = bpy.context.object
+    assert obj.type == "MESH"
+
+    # Generate points inside bounding box
+    min_bb = np.min(obj.bound_box, axis=0)
+    max_bb = np.max(obj.bound_box, axis=0)
+    rng = np.random.default_rng()
+    query_points = rng.uniform(low=min_bb, high=max_bb, size=(100000, 3))
+
+    mesh: bpy.types.Mesh = obj.data
+    tri_mesh = TriangleMesh(mesh_vertex_coords(mesh), mesh_loop_triangles(mesh))
+    print(f"Number of mesh triangles = {tri_mesh.num_tris}")
+
+    with scoped_timer("Building fast winding number tree"):
+        tree = FastWindingTree(tri_mesh)
+
+    with scoped_timer(
+        f"Filtering {len(query_points)} points using Fast Winding Numbers"
+    ):
+        filtered_points = query_points[is_inside_batch(query_points, tree)]
+
+    # Create point cloud
+    points_mesh = bpy.data.meshes.new("")
+    points_mesh.from_pydata(filtered_points, [], [])
+    points_obj = bpy.data.objects.new("", points_mesh)
+    bpy.context.scene.collection.objects.link(points_obj)
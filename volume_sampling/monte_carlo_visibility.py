@@ -1,13 +1,43 @@
+import math
 from contextlib import contextmanager
 from timeit import default_timer
 
-import bmesh
 import bpy
 import numpy as np
 from mathutils import Vector
 from mathutils.bvhtree import BVHTree
 
+if not __package__:
+    # Run as a standalone script (e.g. opened from its file in Blender's text editor), the relative imports
+    # below need the repository imported as a package, so its parent directory is put on sys.path (PEP 366)
+    import os
+    import sys
+
+    _repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.path.dirname(_repository))
+    __package__ = os.path.basename(_repository) + ".volume_sampling"
+
+from ..mesh_arrays import object_mesh_arrays
+from ..triangle_mesh import TriangleMesh
+from .bvh import BVH
+from .direction_sets import direction_set, rotate_per_point
+from .parallel import map_shards, worker_cache
+
 RNG = np.random.default_rng()
+NUM_WORKERS = None  # Defaults to the number of CPUs
+
+# Number of query points whose rays are cast as one packet
+PACKET_POINTS = 4096
+
+# One of direction_sets.DIRECTION_SET_KINDS, rotated randomly for each query point
+DIRECTION_SET = "fibonacci"
+
+# Adaptive mode, points are accepted as inside once enough rays hit the mesh for the given confidence
+# that at most MIN_ESCAPE_FRACTION of directions escape, a single escaping ray rejects a point
+ADAPTIVE = True
+CONFIDENCE = 0.99
+MIN_ESCAPE_FRACTION = 0.1
+ADAPTIVE_BATCH_SIZE = 4
 
 
 @contextmanager
@@ -19,31 +49,140 @@ def scoped_timer(msg: str):
 
 
 # https://www.pbr-book.org/3ed-2018/Monte_Carlo_Integration/2D_Sampling_with_Multidimensional_Transformations#UniformlySamplingaHemisphere
-def uniform_sample_sphere(num_samples: int):
-    u = RNG.uniform(0, 1, (num_samples, 2))
+def uniform_sample_sphere(num_samples: int, rng: np.random.Generator = RNG):
+    u = rng.uniform(0, 1, (num_samples, 2))
     z = 1 - 2 * u[:, 0]
     r = np.sqrt(1 - z * z)
     phi = 2 * np.pi * u[:, 1]
     return np.c_[r * np.cos(phi), r * np.sin(phi), z]
 
 
-SPHERE_SAMPLES = uniform_sample_sphere(64)
+SPHERE_SAMPLES = direction_set(DIRECTION_SET, 64, RNG)
+
+
+def is_inside_batch(
+    query_points: np.ndarray,
+    verts: np.ndarray,
+    faces: np.ndarray,
+    directions: np.ndarray,
+):
+    """Checks which points see the mesh in all directions,
+    used as shard function of map_shards, the BVHTree is built once per worker"""
+    bvh: BVHTree = worker_cache(
+        "bvh", lambda: BVHTree.FromPolygons(verts.tolist(), faces.tolist())
+    )
+    return np.array(
+        [
+            all(bvh.ray_cast(p, d)[0] for d in directions)
+            for p in map(Vector, query_points)
+        ],
+        dtype=bool,
+    )
+
+
+def is_inside_packets(
+    query_points: np.ndarray,
+    bvh: BVH,
+    directions: np.ndarray,
+    rotate: bool = False,
+    rng: np.random.Generator = RNG,
+):
+    """Ray packet version of is_inside_batch using the NumPy BVH,
+    rays of many points and all directions are traversed together using any-hit traversal,
+    rotate applies a random rotation of the directions for each point"""
+    result = np.empty(len(query_points), dtype=bool)
+    for start in range(0, len(query_points), PACKET_POINTS):
+        points = query_points[start : start + PACKET_POINTS]
+        origins = np.repeat(points, len(directions), axis=0)
+        if rotate:
+            ray_directions = rotate_per_point(directions, len(points), rng).reshape(-1, 3)
+        else:
+            ray_directions = np.tile(directions, (len(points), 1))
+        hits = bvh.occluded(origins, ray_directions)
+        result[start : start + PACKET_POINTS] = hits.reshape(len(points), -1).all(axis=1)
+    return result
+
+
+def is_inside_batch_packets(
+    query_points: np.ndarray,
+    verts: np.ndarray,
+    faces: np.ndarray,
+    directions: np.ndarray,
+):
+    """Shard function of map_shards using is_inside_packets, does not need mathutils in workers"""
+    bvh: BVH = worker_cache("numpy_bvh", lambda: BVH(TriangleMesh(verts, faces)))
+    # Each worker needs its own random stream, forked workers would share RNG state
+    rng = worker_cache("rng", np.random.default_rng)
+    return is_inside_packets(query_points, bvh, directions, rotate=True, rng=rng)
+
+
+def required_hits(confidence: float, min_escape_fraction: float):
+    """Number of rays that all have to hit the mesh to accept a point as inside,
+    a point where min_escape_fraction of directions escape would pass with probability below 1 - confidence"""
+    confidence = max(min(confidence, 1.0 - 1e-12), 0.0)
+    min_escape_fraction = max(min(min_escape_fraction, 1.0), 1e-12)
+    if min_escape_fraction >= 1.0:
+        return 1
+    return max(1, math.ceil(math.log1p(-confidence) / math.log1p(-min_escape_fraction)))
+
+
+def is_inside_adaptive(
+    query_points: np.ndarray,
+    bvh: BVH,
+    confidence: float = CONFIDENCE,
+    min_escape_fraction: float = MIN_ESCAPE_FRACTION,
+    batch_size: int = ADAPTIVE_BATCH_SIZE,
+    rng: np.random.Generator = RNG,
+):
+    """Sequential version of is_inside_packets, rays are cast in small batches of random directions,
+    a point is rejected as soon as one ray escapes and accepted after required_hits rays hit the mesh,
+    returns inside mask and number of rays cast for each point"""
+    query_points = np.asarray(query_points, dtype=np.float64).reshape(-1, 3)
+    num_points = len(query_points)
+    max_rays = required_hits(confidence, min_escape_fraction)
+
+    result = np.zeros(num_points, dtype=bool)
+    num_rays = np.zeros(num_points, dtype=np.int64)
+    active = np.arange(num_points)
+
+    while len(active):
+        batch = min(batch_size, max_rays - num_rays[active[0]])
+        origins = np.repeat(query_points[active], batch, axis=0)
+        directions = uniform_sample_sphere(len(origins), rng)
+        hits = bvh.occluded(origins, directions).reshape(-1, batch).all(axis=1)
+        num_rays[active] += batch
+
+        # Escaped points are outside, points that reached the ray budget are inside
+        active = active[hits]
+        done = num_rays[active] >= max_rays
+        result[active[done]] = True
+        active = active[~done]
+
+    return result, num_rays
+
+
+def is_inside_batch_adaptive(
+    query_points: np.ndarray,
+    verts: np.ndarray,
+    faces: np.ndarray,
+    confidence: float = CONFIDENCE,
+    min_escape_fraction: float = MIN_ESCAPE_FRACTION,
+):
+    """Shard function of map_shards using is_inside_adaptive, returns inside mask and rays per point"""
+    bvh: BVH = worker_cache("numpy_bvh", lambda: BVH(TriangleMesh(verts, faces)))
+    # Each worker needs its own random stream, forked workers would share RNG state
+    rng = worker_cache("rng", np.random.default_rng)
+    return is_inside_adaptive(
+        query_points, bvh, confidence, min_escape_fraction, rng=rng
+    )
 
 
 if __name__ == "__main__":
     obj = bpy.context.object
     assert obj.type == "MESH"
 
-    dg = bpy.context.evaluated_depsgraph_get()
-    bm = bmesh.new()
-    bm.from_object(obj, dg)
-    bm.transform(obj.matrix_world)
-    bvh: BVHTree = BVHTree.FromBMesh(bm)
-    print(f"Number of mesh triangles = {len(bm.calc_loop_triangles())}")
-    bm.free()
-
-    def is_inside(query_point: Vector):
-        return all(bvh.ray_cast(query_point, d)[0] for d in SPHERE_SAMPLES)
+    verts, faces, _ = object_mesh_arrays(obj)
+    print(f"Number of mesh triangles = {len(faces)}")
 
     # Generate points inside bounding box
     min_bb = np.min(obj.bound_box, axis=0)
@@ -53,7 +192,27 @@ if __name__ == "__main__":
     with scoped_timer(
         f"Filtering {len(query_points)} points using Monte Carlo Integration"
     ):
-        filtered_points = [p for p in query_points if is_inside(Vector(p))]
+        if ADAPTIVE:
+            is_inside, num_rays = map_shards(
+                is_inside_batch_adaptive,
+                query_points,
+                {"verts": verts, "faces": faces},
+                num_workers=NUM_WORKERS,
+                confidence=CONFIDENCE,
+                min_escape_fraction=MIN_ESCAPE_FRACTION,
+            )
+            print(
+                f"Average number of rays per point = {num_rays.mean():.2f} "
+                f"(at most {required_hits(CONFIDENCE, MIN_ESCAPE_FRACTION)})"
+            )
+        else:
+            is_inside = map_shards(
+                is_inside_batch_packets,
+                query_points,
+                {"verts": verts, "faces": faces, "directions": SPHERE_SAMPLES},
+                num_workers=NUM_WORKERS,
+            )
+        filtered_points = query_points[is_inside]
 
     # Create point cloud
     points_mesh = bpy.data.meshes.new("")
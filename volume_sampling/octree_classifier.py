@@ -0,0 +1,189 @@
+from typing import Callable, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from ..triangle_mesh import TriangleMesh
+from .bvh import BVH
+
+# Adaptive octree classification of space, cells that do not touch the surface are entirely inside or outside
+# so a single classification is enough for all query points in them,
+# only cells touching the surface are subdivided and points in the finest surface cells need an exact test
+
+OUTSIDE = 0
+INSIDE = 1
+BOUNDARY = 2
+
+# Corner offsets of a cell and child cell offsets, in units of cells of the same level
+CELL_OFFSETS = np.array(
+    [(x, y, z) for x in range(2) for y in range(2) for z in range(2)], dtype=np.int64
+)
+
+
+def _cell_keys(cells: np.ndarray, level: int):
+    return (cells[:, 0] << (2 * level)) | (cells[:, 1] << level) | cells[:, 2]
+
+
+class OctreeClassifier:
+    """Leaf cells are stored per level as sorted integer keys with a label (OUTSIDE, INSIDE or BOUNDARY)"""
+
+    __slots__ = (
+        "bounds_min",
+        "bounds_max",
+        "max_depth",
+        "is_inside_batch",
+        "level_keys",
+        "level_labels",
+        "num_tests",
+    )
+
+    def __init__(
+        self,
+        mesh: TriangleMesh,
+        is_inside_batch: Callable[[np.ndarray], np.ndarray],
+        max_depth: int = 6,
+        check_corners: bool = True,
+        bvh: Optional[BVH] = None,
+    ):
+        """is_inside_batch is the inside test used for cell classification and for points in boundary cells,
+        it takes points with shape (num_points, 3) and returns a boolean mask,
+        check_corners also evaluates the test at cell corners and subdivides cells where results disagree
+        (guards against holes in open meshes and errors of approximate tests)"""
+        assert 0 <= max_depth <= 20
+        bvh = bvh or BVH(mesh)
+
+        # Pad bounds slightly so that no surface lies on the root cell boundary
+        bounds_min = mesh.verts.min(axis=0)
+        bounds_max = mesh.verts.max(axis=0)
+        padding = 1e-3 * (bounds_max - bounds_min).max() + 1e-9
+        self.bounds_min = bounds_min - padding
+        self.bounds_max = bounds_max + padding
+        self.max_depth = max_depth
+        self.is_inside_batch = is_inside_batch
+        self.level_keys = []
+        self.level_labels = []
+        self.num_tests = 0
+
+        cells = np.zeros((1, 3), dtype=np.int64)
+        for level in range(max_depth + 1):
+            cell_size = (self.bounds_max - self.bounds_min) / (1 << level)
+            cells_min = self.bounds_min + cells * cell_size
+            labels = np.full(len(cells), BOUNDARY, dtype=np.int8)
+
+            free = np.flatnonzero(~bvh.overlap_boxes(cells_min, cells_min + cell_size))
+            if len(free):
+                center_labels = self._test(cells_min[free] + cell_size / 2.0)
+                uniform = np.ones(len(free), dtype=bool)
+                if check_corners:
+                    # Neighbor cells share corners, evaluate each corner once
+                    corners = (cells[free, np.newaxis] + CELL_OFFSETS).reshape(-1, 3)
+                    corners, corner_indices = np.unique(corners, axis=0, return_inverse=True)
+                    corner_labels = self._test(self.bounds_min + corners * cell_size)
+                    corner_labels = corner_labels[corner_indices.reshape(-1, 8)]
+                    uniform = (corner_labels == center_labels[:, np.newaxis]).all(axis=1)
+                labels[free[uniform]] = center_labels[uniform]
+
+            is_leaf = labels != BOUNDARY
+            if level == max_depth:
+                is_leaf[:] = True
+
+            keys = _cell_keys(cells[is_leaf], level)
+            order = np.argsort(keys)
+            self.level_keys.append(keys[order])
+            self.level_labels.append(labels[is_leaf][order])
+
+            cells = (2 * cells[~is_leaf, np.newaxis] + CELL_OFFSETS).reshape(-1, 3)
+            if not len(cells):
+                break
+
+    def _test(self, points: np.ndarray):
+        self.num_tests += len(points)
+        return np.asarray(self.is_inside_batch(points), dtype=bool).astype(np.int8)
+
+    @property
+    def num_leaves(self):
+        return sum(len(keys) for keys in self.level_keys)
+
+    def classify(self, query_points: npt.ArrayLike):
+        """Returns labels (OUTSIDE, INSIDE or BOUNDARY) of the leaf cells containing query points,
+        points outside the root cell are OUTSIDE"""
+        query_points = np.asarray(query_points, dtype=np.float64).reshape(-1, 3)
+        labels = np.full(len(query_points), OUTSIDE, dtype=np.int8)
+
+        relative = (query_points - self.bounds_min) / (self.bounds_max - self.bounds_min)
+        in_root = ((relative >= 0.0) & (relative < 1.0)).all(axis=1)
+        points = np.flatnonzero(in_root)
+        finest_cells = np.minimum(
+            (relative[in_root] * (1 << self.max_depth)).astype(np.int64),
+            (1 << self.max_depth) - 1,
+        )
+
+        for level, (keys, level_labels) in enumerate(zip(self.level_keys, self.level_labels)):
+            if not len(points):
+                break
+            if not len(keys):
+                continue
+            cell_keys = _cell_keys(finest_cells >> (self.max_depth - level), level)
+            indices = np.minimum(np.searchsorted(keys, cell_keys), len(keys) - 1)
+            found = keys[indices] == cell_keys
+            labels[points[found]] = level_labels[indices[found]]
+            points = points[~found]
+            finest_cells = finest_cells[~found]
+
+        return labels
+
+    def is_inside(self, query_points: npt.ArrayLike):
+        """Checks which points are inside using cell lookup, only points in boundary cells are tested exactly"""
+        query_points = np.asarray(query_points, dtype=np.float64).reshape(-1, 3)
+        labels = self.classify(query_points)
+        boundary = labels == BOUNDARY
+        result = labels == INSIDE
+        if boundary.any():
+            result[boundary] = self.is_inside_batch(query_points[boundary])
+        return result
+
+
+if __name__ == "__main__":
+    from contextlib import contextmanager
+    from timeit import default_timer
+
+    import bpy
+
+    from .fast_winding_numbers import FastWindingTree, is_inside_batch
+
+    @contextmanager
+    def scoped_timer(msg: str):
+        t0 = default_timer()
+        yield
+        t1 = default_timer()
+        print(f"{msg} finished in {t1 - t0:.2f} seconds.")
+
+    obj = bpy.context.object
+    assert obj.type == "MESH"
+
+    mesh = TriangleMesh.from_object(obj, world_space=False)
+    print(f"Number of mesh triangles = {mesh.num_tris}")
+
+    # Generate points inside bounding box
+    min_bb = np.min(obj.bound_box, axis=0)
+    max_bb = np.max(obj.bound_box, axis=0)
+    rng = np.random.default_rng()
+    query_points = rng.uniform(low=min_bb, high=max_bb, size=(1000000, 3))
+
+    with scoped_timer("Building octree classifier"):
+        tree = FastWindingTree(mesh)
+        classifier = OctreeClassifier(mesh, lambda p: is_inside_batch(p, tree))
+    print(
+        f"{classifier.num_leaves} leaf cells, {classifier.num_tests} inside tests during classification"
+    )
+
+    with scoped_timer(f"Filtering {len(query_points)} points using octree classifier"):
+        labels = classifier.classify(query_points)
+        print(f"{np.count_nonzero(labels == BOUNDARY)} points need an exact test")
+        filtered_points = query_points[classifier.is_inside(query_points)]
+
+    # Create point cloud
+    points_mesh = bpy.data.meshes.new("")
+    points_mesh.from_pydata(filtered_points, [], [])
+    points_obj = bpy.data.objects.new("", points_mesh)
+    bpy.context.scene.collection.objects.link(points_obj)
@@ -0,0 +1,120 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+# Shared executor for inside/outside tests, query points are split into shards that are evaluated on a process pool,
+# query points and mesh buffers are placed in shared memory once instead of being pickled for every task
+
+# NOTE: tests that use mathutils (e.g. BVHTree) only work in workers created with the "fork" start method
+# (default on Linux), because mathutils is not importable from a plain Python interpreter
+
+# Arrays attached in the current worker process, keyed by name
+_WORKER_ARRAYS: Dict[str, np.ndarray] = {}
+_WORKER_SHMS = []
+_WORKER_CACHE = {}
+
+
+def default_num_workers():
+    return os.cpu_count() or 1
+
+
+def worker_cache(key: str, factory: Callable):
+    """Returns an object that is created once per worker process (e.g. a BVHTree built from shared buffers)"""
+    if key not in _WORKER_CACHE:
+        _WORKER_CACHE[key] = factory()
+    return _WORKER_CACHE[key]
+
+
+def _attach(specs):
+    _WORKER_ARRAYS.clear()
+    _WORKER_CACHE.clear()
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        # Keep a reference, the array buffer is only valid while the SharedMemory object is alive
+        _WORKER_SHMS.append(shm)
+        _WORKER_ARRAYS[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _run_shard(func: Callable, start: int, end: int, kwargs):
+    arrays = dict(_WORKER_ARRAYS)
+    query_points = arrays.pop("query_points")
+    return func(query_points[start:end], **arrays, **kwargs)
+
+
+def _shard_bounds(num_points: int, num_shards: int):
+    bounds = np.linspace(0, num_points, num_shards + 1).astype(np.intp)
+    return [(int(s), int(e)) for s, e in zip(bounds[:-1], bounds[1:]) if e > s]
+
+
+def _concatenate(results):
+    # Shard functions can return a tuple of per point arrays
+    if isinstance(results[0], tuple):
+        return tuple(np.concatenate(arrays) for arrays in zip(*results))
+    return np.concatenate(results)
+
+
+def map_shards(
+    func: Callable,
+    query_points: npt.ArrayLike,
+    shared_arrays: Optional[Dict[str, npt.ArrayLike]] = None,
+    num_workers: Optional[int] = None,
+    num_shards: Optional[int] = None,
+    **kwargs,
+):
+    """Evaluates func(points, **shared_arrays, **kwargs) over shards of query_points and concatenates the results,
+    func must be picklable (module level function) and return an array (or a tuple of arrays) with one row per point,
+    output order always matches query_points regardless of the number of workers,
+    empty query_points are passed to func once, so it must handle zero points"""
+    query_points = np.ascontiguousarray(query_points)
+    shared_arrays = {
+        name: np.ascontiguousarray(array)
+        for name, array in (shared_arrays or {}).items()
+    }
+
+    num_workers = num_workers or default_num_workers()
+    # Few shards per worker help balancing shards with different cost (e.g. points near the surface)
+    num_shards = num_shards or 4 * num_workers
+    shards = _shard_bounds(len(query_points), max(1, num_shards))
+
+    if not shards:
+        # The shard function on no points gives the output structure and dtypes
+        shards = [(0, 0)]
+
+    if num_workers == 1 or len(shards) <= 1:
+        _WORKER_CACHE.clear()
+        results = [
+            func(query_points[start:end], **shared_arrays, **kwargs)
+            for start, end in shards
+        ]
+        _WORKER_CACHE.clear()
+        return _concatenate(results)
+
+    shms = []
+    try:
+        specs = {}
+        for name, array in {"query_points": query_points, **shared_arrays}.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            shms.append(shm)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+            specs[name] = (shm.name, array.shape, array.dtype)
+
+        with ProcessPoolExecutor(
+            max_workers=num_workers, initializer=_attach, initargs=(specs,)
+        ) as executor:
+            # map() yields results in submission order, which keeps output deterministic
+            results = list(
+                executor.map(
+                    _run_shard,
+                    *zip(*((func, start, end, kwargs) for start, end in shards)),
+                )
+            )
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+    return _concatenate(results)
@@ -0,0 +1,108 @@
+import numpy as np
+import numpy.typing as npt
+
+from .bvh import BVH
+
+# Ray parity (odd-even) inside test for closed meshes, all intersections along each ray are found in one
+# traversal and counted per ray, a point is inside if a ray from it crosses the surface an odd number of times
+
+# Fixed directions (not aligned with axes or each other), parity is evaluated along each
+# and the majority decides, which resolves rays that run exactly through edges or along the surface
+PARITY_DIRECTIONS = np.array(
+    [
+        (0.5773502691896258, 0.5773502691896258, 0.5773502691896258),
+        (-0.8164965809277260, 0.4082482904638630, 0.4082482904638630),
+        (0.2672612419124244, -0.8017837257372732, 0.5345224838248488),
+    ]
+)
+
+# Hits closer than this (relative to the mesh size) along the same ray are one surface crossing
+# (rays through shared edges or vertices hit every adjacent triangle)
+COINCIDENT_TOLERANCE = 1e-9
+
+
+def count_crossings(
+    bvh: BVH,
+    origins: np.ndarray,
+    direction: np.ndarray,
+    tolerance: float = COINCIDENT_TOLERANCE,
+):
+    """Counts surface crossings of rays starting at origins with shape (num_rays, 3) along one direction,
+    coincident hits are merged into a single crossing if the ray passes through the surface there
+    (all hit faces are oriented the same way relative to the ray), and dropped if the ray only grazes it"""
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+    direction = np.asarray(direction, dtype=np.float64)
+    rays, distances, faces = bvh.ray_cast_all(origins, direction[np.newaxis])
+
+    mesh_size = np.ptp(bvh.mesh.verts, axis=0).max()
+    # Start a new group at every hit that is not coincident with the previous hit of the same ray
+    new_group = np.ones(len(rays), dtype=bool)
+    new_group[1:] = (rays[1:] != rays[:-1]) | (
+        distances[1:] - distances[:-1] > tolerance * mesh_size
+    )
+    groups = np.cumsum(new_group) - 1
+    group_rays = rays[new_group]
+
+    # Facing of each hit face, a group with both facings is a ray touching a silhouette edge or vertex
+    facing = np.sign(bvh.mesh.area_normals[faces] @ direction)
+    num_groups = len(group_rays)
+    min_facing = np.full(num_groups, np.inf)
+    max_facing = np.full(num_groups, -np.inf)
+    np.minimum.at(min_facing, groups, facing)
+    np.maximum.at(max_facing, groups, facing)
+    crossing = min_facing == max_facing
+
+    return np.bincount(group_rays[crossing], minlength=len(origins))
+
+
+def is_inside_batch(
+    query_points: npt.ArrayLike,
+    bvh: BVH,
+    directions: np.ndarray = PARITY_DIRECTIONS,
+    tolerance: float = COINCIDENT_TOLERANCE,
+):
+    """Checks which points are inside a closed (watertight) mesh using the majority of ray parities,
+    query_points is expected to be a 2D NumPy array with shape (num_points, 3)"""
+    query_points = np.asarray(query_points, dtype=np.float64).reshape(-1, 3)
+    votes = np.zeros(len(query_points), dtype=np.int64)
+    for direction in directions:
+        votes += count_crossings(bvh, query_points, direction, tolerance) % 2
+    return 2 * votes > len(directions)
+
+
+if __name__ == "__main__":
+    from contextlib import contextmanager
+    from timeit import default_timer
+
+    import bpy
+
+    from ..triangle_mesh import TriangleMesh
+
+    @contextmanager
+    def scoped_timer(msg: str):
+        t0 = default_timer()
+        yield
+        t1 = default_timer()
+        print(f"{msg} finished in {t1 - t0:.2f} seconds.")
+
+    obj = bpy.context.object
+    assert obj.type == "MESH"
+
+    mesh = TriangleMesh.from_object(obj, world_space=False)
+    print(f"Number of mesh triangles = {mesh.num_tris}")
+
+    # Generate points inside bounding box
+    min_bb = np.min(obj.bound_box, axis=0)
+    max_bb = np.max(obj.bound_box, axis=0)
+    rng = np.random.default_rng()
+    query_points = rng.uniform(low=min_bb, high=max_bb, size=(100000, 3))
+
+    with scoped_timer(f"Filtering {len(query_points)} points using ray parity"):
+        bvh = BVH(mesh)
+        filtered_points = query_points[is_inside_batch(query_points, bvh)]
+
+    # Create point cloud
+    points_mesh = bpy.data.meshes.new("")
+    points_mesh.from_pydata(filtered_points, [], [])
+    points_obj = bpy.data.objects.new("", points_mesh)
+    bpy.context.scene.collection.objects.link(points_obj)
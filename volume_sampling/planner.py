@@ -0,0 +1,287 @@
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from ..connected_components import connected_components
+from ..triangle_mesh import TriangleMesh
+from .batched_winding_numbers import is_inside_batch as is_inside_batch_exact
+from .bvh import BVH
+from .fast_winding_numbers import FastWindingTree
+from .fast_winding_numbers import is_inside_batch as is_inside_batch_fast_winding
+from .octree_classifier import OctreeClassifier
+from .parity import is_inside_batch as is_inside_batch_parity
+
+# Inside test planner, the mesh is inspected once and the cheapest method that gives correct results
+# for that kind of mesh is picked for the number of query points,
+# ray parity is only correct for closed meshes while winding numbers also handle open scans,
+# fast winding numbers approximate far away triangles so they are only picked where parity does not apply,
+# meshes with a few small holes (scans with unfilled gaps) are nearly closed and parity is only wrong
+# for points close to a hole, so both are candidates there while open sheets are left to winding numbers
+# (Monte Carlo visibility and the hybrid scripts are slower than these for every mesh and are never picked)
+
+# Rough per unit costs in seconds, measured with the NumPy implementations of this package
+BUILD_COST_PER_TRI = 6e-6  # BVH or fast winding tree construction
+EXACT_COST_PER_PAIR = 1e-7  # point-triangle pair of the batched exact winding numbers
+FAST_WINDING_COST_PER_LEVEL = 2.5e-6  # query point and log2 of triangle count
+PARITY_COST_PER_LEVEL = 3e-6  # query point and log2 of triangle count (all parity rays)
+OCTREE_LOOKUP_COST = 1e-6  # query point cell lookup
+OCTREE_DEPTH = 6
+
+# Nearly closed meshes have at most this many boundary loops,
+# with a total length of at most this fraction of the square root of the surface area
+MAX_SMALL_HOLES = 4
+MAX_HOLE_LENGTH_FRACTION = 0.1
+
+INSIDE_TEST_METHODS = (
+    "exact",
+    "fast_winding",
+    "parity",
+    "octree_fast_winding",
+    "octree_parity",
+)
+
+
+class MeshDiagnostics:
+    """Topology and size measures used to decide which inside tests are correct and what they cost"""
+
+    __slots__ = (
+        "num_tris",
+        "num_edges",
+        "num_boundary_edges",
+        "num_non_manifold_edges",
+        "num_boundary_loops",
+        "boundary_length",
+        "num_misoriented_edges",
+        "area",
+        "volume",
+        "bounds_min",
+        "bounds_max",
+    )
+
+    def __init__(self, mesh: TriangleMesh):
+        self.num_tris = mesh.num_tris
+        num_verts = len(mesh.verts)
+
+        # Encode edges as integers, undirected edges count incident faces,
+        # directed edges used twice mean neighbor faces with opposite orientation
+        directed = mesh.faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2).astype(np.int64)
+        directed_keys = directed[:, 0] * num_verts + directed[:, 1]
+        undirected = np.sort(directed, axis=1)
+        edge_keys, edge_counts = np.unique(
+            undirected[:, 0] * num_verts + undirected[:, 1], return_counts=True
+        )
+        _, directed_counts = np.unique(directed_keys, return_counts=True)
+        self.num_edges = len(edge_keys)
+        self.num_boundary_edges = int(np.count_nonzero(edge_counts == 1))
+        self.num_non_manifold_edges = int(np.count_nonzero(edge_counts > 2))
+        self.num_misoriented_edges = int(np.count_nonzero(directed_counts > 1))
+
+        # Boundary loops are the connected components of the boundary edge graph
+        boundary_keys = edge_keys[edge_counts == 1]
+        boundary_edges = np.stack(np.divmod(boundary_keys, num_verts), axis=1)
+        edge_vecs = mesh.verts[boundary_edges[:, 1]] - mesh.verts[boundary_edges[:, 0]]
+        self.boundary_length = float(np.linalg.norm(edge_vecs, axis=1).sum())
+        boundary_verts, boundary_edges = np.unique(boundary_edges, return_inverse=True)
+        labels = connected_components(len(boundary_verts), boundary_edges.reshape(-1, 2))
+        self.num_boundary_loops = int(labels.max()) + 1 if len(labels) else 0
+
+        # Volume from the divergence theorem, only meaningful for closed meshes
+        self.area = float(mesh.areas.sum())
+        self.volume = abs(float((mesh.centroids * mesh.area_normals).sum()) / 3.0)
+        self.bounds_min = mesh.verts.min(axis=0)
+        self.bounds_max = mesh.verts.max(axis=0)
+
+    @property
+    def is_watertight(self):
+        return self.num_boundary_edges == 0
+
+    @property
+    def is_closed_manifold(self):
+        return self.is_watertight and self.num_non_manifold_edges == 0
+
+    @property
+    def is_nearly_closed(self):
+        """Manifold mesh with a few boundary loops that are short compared to its size (small holes),
+        unlike open sheets whose boundary is about as long as the square root of their area"""
+        return (
+            self.num_non_manifold_edges == 0
+            and self.num_boundary_loops <= MAX_SMALL_HOLES
+            and self.boundary_length <= MAX_HOLE_LENGTH_FRACTION * np.sqrt(self.area)
+        )
+
+    @property
+    def is_consistently_oriented(self):
+        return self.num_misoriented_edges == 0
+
+    @property
+    def bounds_volume(self):
+        return float(np.prod(np.maximum(self.bounds_max - self.bounds_min, 1e-12)))
+
+    @property
+    def fill_fraction(self):
+        """Fraction of the bounding box inside the mesh, None for open meshes where it is not defined
+        (approximate for nearly closed meshes, the holes are missing from the volume integral)"""
+        if not (self.is_watertight or self.is_nearly_closed):
+            return None
+        return min(self.volume / self.bounds_volume, 1.0)
+
+    def __repr__(self):
+        fill_fraction = self.fill_fraction
+        fill = "n/a" if fill_fraction is None else f"{fill_fraction:.3f}"
+        return (
+            f"{self.num_tris} triangles, {self.num_boundary_edges} boundary edges "
+            f"in {self.num_boundary_loops} loops, {self.num_non_manifold_edges} non-manifold edges, "
+            f"{self.num_misoriented_edges} misoriented edges, fill fraction {fill}"
+        )
+
+
+def estimate_costs(diagnostics: MeshDiagnostics, num_points: int) -> Dict[str, float]:
+    """Estimated seconds (including construction) of each of INSIDE_TEST_METHODS that is correct for the mesh"""
+    num_tris = max(diagnostics.num_tris, 2)
+    levels = np.log2(num_tris)
+    build = BUILD_COST_PER_TRI * num_tris
+
+    # Closed meshes get exact answers from parity, approximate fast winding numbers are left for open meshes,
+    # both are approximate near the holes of nearly closed meshes
+    if diagnostics.is_closed_manifold:
+        tree_methods = ("parity",)
+    elif diagnostics.is_nearly_closed:
+        tree_methods = ("parity", "fast_winding")
+    else:
+        tree_methods = ("fast_winding",)
+    costs = {"exact": EXACT_COST_PER_PAIR * num_points * num_tris}
+
+    # Octree cells touching the surface at the finest level, they need exact tests (points inside them)
+    # and their free neighbors are classified with one center and eight shared corner tests
+    cell_size = (diagnostics.bounds_volume / 8**OCTREE_DEPTH) ** (1.0 / 3.0)
+    surface_cells = min(1.5 * diagnostics.area / cell_size**2, 8**OCTREE_DEPTH)
+    boundary_fraction = min(surface_cells / 8**OCTREE_DEPTH, 1.0)
+    classification_tests = 4.0 * 3.0 * surface_cells
+    tests = classification_tests + boundary_fraction * num_points
+
+    for tree_method in tree_methods:
+        if tree_method == "parity":
+            # Rays of inside points always cross the surface while rays of outside points often miss it,
+            # inside points cost about twice as much (the constant is measured at a fill fraction of 0.5)
+            cost_per_level = PARITY_COST_PER_LEVEL * (1.0 + diagnostics.fill_fraction) / 1.5
+        else:
+            cost_per_level = FAST_WINDING_COST_PER_LEVEL
+        costs[tree_method] = build + cost_per_level * levels * num_points
+        costs[f"octree_{tree_method}"] = (
+            2 * build + OCTREE_LOOKUP_COST * num_points + cost_per_level * levels * tests
+        )
+
+    return costs
+
+
+class InsideTestPlan:
+    """Chosen method with its estimated cost, build() returns the inside test as a callable
+    taking points with shape (num_points, 3) and returning a boolean mask"""
+
+    __slots__ = ("mesh", "diagnostics", "num_points", "method", "costs")
+
+    def __init__(
+        self,
+        mesh: TriangleMesh,
+        diagnostics: MeshDiagnostics,
+        num_points: int,
+        method: str,
+        costs: Dict[str, float],
+    ):
+        self.mesh = mesh
+        self.diagnostics = diagnostics
+        self.num_points = num_points
+        self.method = method
+        self.costs = costs
+
+    @property
+    def estimated_seconds(self):
+        return self.costs[self.method]
+
+    @property
+    def warnings(self):
+        """Reasons the chosen method may give wrong results for some points of this mesh"""
+        warnings = []
+        if self.method.endswith("parity"):
+            if not self.diagnostics.is_closed_manifold:
+                warnings.append("mesh has small holes, parity results may be wrong close to them")
+        elif not self.diagnostics.is_consistently_oriented:
+            warnings.append("inconsistent face orientation, winding number results may be wrong")
+        return warnings
+
+    def __repr__(self):
+        ranked = sorted(self.costs.items(), key=lambda item: item[1])
+        estimates = ", ".join(f"{name} {cost:.2f}s" for name, cost in ranked)
+        lines = [
+            f"Mesh diagnostics: {self.diagnostics}",
+            *(f"Warning: {warning}" for warning in self.warnings),
+            f"Estimated costs for {self.num_points} points: {estimates}",
+            f"Using {self.method} (estimated {self.estimated_seconds:.2f} seconds)",
+        ]
+        return "\n".join(lines)
+
+    def build(self) -> Callable[[np.ndarray], np.ndarray]:
+        if self.method == "exact":
+            return lambda points: is_inside_batch_exact(points, self.mesh)
+
+        bvh = BVH(self.mesh)
+        if self.method.endswith("parity"):
+            is_inside_batch = lambda points: is_inside_batch_parity(points, bvh)
+        else:
+            tree = FastWindingTree(self.mesh)
+            is_inside_batch = lambda points: is_inside_batch_fast_winding(points, tree)
+
+        if self.method.startswith("octree"):
+            classifier = OctreeClassifier(
+                self.mesh, is_inside_batch, max_depth=OCTREE_DEPTH, bvh=bvh
+            )
+            return classifier.is_inside
+        return is_inside_batch
+
+
+def plan_inside_test(mesh: TriangleMesh, num_points: int, method: Optional[str] = None):
+    """Inspects the mesh and picks the cheapest correct inside test for num_points query points,
+    method forces one of INSIDE_TEST_METHODS (raises ValueError if it is not correct for the mesh),
+    the returned plan holds the diagnostics and estimated costs (its repr is a readable report)"""
+    diagnostics = MeshDiagnostics(mesh)
+    costs = estimate_costs(diagnostics, num_points)
+
+    if method is None:
+        method = min(costs, key=costs.get)
+    elif method not in INSIDE_TEST_METHODS:
+        raise ValueError(f"Unknown inside test {method!r}, expected one of {INSIDE_TEST_METHODS}")
+    elif method not in costs:
+        raise ValueError(f"Inside test {method!r} is not correct for this mesh ({diagnostics})")
+
+    return InsideTestPlan(mesh, diagnostics, num_points, method, costs)
+
+
+if __name__ == "__main__":
+    import bpy
+
+    from ..scoped_timer import scoped_timer
+
+    obj = bpy.context.object
+    assert obj.type == "MESH"
+
+    NUM_POINTS = 1000000
+
+    mesh = TriangleMesh.from_object(obj, world_space=False)
+    plan = plan_inside_test(mesh, NUM_POINTS)
+    print(plan)
+
+    # Generate points inside bounding box
+    min_bb = np.min(obj.bound_box, axis=0)
+    max_bb = np.max(obj.bound_box, axis=0)
+    rng = np.random.default_rng()
+    query_points = rng.uniform(low=min_bb, high=max_bb, size=(NUM_POINTS, 3))
+
+    with scoped_timer(f"Filtering {len(query_points)} points using {plan.method}"):
+        is_inside_batch = plan.build()
+        filtered_points = query_points[is_inside_batch(query_points)]
+
+    # Create point cloud
+    points_mesh = bpy.data.meshes.new("")
+    points_mesh.from_pydata(filtered_points, [], [])
+    points_obj = bpy.data.objects.new("", points_mesh)
+    bpy.context.scene.collection.objects.link(points_obj)
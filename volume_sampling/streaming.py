@@ -0,0 +1,128 @@
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+# Streaming interior point sampler, candidates are drawn in the bounding box in batches sized from
+# an on the fly estimate of the acceptance rate and accepted points are yielded in fixed size chunks,
+# memory use depends on the chunk size only and not on the requested number of points
+
+# Upper bound of candidates drawn per batch
+MAX_BATCH_SIZE = 1 << 20
+
+# Default candidate limit per requested point (acceptance rates below 0.1% give up)
+MAX_CANDIDATES_PER_POINT = 1000
+
+
+def iter_interior_points(
+    is_inside_batch: Callable[[np.ndarray], np.ndarray],
+    bounds_min: npt.ArrayLike,
+    bounds_max: npt.ArrayLike,
+    count: int,
+    chunk_size: int = 10000,
+    seed: Optional[int] = None,
+    max_batch_size: int = MAX_BATCH_SIZE,
+    max_candidates: Optional[int] = None,
+) -> Iterator[np.ndarray]:
+    """Yields exactly count points (in chunks of chunk_size, the last chunk may be smaller)
+    uniformly distributed inside the mesh, is_inside_batch takes points with shape (num_points, 3)
+    and returns a boolean mask, the same seed reproduces the same points,
+    raises RuntimeError after testing max_candidates points (e.g. for meshes without interior),
+    max_candidates defaults to MAX_CANDIDATES_PER_POINT times count (at least one full batch)"""
+    if max_candidates is None:
+        max_candidates = max(MAX_CANDIDATES_PER_POINT * count, max_batch_size)
+    rng = np.random.default_rng(seed)
+    bounds_min = np.asarray(bounds_min, dtype=np.float64)
+    bounds_max = np.asarray(bounds_max, dtype=np.float64)
+
+    # Beta(1, 1) prior on the acceptance rate, updated with every tested batch
+    accepted_total = 1
+    tested_total = 2
+
+    pending = []
+    num_pending = 0
+    remaining = count
+    while remaining > 0:
+        needed = min(chunk_size, remaining) - num_pending
+        # Slightly oversample so that most chunks are filled by a single batch
+        acceptance_rate = accepted_total / tested_total
+        batch_size = int(np.ceil(1.1 * needed / acceptance_rate)) + 16
+        batch_size = min(max(batch_size, 1), max_batch_size)
+
+        if tested_total - 2 >= max_candidates:
+            raise RuntimeError(
+                f"Found {accepted_total - 1} interior points in {max_candidates} candidates, {count} requested"
+            )
+        batch_size = min(batch_size, max_candidates - (tested_total - 2))
+
+        candidates = rng.uniform(low=bounds_min, high=bounds_max, size=(batch_size, 3))
+        inside = candidates[np.asarray(is_inside_batch(candidates), dtype=bool)]
+        accepted_total += len(inside)
+        tested_total += batch_size
+
+        pending.append(inside)
+        num_pending += len(inside)
+        while num_pending >= min(chunk_size, remaining) > 0:
+            points = np.concatenate(pending)
+            size = min(chunk_size, remaining)
+            yield points[:size]
+            remaining -= size
+            pending = [points[size:]]
+            num_pending = len(pending[0])
+
+
+def sample_interior_points(
+    is_inside_batch: Callable[[np.ndarray], np.ndarray],
+    bounds_min: npt.ArrayLike,
+    bounds_max: npt.ArrayLike,
+    count: int,
+    chunk_size: int = 10000,
+    seed: Optional[int] = None,
+    max_candidates: Optional[int] = None,
+):
+    """Returns exactly count interior points with shape (count, 3), see iter_interior_points"""
+    chunks = list(
+        iter_interior_points(
+            is_inside_batch,
+            bounds_min,
+            bounds_max,
+            count,
+            chunk_size,
+            seed,
+            max_candidates=max_candidates,
+        )
+    )
+    return np.concatenate(chunks) if chunks else np.empty((0, 3))
+
+
+if __name__ == "__main__":
+    import bpy
+
+    from ..triangle_mesh import TriangleMesh
+    from .fast_winding_numbers import FastWindingTree, is_inside_batch
+
+    obj = bpy.context.object
+    assert obj.type == "MESH"
+
+    NUM_POINTS = 100000
+
+    tree = FastWindingTree(TriangleMesh.from_object(obj, world_space=False))
+    min_bb = np.min(obj.bound_box, axis=0)
+    max_bb = np.max(obj.bound_box, axis=0)
+
+    # Chunks are copied into a preallocated buffer as they arrive
+    coords = np.empty((NUM_POINTS, 3), dtype=np.float32)
+    offset = 0
+    for chunk in iter_interior_points(
+        lambda p: is_inside_batch(p, tree), min_bb, max_bb, NUM_POINTS, seed=1234
+    ):
+        coords[offset : offset + len(chunk)] = chunk
+        offset += len(chunk)
+
+    # Create point cloud
+    points_mesh = bpy.data.meshes.new("")
+    points_mesh.vertices.add(NUM_POINTS)
+    points_mesh.vertices.foreach_set("co", coords.ravel())
+    points_mesh.update()
+    points_obj = bpy.data.objects.new("", points_mesh)
+    bpy.context.scene.collection.objects.link(points_obj)
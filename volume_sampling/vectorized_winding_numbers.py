@@ -6,6 +6,22 @@ import bpy
 import numpy as np
 import numpy.typing as npt
 
+if not __package__:
+    # Run as a standalone script (e.g. opened from its file in Blender's text editor), the relative imports
+    # below need the repository imported as a package, so its parent directory is put on sys.path (PEP 366)
+    import os
+    import sys
+
+    _repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.path.dirname(_repository))
+    __package__ = os.path.basename(_repository) + ".volume_sampling"
+
+from ..mesh_arrays import mesh_loop_triangles, mesh_vertex_coords
+from ..triangle_mesh import TriangleMesh
+from .parallel import map_shards
+
+NUM_WORKERS = None  # Defaults to the number of CPUs
+
 # Vectorized to speed up query for one point (mesh triangles are vectorized)
 
 # References
@@ -55,12 +71,50 @@ def calc_winding_number_vectorized(query_point: npt.DTypeLike, tris: npt.DTypeLi
     return np.arctan2(numerator, denominator).sum()
 
 
-def is_inside(query_point: npt.DTypeLike, tris: npt.DTypeLike):
-    """Checks if point is inside mesh,
+def calc_winding_number_indexed(query_point: npt.DTypeLike, mesh: TriangleMesh):
+    """Same as calc_winding_number_vectorized for a TriangleMesh,
+    shared vertices are shifted and their norms computed once instead of once per triangle corner"""
+
+    assert query_point.shape == (3,)
+
+    verts_shifted = mesh.verts - query_point
+    norm = np.linalg.norm(verts_shifted, axis=1, ord=2)
+
+    i1, i2, i3 = mesh.faces.T
+
+    v1_norm = norm[i1]
+    v2_norm = norm[i2]
+    v3_norm = norm[i3]
+
+    v1 = verts_shifted[i1]
+    v2 = verts_shifted[i2]
+    v3 = verts_shifted[i3]
+
+    denominator = (
+        v1_norm * v2_norm * v3_norm
+        + (v1 * v2).sum(axis=1) * v3_norm
+        + (v1 * v3).sum(axis=1) * v2_norm
+        + (v2 * v3).sum(axis=1) * v1_norm
+    )
+    numerator = (v1 * np.cross(v2, v3)).sum(axis=1)
+
+    return np.arctan2(numerator, denominator).sum()
+
+
+def is_inside(query_point: npt.DTypeLike, tris):
+    """Checks if point is inside mesh, tris is either flattened triangle vertex locations or a TriangleMesh,
     assumes mesh already has consistent normals with positive volume everywhere inside"""
+    if isinstance(tris, TriangleMesh):
+        return calc_winding_number_indexed(query_point, tris) >= (2.0 * np.pi)
     return calc_winding_number_vectorized(query_point, tris) >= (2.0 * np.pi)
 
 
+def is_inside_batch(query_points: npt.DTypeLike, verts: npt.DTypeLike, faces: npt.DTypeLike):
+    """Checks which points are inside mesh, used as shard function of map_shards"""
+    mesh = TriangleMesh(verts, faces)
+    return np.array([is_inside(p, mesh) for p in query_points], dtype=bool)
+
+
 if __name__ == "__main__":
     obj = bpy.context.object
     assert obj.type == "MESH"
@@ -72,15 +126,19 @@ if __name__ == "__main__":
     query_points = rng.uniform(low=min_bb, high=max_bb, size=(100000, 3))
 
     mesh: bpy.types.Mesh = obj.data
-    mesh.calc_loop_triangles()
-    tris = np.array(
-        [mesh.vertices[i].co for tri in mesh.loop_triangles for i in tri.vertices]
-    )
-    print(f"Number of mesh triangles = {len(mesh.loop_triangles)}")
+    tri_mesh = TriangleMesh(mesh_vertex_coords(mesh), mesh_loop_triangles(mesh))
+    print(f"Number of mesh triangles = {tri_mesh.num_tris}")
     with scoped_timer(
         f"Filtering {len(query_points)} points using Generalized Winding Numbers"
     ):
-        filtered_points = [p for p in query_points if is_inside(p, tris)]
+        filtered_points = query_points[
+            map_shards(
+                is_inside_batch,
+                query_points,
+                {"verts": tri_mesh.verts, "faces": tri_mesh.faces},
+                num_workers=NUM_WORKERS,
+            )
+        ]
 
     # Create point cloud
     points_mesh = bpy.data.meshes.new("")
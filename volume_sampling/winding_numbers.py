@@ -5,6 +5,21 @@ import bpy
 import numpy as np
 from mathutils import Vector
 
+if not __package__:
+    # Run as a standalone script (e.g. opened from its file in Blender's text editor), the relative imports
+    # below need the repository imported as a package, so its parent directory is put on sys.path (PEP 366)
+    import os
+    import sys
+
+    _repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.path.dirname(_repository))
+    __package__ = os.path.basename(_repository) + ".volume_sampling"
+
+from ..mesh_arrays import mesh_loop_triangles, mesh_vertex_coords
+from .parallel import map_shards, worker_cache
+
+NUM_WORKERS = None  # Defaults to the number of CPUs
+
 # References
 # https://github.com/marmakoide/inside-3d-mesh/blob/master/is_inside_mesh.py
 # https://en.wikipedia.org/wiki/Solid_angle#Tetrahedron
@@ -40,6 +55,21 @@ def is_inside(point: Vector, mesh: bpy.types.Mesh):
     return calc_winding_number(point, mesh) >= (2 * math.pi)
 
 
+def is_inside_batch(query_points: np.ndarray, verts: np.ndarray, faces: np.ndarray):
+    """Checks which points are inside mesh given as vertex and triangle index arrays,
+    used as shard function of map_shards"""
+    tris = worker_cache(
+        "tris", lambda: [[Vector(verts[i]) for i in face] for face in faces]
+    )
+    return np.array(
+        [
+            sum(tet_solid_angle(p, a, b, c) for a, b, c in tris) >= (2 * math.pi)
+            for p in map(Vector, query_points)
+        ],
+        dtype=bool,
+    )
+
+
 from timeit import default_timer
 
 if __name__ == "__main__":
@@ -55,9 +85,18 @@ if __name__ == "__main__":
     # Filter points
     mesh: bpy.types.Mesh = obj.data
     mesh.calc_loop_triangles()
+    verts = mesh_vertex_coords(mesh)
+    faces = mesh_loop_triangles(mesh)
 
     t0 = default_timer()
-    inside_points = [p for p in points if is_inside(Vector(p), mesh)]
+    inside_points = points[
+        map_shards(
+            is_inside_batch,
+            points,
+            {"verts": verts, "faces": faces},
+            num_workers=NUM_WORKERS,
+        )
+    ]
     t1 = default_timer()
     print(f"Filtering points finished in {t1 - t0}")
 